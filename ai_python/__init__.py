@@ -5,7 +5,22 @@ Contains the FastAPI DCF pipeline service, split into:
 - main: FastAPI app and HTTP routes
 - pipeline: CrewAI pipeline orchestration
 - reports: Word/Excel/ZIP report generation
-- extraction: structured JSON extraction via OpenAI
-- jobs: in-memory job store shared across modules
+- rendering: process-pool stage that renders the reports in parallel
+- context: token-budgeted packing of agent outputs handed to downstream agents
+- extraction: typed extraction schema, extracted per section as agents finish (local parse, OpenAI fallback)
+- local_extraction: rule-based parser for tables and labelled values in the agent outputs
+- dcf_engine: deterministic NumPy DCF valuation from extracted drivers
+- artifacts: on-disk spool for generated report files
+- ratelimit: shared per-key OpenAI rate limiter with adaptive concurrency
+- llm_cache: content-addressed cache of agent and extraction LLM outputs
+- jobs: pluggable job store (memory / SQLite) shared across modules
+- scheduler: bounded worker pool and job queue
+- coalescing: single-flight sharing of one run between identical requests
+- batches: peer-group batches fed into the scheduler with bounded parallelism
+- checkpoints: resume a failed job / re-run it from agent N using its stage checkpoints
+- events: per-job progress events for the SSE stream
+- telemetry: per-stage timings, token usage and cost; Prometheus metrics
+- benchmarks: standalone performance benchmarks (python -m ai_python.benchmarks.<name>)
+- loadtest: fake OpenAI-compatible server and end-to-end load driver
 """
 
@@ -0,0 +1,11 @@
+"""Run the DCF service: python -m ai_python"""
+
+if __name__ == '__main__':
+    import uvicorn
+
+    from ai_python.main import app
+
+    # Started from the package's __main__ so that render worker processes
+    # (forkserver / spawn) do not re-run the service module and its start-up
+    # side effects (job store recovery, listeners, app) in every child.
+    uvicorn.run(app, host='0.0.0.0', port=5000)
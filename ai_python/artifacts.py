@@ -0,0 +1,132 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, BinaryIO, Callable, Dict
+
+logger = logging.getLogger('dcf_pipeline')
+
+
+# ═══════════════════════════════════════════════════════════════
+#  ARTIFACT SPOOL  (report files written once, streamed from disk)
+# ═══════════════════════════════════════════════════════════════
+
+SPOOL_DIR = os.environ.get('DCF_SPOOL_DIR', os.path.join(tempfile.gettempdir(), 'dcf_spool'))
+HASH_CHUNK = 1024 * 1024
+# Spool directories touched more recently than this are never treated as orphans.
+ORPHAN_MIN_AGE_SECONDS = float(os.environ.get('DCF_SPOOL_ORPHAN_AGE_SECONDS', '3600'))
+
+
+def _job_dir(job_id: str) -> str:
+    return os.path.join(SPOOL_DIR, job_id)
+
+
+def write_artifact(job_id: str, name: str, write: Callable[[BinaryIO], None]) -> Dict[str, Any]:
+    """Stream an artifact into the job's spool directory and return its metadata.
+
+    ``write`` receives the open file and writes the content (e.g. a ZIP
+    streamed member by member). The file is written to a temporary name and
+    renamed into place so a concurrent download never sees a partial file.
+    ``etag`` is the content hash, unquoted; responses build their ETag from it.
+    """
+    job_dir = _job_dir(job_id)
+    os.makedirs(job_dir, exist_ok=True)
+    path = os.path.join(job_dir, name)
+    fd, tmp_path = tempfile.mkstemp(dir=job_dir, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'w+b') as f:
+            write(f)
+            f.flush()
+            size = f.tell()
+            # Hashed from the file, since writers such as zipfile seek back to patch headers.
+            f.seek(0)
+            digest = hashlib.sha256()
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+                digest.update(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return {
+        'path': path,
+        'size': size,
+        'etag': digest.hexdigest()[:32],
+    }
+
+
+def scratch_path(job_id: str, name: str) -> str:
+    """Path for an intermediate file in the job's spool directory (removed with the job)."""
+    job_dir = _job_dir(job_id)
+    os.makedirs(job_dir, exist_ok=True)
+    return os.path.join(job_dir, f'.part-{name}')
+
+
+def link_artifact(path: str, job_id: str, name: str) -> str:
+    """Give ``job_id`` its own reference to an existing artifact file.
+
+    Hard-links when possible (no copy, and either job can be removed without
+    affecting the other); falls back to copying across filesystems.
+    """
+    job_dir = _job_dir(job_id)
+    os.makedirs(job_dir, exist_ok=True)
+    target = os.path.join(job_dir, name)
+    if os.path.exists(target):
+        os.remove(target)
+    try:
+        os.link(path, target)
+    except OSError:
+        shutil.copyfile(path, target)
+    return target
+
+
+def remove_artifacts(job_id: str) -> None:
+    """Delete every spooled file of a job (safe to call if none exist)."""
+    job_dir = _job_dir(job_id)
+    if not os.path.isdir(job_dir):
+        return
+    for name in os.listdir(job_dir):
+        try:
+            os.remove(os.path.join(job_dir, name))
+        except OSError as e:
+            logger.warning('[Job %s] Failed to remove artifact %s: %s', job_id[:8], name, e)
+    try:
+        os.rmdir(job_dir)
+    except OSError:
+        pass
+
+
+def sweep_orphans(is_known_job: Callable[[str], bool], min_age: float = ORPHAN_MIN_AGE_SECONDS) -> int:
+    """Remove spool directories of jobs the job store no longer knows about.
+
+    Directories modified within ``min_age`` seconds are kept: they may belong
+    to a job another worker process has only just created.
+    """
+    if not os.path.isdir(SPOOL_DIR):
+        return 0
+    cutoff = time.time() - min_age
+    removed = 0
+    for job_id in os.listdir(SPOOL_DIR):
+        try:
+            if os.path.getmtime(_job_dir(job_id)) > cutoff:
+                continue
+        except OSError:
+            continue
+        if not is_known_job(job_id):
+            remove_artifacts(job_id)
+            removed += 1
+    if removed:
+        logger.info('Removed %d orphaned artifact spool director(ies)', removed)
+    return removed
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """True if an If-None-Match header value matches ``etag`` (weak comparison)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = [t.strip().removeprefix('W/') for t in if_none_match.split(',')]
+    return etag.removeprefix('W/') in candidates
@@ -0,0 +1,259 @@
+import logging
+import os
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from .artifacts import write_artifact
+from .coalescing import flights, normalize_company
+from .events import broker
+from .jobs import TERMINAL_STATUSES, job_store, new_job
+from .reports import batch_members, create_batch_summary_excel, safe_company_name, write_zip
+from .scheduler import QueueFullError
+
+logger = logging.getLogger('dcf_pipeline')
+
+
+# ═══════════════════════════════════════════════════════════════
+#  BATCH VALUATIONS  (peer groups fed into the job scheduler)
+# ═══════════════════════════════════════════════════════════════
+
+MAX_BATCH_SIZE = int(os.environ.get('DCF_MAX_BATCH_SIZE', '200'))
+BATCH_PARALLELISM = int(os.environ.get('DCF_BATCH_PARALLELISM', '2'))
+MAX_BATCH_PARALLELISM = int(os.environ.get('DCF_MAX_BATCH_PARALLELISM', '16'))
+# Delay before re-offering a child job the scheduler rejected as full.
+REQUEUE_SECONDS = 5.0
+
+
+def dedupe_companies(companies: List[str]) -> Tuple[List[str], List[str]]:
+    """Split ``companies`` into first occurrences (in order) and dropped repeats."""
+    seen = set()
+    unique, duplicates = [], []
+    for name in companies:
+        name = ' '.join(name.split())
+        key = normalize_company(name)
+        if key in seen:
+            duplicates.append(name)
+        else:
+            seen.add(key)
+            unique.append(name)
+    return unique, duplicates
+
+
+class BatchRunner:
+    """Runs a batch as ordinary DCF jobs, at most ``parallelism`` at a time.
+
+    The batch itself is a job-store record (``kind`` = "batch") so it gets the
+    same status, versioning, retention and SSE stream as a single job. Child
+    jobs wait as "queued" records and are handed to the scheduler one by one
+    as earlier children finish; the API key stays in memory only.
+    Children are pinned in the job store until the batch finalizes, so
+    retention cannot drop a finished company's reports from the archive.
+    When every child is terminal, one archive with each company's reports and
+    a consolidated ``batch_summary.xlsx`` is spooled for the batch.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._batches: Dict[str, Dict[str, Any]] = {}
+        self._parent: Dict[str, str] = {}
+        # Advances batches outside the job store lock the change listener runs under.
+        self._worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix='dcf-batch')
+
+    def start(self, companies: List[str], api_key: str, prompts: Dict[str, Any],
+              options: Dict[str, Any], parallelism: int, priority: int = 0) -> str:
+        """Create the batch and its child jobs, start feeding them; returns the batch id."""
+        unique, duplicates = dedupe_companies(companies)
+        batch_id = str(uuid.uuid4())
+        children = [(str(uuid.uuid4()), name) for name in unique]
+
+        job_store.pin(job_id for job_id, _ in children)
+        for job_id, name in children:
+            job_store.create(job_id, new_job(name, batch_id=batch_id, current_agent_name='Waiting in batch',
+                                             prompts=prompts, options=options))
+        job_store.create(batch_id, new_job(
+            f'Batch of {len(children)} companies',
+            kind='batch',
+            status='running',
+            current_agent_name=f'0/{len(children)} companies finished',
+            jobs=[{'job_id': job_id, 'company_name': name} for job_id, name in children],
+            duplicates=duplicates,
+            parallelism=parallelism,
+            finished=0,
+        ))
+
+        with self._lock:
+            self._batches[batch_id] = {
+                'api_key': api_key,
+                'prompts': prompts,
+                'options': options,
+                'priority': priority,
+                'parallelism': parallelism,
+                'pending': deque(job_id for job_id, _ in children),
+                'active': set(),
+                'finished': 0,
+                'total': len(children),
+            }
+            for job_id, _ in children:
+                self._parent[job_id] = batch_id
+        logger.info('Batch %s accepted: %d companies (%d duplicates dropped), parallelism %d',
+                    batch_id[:8], len(children), len(duplicates), parallelism)
+        self._feed(batch_id)
+        return batch_id
+
+    def cancel(self, batch_id: str) -> bool:
+        """Cancel every unfinished child; the batch then finalizes as cancelled."""
+        with self._lock:
+            state = self._batches.get(batch_id)
+            if state is None:
+                return False
+            state['cancelled'] = True
+            pending = list(state['pending'])
+            state['pending'].clear()
+            active = list(state['active'])
+        job_store.update(batch_id, cancelled=True, current_agent_name='Cancelling...')
+        for job_id in pending + active:
+            flights.cancel(job_id)
+        return True
+
+    def job_changed(self, job_id: str, changes: Dict[str, Any], job: Dict[str, Any]) -> None:
+        """JobStore change listener: advance the batch when a child finishes."""
+        batch_id = self._parent.get(job_id)
+        if batch_id is None or 'status' not in changes or job.get('status') not in TERMINAL_STATUSES:
+            return
+        # Published before the batch advances so it precedes the final ``status`` event.
+        broker.publish(batch_id, 'job', {
+            'job_id': job_id,
+            'company_name': job.get('company_name'),
+            'status': job.get('status'),
+            'error': job.get('error'),
+        })
+        self._worker.submit(self._child_finished, batch_id, job_id)
+
+    # ── Internals ──
+
+    def _child_finished(self, batch_id: str, job_id: str) -> bool:
+        """Record a terminal child and advance the batch; False if already counted."""
+        with self._lock:
+            state = self._batches.get(batch_id)
+            if state is None or self._parent.pop(job_id, None) is None:
+                return False
+            state['active'].discard(job_id)
+            if job_id in state['pending']:
+                state['pending'].remove(job_id)
+            state['finished'] += 1
+            finished, total = state['finished'], state['total']
+
+        job_store.update(batch_id, finished=finished,
+                         current_agent_name=f'{finished}/{total} companies finished')
+        if finished == total:
+            threading.Thread(target=self._finalize, args=(batch_id,),
+                             name=f'dcf-batch-{batch_id[:8]}', daemon=True).start()
+        else:
+            self._feed(batch_id)
+        return True
+
+    def _feed(self, batch_id: str) -> None:
+        """Hand pending children to the scheduler until ``parallelism`` are in flight."""
+        while True:
+            with self._lock:
+                state = self._batches.get(batch_id)
+                if state is None or not state['pending'] or len(state['active']) >= state['parallelism']:
+                    return
+                job_id = state['pending'].popleft()
+                state['active'].add(job_id)
+            job = job_store.get(job_id)
+            if not job or job.get('status') in TERMINAL_STATUSES:
+                # Cancelled (or deleted) before it was handed to the scheduler.
+                self._child_finished(batch_id, job_id)
+                continue
+            try:
+                position = flights.submit(job_id, job['company_name'], state['api_key'],
+                                          state['prompts'], state['options'], state['priority'])
+            except QueueFullError:
+                with self._lock:
+                    state['active'].discard(job_id)
+                    state['pending'].appendleft(job_id)
+                logger.info('Batch %s: scheduler full, retrying in %.0fs', batch_id[:8], REQUEUE_SECONDS)
+                timer = threading.Timer(REQUEUE_SECONDS, self._feed, args=(batch_id,))
+                timer.daemon = True
+                timer.start()
+                return
+            job_store.update(job_id, queue_position=position, current_agent_name='Waiting in queue')
+            broker.publish(batch_id, 'job', {
+                'job_id': job_id, 'company_name': job['company_name'], 'status': 'queued' if position else 'running',
+            })
+
+    def _finalize(self, batch_id: str) -> None:
+        with self._lock:
+            state = self._batches.pop(batch_id, None)
+        batch = job_store.get(batch_id)
+        if state is None or not batch:
+            return
+        try:
+            self._archive(batch_id, batch, state)
+        finally:
+            job_store.unpin(child['job_id'] for child in batch['jobs'])
+
+    def _archive(self, batch_id: str, batch: Dict[str, Any], state: Dict[str, Any]) -> None:
+        """Spool the combined archive and mark the batch finished.
+
+        Each child's outcome is copied into the batch record, which outlives
+        the children once they are unpinned.
+        """
+        try:
+            rows, reports, folders, outcomes = [], [], set(), []
+            for child in batch['jobs']:
+                job = job_store.get(child['job_id']) or {}
+                status = job.get('status', 'error')
+                outcomes.append({**child, 'status': status, 'error': job.get('error'),
+                                 'summary': job.get('summary')})
+                rows.append({
+                    **(job.get('summary') or {}),
+                    'company_name': child['company_name'],
+                    'status': status,
+                    'error': job.get('error') or (None if job else 'Job expired'),
+                })
+                path = job.get('artifact_path')
+                if status == 'complete' and path and os.path.isfile(path):
+                    folder = base = safe_company_name(child['company_name'])
+                    suffix = 2
+                    while folder in folders:
+                        folder, suffix = f'{base}_{suffix}', suffix + 1
+                    folders.add(folder)
+                    reports.append((folder, path))
+
+            summary = create_batch_summary_excel(rows)
+            artifact = write_artifact(batch_id, 'batch.zip', lambda f: write_zip(f, batch_members(reports, summary)))
+        except Exception as e:
+            logger.error('Batch %s: failed to build combined archive: %s', batch_id[:8], e, exc_info=True)
+            job_store.update(batch_id, status='error', error=str(e), current_agent_name='Failed')
+            return
+
+        succeeded = sum(1 for r in rows if r['status'] == 'complete')
+        if state.get('cancelled'):
+            status = 'cancelled'
+        elif succeeded:
+            status = 'complete'
+        else:
+            status = 'error'
+        job_store.update(
+            batch_id,
+            jobs=outcomes,
+            artifact_path=artifact['path'],
+            artifact_size=artifact['size'],
+            artifact_etag=artifact['etag'],
+            zip_filename=f'dcf_batch_{batch_id[:8]}.zip',
+            download_ready=True,
+            succeeded=succeeded,
+            error='No company in the batch completed successfully.' if status == 'error' else None,
+            status=status,
+            current_agent_name=f'{succeeded}/{len(rows)} companies valued',
+        )
+        logger.info('Batch %s finished: %d/%d companies valued', batch_id[:8], succeeded, len(rows))
+
+
+# Process-wide batch runner fed by the job store
+batch_runner = BatchRunner()
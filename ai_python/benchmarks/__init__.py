@@ -0,0 +1,8 @@
+"""
+Standalone performance benchmarks for the DCF service.
+
+Run a benchmark as a module from the repository root, e.g.
+    python -m ai_python.benchmarks.word_render
+
+``suite`` covers every report stage and compares against a stored baseline.
+"""
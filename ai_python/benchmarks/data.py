@@ -0,0 +1,77 @@
+from typing import Any, Dict, Optional
+
+from ..dcf_engine import apply_dcf_engine, apply_monte_carlo, apply_sensitivity
+
+
+# ═══════════════════════════════════════════════════════════════
+#  SAMPLE VALUATIONS  (structured data as the pipeline produces it)
+# ═══════════════════════════════════════════════════════════════
+
+RISK_NOTE = ('Revenue growth assumes the new distribution centres reach planned throughput '
+             'within two years; delays would push out the margin expansion, raise working capital '
+             'and lower free cash flow in the early forecast years. ')
+
+
+def extraction_payload(years: int = 10, long_notes: int = 0) -> Dict[str, Any]:
+    """A fictional company's valuation as the extraction call returns it (``EXTRACTION_PROMPT`` schema).
+
+    ``long_notes`` appends that many paragraph-length risk and validation
+    notes (about 200 words each).
+    """
+    data = {
+        'company_name': 'Northwind Traders',
+        'ticker': 'NWT',
+        'country': 'United States',
+        'industry': 'Specialty Retail',
+        'analysis_date': '2026-01-15',
+        'method_summary': 'Ten-year unlevered free cash flow forecast discounted at WACC, '
+                          'with a Gordon-growth terminal value cross-checked against an exit multiple.',
+        'base_year': {'year': 2025, 'revenue': 12_400.0, 'depreciation_amortization_pct': 3.1,
+                      'capex_pct': 4.0, 'nwc_pct': 8.0},
+        'assumptions': {
+            'revenue_growth_rates': '7% tapering to 3%',
+            'margin_assumptions': 'EBIT margin expanding from 11% to 14%',
+            'wacc': 8.6, 'terminal_growth_rate': 2.5, 'exit_multiple': 11.0, 'tax_rate': 24.0,
+            'risk_free_rate': 4.1, 'beta': 1.08, 'equity_risk_premium': 5.0,
+        },
+        'forecast': [
+            {
+                'year': 2026 + i,
+                'revenue_growth_pct': 7.0 - 4.0 * i / max(years - 1, 1),
+                'ebit_margin_pct': 11.0 + 3.0 * i / max(years - 1, 1),
+                'tax_rate': 24.0,
+            }
+            for i in range(years)
+        ],
+        'net_debt': 2_150.0,
+        'shares_outstanding': 410.0,
+        'sensitivity': [
+            {'wacc': wacc, 'growth': growth, 'value_per_share': None}
+            for wacc in (8.1, 8.6, 9.1) for growth in (2.0, 2.5, 3.0)
+        ],
+        'risk_notes': [
+            'Consumer demand is sensitive to the macro cycle.',
+            'Margin expansion depends on supply-chain savings not yet realized.',
+            'Lease obligations are treated as operating and excluded from net debt.',
+        ],
+        'validation_status': 'Validated with minor notes',
+        'validation_notes': ['Terminal growth below long-run nominal GDP.', 'WACC within peer range.'],
+    }
+    for i in range(long_notes):
+        data['risk_notes'].append(f'{i + 1}. ' + RISK_NOTE * 6)
+        data['validation_notes'].append(f'{i + 1}. ' + RISK_NOTE * 6)
+    return data
+
+
+def report_data(years: int = 10, sensitivity: Optional[Dict[str, Any]] = None,
+                monte_carlo: Optional[Dict[str, Any]] = None, long_notes: int = 0) -> Dict[str, Any]:
+    """A complete structured valuation for a fictional company, run through the DCF engine.
+
+    ``sensitivity`` / ``monte_carlo`` are the request options of those stages;
+    the Monte Carlo stage only runs when ``monte_carlo`` is given.
+    """
+    data = apply_dcf_engine(extraction_payload(years, long_notes))
+    data = apply_sensitivity(data, sensitivity)
+    if monte_carlo is not None:
+        data = apply_monte_carlo(data, {'seed': 7, **monte_carlo})
+    return data
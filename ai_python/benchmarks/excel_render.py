@@ -0,0 +1,42 @@
+import argparse
+import time
+import tracemalloc
+
+from ..reports import create_excel
+from .data import report_data
+
+
+# ═══════════════════════════════════════════════════════════════
+#  EXCEL RENDERING  (time and peak memory by sensitivity grid size)
+# ═══════════════════════════════════════════════════════════════
+
+GRID_STEPS = (9, 51, 101, 201)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Excel workbook render time and peak memory by grid size.')
+    parser.add_argument('--repeat', type=int, default=3, help='renders per grid size (best time is kept)')
+    args = parser.parse_args()
+
+    agent_results = [{'agent': i, 'name': f'Agent {i}', 'result': 'Lorem ipsum dolor sit amet.\n' * 400}
+                     for i in range(1, 5)]
+    print(f"{'grid':>9}{'cells':>10}{'ms':>10}{'peak MB':>10}{'xlsx KB':>10}")
+    for steps in GRID_STEPS:
+        data = report_data(sensitivity={'wacc_steps': steps, 'growth_steps': steps, 'exit_multiple_steps': steps},
+                           monte_carlo={'scenarios': 10_000})
+        best = float('inf')
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            size = len(create_excel(data, agent_results))
+            best = min(best, time.perf_counter() - started)
+        # Traced separately: tracemalloc slows allocation-heavy code several fold.
+        tracemalloc.start()
+        create_excel(data, agent_results)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f'{steps:>4} x{steps:<4}{2 * steps * steps:>10,}{best * 1000:>10.0f}'
+              f'{peak / 1e6:>10.1f}{size / 1024:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from ..dcf_engine import apply_dcf_engine, apply_sensitivity
+from ..reports import create_excel, create_word, load_word_template, report_members, write_zip
+from .data import extraction_payload
+
+
+# ═══════════════════════════════════════════════════════════════
+#  REPORT MICRO-BENCHMARKS  (per-stage time and peak memory vs a baseline)
+# ═══════════════════════════════════════════════════════════════
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# Sizes of the synthetic valuations: forecast years, WACC x growth grid
+# (the sensitivity points), and paragraph-length risk / validation notes.
+CASES = {
+    'years-10': {'years': 10},
+    'years-50': {'years': 50},
+    'years-200': {'years': 200},
+    'grid-10': {'sensitivity': {'wacc_steps': 5, 'growth_steps': 2}},
+    'grid-1k': {'sensitivity': {'wacc_steps': 40, 'growth_steps': 25}},
+    'grid-10k': {'sensitivity': {'wacc_steps': 100, 'growth_steps': 100}},
+    'long-notes': {'long_notes': 200},
+}
+
+STAGES = ('parse', 'word', 'excel', 'zip')
+
+# Changes smaller than this are noise whatever the ratio (sub-millisecond stages).
+NOISE_FLOOR = {'median_ms': 1.0, 'peak_mb': 0.1}
+
+AGENT_RESULTS = [{'agent': i, 'name': f'Agent {i}', 'result': 'Lorem ipsum dolor sit amet.\n' * 400}
+                 for i in range(1, 5)]
+
+
+def _stages(options: Dict[str, Any]) -> Dict[str, Callable[[], bytes]]:
+    """One callable per stage, each returning its output bytes.
+
+    "parse" is what the pipeline does with the extraction reply: decode the
+    JSON and recompute the valuation and sensitivity grid from it.
+    """
+    content = json.dumps(extraction_payload(options.get('years', 10), options.get('long_notes', 0)))
+    sensitivity = options.get('sensitivity')
+
+    def parse() -> bytes:
+        apply_sensitivity(apply_dcf_engine(json.loads(content)), sensitivity)
+        return content.encode('utf-8')
+
+    data = apply_sensitivity(apply_dcf_engine(json.loads(content)), sensitivity)
+    word = create_word(data, data['company_name'])
+    excel = create_excel(data, AGENT_RESULTS)
+
+    def package() -> bytes:
+        buffer = io.BytesIO()
+        write_zip(buffer, report_members(word, excel))
+        return buffer.getvalue()
+
+    return {
+        'parse': parse,
+        'word': lambda: create_word(data, data['company_name']),
+        'excel': lambda: create_excel(data, AGENT_RESULTS),
+        'zip': package,
+    }
+
+
+def _measure(run: Callable[[], bytes], repeat: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        output = run()
+        samples.append((time.perf_counter() - started) * 1000)
+    # Traced separately: tracemalloc slows allocation-heavy code several fold.
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'median_ms': round(statistics.median(samples), 2),
+        'min_ms': round(min(samples), 2),
+        'peak_mb': round(peak / 1e6, 2),
+        'output_kb': round(len(output) / 1024, 1),
+    }
+
+
+def run_suite(cases: List[str], repeat: int) -> Dict[str, Any]:
+    """Measure every stage of the given cases; returns the JSON-serializable results."""
+    load_word_template()
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for name in cases:
+        stages = _stages(CASES[name])
+        results[name] = {stage: _measure(stages[stage], repeat) for stage in STAGES}
+        print(f'{name:<12}' + ''.join(
+            f"{stage:>7} {r['median_ms']:>8.1f} ms {r['peak_mb']:>6.1f} MB" for stage, r in results[name].items()))
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Case/stage measurements slower or larger than the baseline by more than ``tolerance``."""
+    regressions = []
+    print(f"\n{'case':<12}{'stage':<7}{'base ms':>10}{'ms':>8}{'change':>9}{'base MB':>10}{'MB':>8}{'change':>9}")
+    for name, stages in current['results'].items():
+        for stage, now in stages.items():
+            before = baseline.get('results', {}).get(name, {}).get(stage)
+            if before is None:
+                continue
+            flags = []
+            line = f'{name:<12}{stage:<7}'
+            for key in ('median_ms', 'peak_mb'):
+                ratio = now[key] / before[key] if before[key] else 1.0
+                line += f'{before[key]:>10.1f}{now[key]:>8.1f}{ratio - 1:>+9.0%}'
+                if ratio > 1 + tolerance and now[key] - before[key] > NOISE_FLOOR[key]:
+                    flags.append(key)
+            if flags:
+                regressions.append(f"{name}/{stage}: {', '.join(flags)}")
+                line += '  REGRESSION'
+            print(line)
+    return regressions
+
+
+def _load(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Time and peak memory of extraction parsing and Word / Excel / ZIP rendering, '
+                    'compared against a stored baseline.')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per case and stage (median time is kept)')
+    parser.add_argument('--case', action='append', choices=sorted(CASES),
+                        help='case to run (repeatable; default: all)')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the new baseline')
+    parser.add_argument('--output', help='also write these results to a JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown / memory growth over the baseline (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    current = run_suite(args.case or list(CASES), max(1, args.repeat))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2)
+        print(f'\nbaseline saved to {args.baseline}')
+        return
+
+    baseline = _load(args.baseline)
+    if baseline is None:
+        print(f'\nno baseline at {args.baseline}; run with --save-baseline to create one')
+        return
+    regressions = compare(current, baseline, args.tolerance)
+    if regressions:
+        print(f'\n{len(regressions)} regression(s) over {args.tolerance:.0%}: ' + '; '.join(regressions))
+        sys.exit(1)
+    print(f"\nno regressions over {args.tolerance:.0%} (baseline from {baseline.get('created')})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import io
+import statistics
+import time
+import zipfile
+from typing import Any, Dict, List, Tuple
+
+from ..reports import WORD_RENDER_MODES, create_word, load_word_template
+from .data import report_data
+
+
+# ═══════════════════════════════════════════════════════════════
+#  WORD RENDERING  (template clones vs python-docx build, per report)
+# ═══════════════════════════════════════════════════════════════
+
+CASES = {
+    'standard': {},
+    'large-grid+mc': {
+        'sensitivity': {'wacc_steps': 41, 'growth_steps': 41, 'exit_multiple_steps': 21},
+        'monte_carlo': {'scenarios': 20_000},
+    },
+}
+
+
+def _parts(docx_bytes: bytes) -> List[Tuple[str, bytes]]:
+    with zipfile.ZipFile(io.BytesIO(docx_bytes)) as package:
+        return [(name, package.read(name)) for name in package.namelist()]
+
+
+def _time(data: Dict[str, Any], mode: str, repeat: int) -> float:
+    """Median milliseconds per report."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        create_word(data, data['company_name'], mode=mode)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Per-report Word rendering time by render mode.')
+    parser.add_argument('--repeat', type=int, default=20, help='reports rendered per case and mode')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    load_word_template()
+    print(f'template built once in {(time.perf_counter() - started) * 1000:.1f} ms')
+
+    print(f"{'case':<16}" + ''.join(f'{mode + " ms":>14}' for mode in WORD_RENDER_MODES) + f"{'speedup':>10}")
+    for name, options in CASES.items():
+        data = report_data(**options)
+        outputs = {mode: _parts(create_word(data, data['company_name'], mode=mode)) for mode in WORD_RENDER_MODES}
+        if outputs['template'] != outputs['build']:
+            raise SystemExit(f'{name}: template and build renderings differ')
+        ms = {mode: _time(data, mode, args.repeat) for mode in WORD_RENDER_MODES}
+        print(f'{name:<16}' + ''.join(f'{ms[mode]:>14.1f}' for mode in WORD_RENDER_MODES)
+              + f"{ms['build'] / ms['template']:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
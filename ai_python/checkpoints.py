@@ -0,0 +1,141 @@
+import logging
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+from .events import broker
+from .jobs import TERMINAL_STATUSES, job_store, new_job
+from .pipeline import run_dcf_pipeline
+from .scheduler import QueueFullError, scheduler
+
+logger = logging.getLogger('dcf_pipeline')
+
+
+# ═══════════════════════════════════════════════════════════════
+#  CHECKPOINTS  (resume a failed job, re-run from agent N)
+# ═══════════════════════════════════════════════════════════════
+
+RESUMABLE_STATUSES = ('error', 'cancelled')
+AGENT_COUNT = 4
+
+# Fields a resume resets; restored as they were if the scheduler rejects the job.
+RESUME_FIELDS = (
+    'status', 'error', 'cancelled', 'interrupted_stage', 'current_agent', 'current_agent_name',
+    'agent_results', 'flight_id', 'queue_position',
+)
+
+
+class CheckpointError(Exception):
+    """The job cannot be resumed or re-run in its current state."""
+
+
+def checkpoint_summary(job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The status-response view of a job's checkpoint (without the extracted data)."""
+    checkpoint = job.get('checkpoint')
+    if not checkpoint:
+        return None
+    return {
+        'stage': checkpoint.get('stage'),
+        'agents': checkpoint.get('agents', 0),
+        'extracted': checkpoint.get('extracted') is not None,
+    }
+
+
+def _check_rerunnable(job: Optional[Dict[str, Any]]) -> None:
+    if job is None:
+        raise CheckpointError('Job not found')
+    if job.get('kind') in ('batch', 'flight'):
+        raise CheckpointError('Only company jobs can be resumed or re-run')
+    if 'prompts' not in job or 'options' not in job:
+        raise CheckpointError('This job was created before checkpoints were kept')
+    batch = job_store.get(job['batch_id']) if job.get('batch_id') else None
+    if batch is not None and batch.get('status') not in TERMINAL_STATUSES:
+        raise CheckpointError("The job's batch is still running")
+
+
+def resume_job(job_id: str, api_key: str, priority: int = 0) -> Optional[int]:
+    """Queue a failed or cancelled job again; it skips the stages its checkpoint covers.
+
+    Agent results past the checkpoint (e.g. a rejected audit) are dropped and
+    those agents run again; the extracted data is reused when present.
+    Returns the queue position; raises CheckpointError or QueueFullError.
+    """
+    with job_store.locked():
+        job = job_store.get(job_id)
+        _check_rerunnable(job)
+        if job['status'] not in RESUMABLE_STATUSES:
+            raise CheckpointError(f'Only failed or cancelled jobs can be resumed (status is "{job["status"]}")')
+        agents = (job.get('checkpoint') or {}).get('agents', 0)
+        previous = {k: job.get(k) for k in RESUME_FIELDS}
+        job_store.update(
+            job_id,
+            status='queued', error=None, cancelled=False, interrupted_stage=None,
+            current_agent=0, current_agent_name='Waiting in queue', flight_id=None, queue_position=None,
+            agent_results=[r for r in job['agent_results'] if r.get('agent', 0) <= agents],
+        )
+        # The old event log ends with a terminal "status"; start a fresh one.
+        broker.forget(job_id)
+        broker.ensure_history(job_id, job_store.get(job_id))
+
+    try:
+        position = scheduler.submit(
+            job_id, api_key, run_dcf_pipeline,
+            args=(job_id, job['company_name'], api_key, job['prompts'], job['options']),
+            priority=priority,
+        )
+    except QueueFullError:
+        job_store.update(job_id, **previous)
+        raise
+    job_store.update(job_id, queue_position=position)
+    logger.info('[Job %s] Resumed after %s (%d agent(s) checkpointed)', job_id[:8],
+                (job.get('checkpoint') or {}).get('stage') or 'no stage', agents)
+    return position
+
+
+def rerun_job(job_id: str, from_agent: int, api_key: str, prompts: Optional[Dict[str, Any]] = None,
+              use_cache: Optional[bool] = None, priority: int = 0) -> Tuple[str, Optional[int]]:
+    """Start a new job that reuses agents 1..from_agent-1 of ``job_id`` and runs the rest.
+
+    ``prompts`` override the source job's prompts (e.g. an edited "agent4");
+    ``use_cache`` = False forces fresh calls for the re-run stages. Returns
+    the new job id and its queue position.
+    """
+    if not 1 <= from_agent <= AGENT_COUNT:
+        raise ValueError(f'from_agent must be between 1 and {AGENT_COUNT}')
+    source = job_store.get(job_id)
+    _check_rerunnable(source)
+    if source['status'] not in TERMINAL_STATUSES:
+        raise CheckpointError('The job is still running; wait for it to finish or cancel it first')
+    agents = (source.get('checkpoint') or {}).get('agents', 0)
+    if agents < from_agent - 1:
+        raise CheckpointError(f'Only agents 1-{agents} have a checkpoint' if agents
+                              else 'No agent of this job has a checkpoint')
+
+    options = dict(source['options'])
+    if use_cache is not None:
+        options['use_cache'] = use_cache
+    merged_prompts = {**(source['prompts'] or {}), **(prompts or {})}
+    new_id = str(uuid.uuid4())
+    job_store.create(new_id, new_job(
+        source['company_name'],
+        prompts=merged_prompts,
+        options=options,
+        rerun_of={'job_id': job_id, 'from_agent': from_agent},
+        checkpoint={'stage': f'agent{from_agent - 1}' if from_agent > 1 else None,
+                    'agents': from_agent - 1, 'extracted': None},
+    ))
+    for result in source['agent_results']:
+        if result.get('agent', 0) < from_agent:
+            job_store.append_result(new_id, {k: result[k] for k in ('agent', 'name', 'result')})
+
+    try:
+        position = scheduler.submit(
+            new_id, api_key, run_dcf_pipeline,
+            args=(new_id, source['company_name'], api_key, merged_prompts, options),
+            priority=priority,
+        )
+    except QueueFullError:
+        job_store.delete(new_id)
+        raise
+    job_store.update(new_id, queue_position=position)
+    logger.info('[Job %s] Re-run of %s from agent %d', new_id[:8], job_id[:8], from_agent)
+    return new_id, position
@@ -0,0 +1,213 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from typing import Any, Dict, Optional
+
+from .artifacts import link_artifact
+from .extraction import EXTRACTION_MODEL
+from .jobs import TERMINAL_STATUSES, job_store, new_job
+from .pipeline import AGENT_MODEL, cancel_job, interrupted_stage, run_dcf_pipeline
+from .scheduler import scheduler
+
+logger = logging.getLogger('dcf_pipeline')
+
+
+# ═══════════════════════════════════════════════════════════════
+#  SINGLE-FLIGHT  (identical concurrent requests share one run)
+# ═══════════════════════════════════════════════════════════════
+
+# Fields of the executing run copied onto every attached job.
+MIRROR_FIELDS = (
+    'status', 'current_agent', 'current_agent_name', 'error', 'queue_position',
+    'download_ready', 'artifact_path', 'artifact_size', 'artifact_etag', 'zip_filename', 'summary',
+    'interrupted_stage', 'render_timings', 'telemetry', 'checkpoint', 'extraction', 'rate_limit',
+)
+
+
+def normalize_company(name: str) -> str:
+    """Dedupe key of a company name: collapsed whitespace, case-insensitive."""
+    return ' '.join(name.split()).casefold()
+
+
+def flight_key(company_name: str, api_key: str, prompts: Dict[str, Any], options: Dict[str, Any]) -> str:
+    """Identity of a run: API key, company, prompts, models and valuation options.
+
+    The key is part of it so a run (its billing, per-key limits and results)
+    is only ever shared between requests of the same tenant.
+    """
+    payload = json.dumps([
+        hashlib.sha256(api_key.encode('utf-8')).hexdigest(),
+        normalize_company(company_name),
+        prompts or {},
+        AGENT_MODEL,
+        EXTRACTION_MODEL,
+        {k: v for k, v in (options or {}).items() if k != 'use_cache'},
+    ], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class FlightRegistry:
+    """Runs each distinct request of an API key once and fans its progress out to every job asking for it.
+
+    A user-visible job never executes the pipeline itself: it follows a hidden
+    "flight" record (``kind`` = "flight") that does. A new request whose
+    ``flight_key`` matches a flight still queued or running attaches to it and
+    receives a copy of its progress so far; later writes to the flight are
+    mirrored onto each follower by a job-store change listener. Cancelling a
+    job detaches only that follower; the flight itself is cancelled when its
+    last follower leaves. Requests with ``bypass_cache`` never attach.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._flights: Dict[str, Dict[str, Any]] = {}
+        self._by_key: Dict[str, str] = {}
+        self._flight_of: Dict[str, str] = {}
+        self._coalesced = 0
+
+    def submit(self, job_id: str, company_name: str, api_key: str, prompts: Dict[str, Any],
+               options: Dict[str, Any], priority: int = 0) -> Optional[int]:
+        """Attach ``job_id`` to an identical live run or start a new one.
+
+        Returns the run's queue position (None once started). Raises
+        QueueFullError when a new run cannot be admitted.
+        """
+        key = flight_key(company_name, api_key, prompts, options)
+        coalesce = options.get('use_cache', True)
+
+        if coalesce:
+            with job_store.locked():
+                with self._lock:
+                    flight_id = self._by_key.get(key)
+                    if flight_id is not None:
+                        self._flights[flight_id]['followers'].add(job_id)
+                        self._flight_of[job_id] = flight_id
+                        self._coalesced += 1
+                if flight_id is not None:
+                    self._copy_progress(flight_id, job_id)
+                    logger.info('[Job %s] Attached to running job %s for "%s"',
+                                job_id[:8], flight_id[:8], company_name)
+                    return scheduler.position(flight_id)
+
+        flight_id = str(uuid.uuid4())
+        job_store.create(flight_id, new_job(company_name, kind='flight'))
+        with self._lock:
+            self._flights[flight_id] = {'key': key, 'followers': {job_id}}
+            self._flight_of[job_id] = flight_id
+        job_store.update(job_id, flight_id=flight_id)
+        try:
+            position = scheduler.submit(
+                flight_id, api_key, run_dcf_pipeline,
+                args=(flight_id, company_name, api_key, prompts, options),
+                priority=priority,
+            )
+        except Exception:
+            with self._lock:
+                self._drop_locked(flight_id)
+            job_store.delete(flight_id)
+            raise
+        # Only now can identical requests attach; a rejected run never had followers.
+        with self._lock:
+            if flight_id in self._flights:
+                self._by_key.setdefault(key, flight_id)
+        return position
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel one job; its run stops only if no other job still follows it."""
+        with job_store.locked():
+            with self._lock:
+                flight_id = self._flight_of.pop(job_id, None)
+                last = False
+                if flight_id is not None:
+                    flight = self._flights[flight_id]
+                    flight['followers'].discard(job_id)
+                    last = not flight['followers']
+                    if last:
+                        # Nobody may attach to a run that is being cancelled.
+                        self._by_key.pop(flight['key'], None)
+            if flight_id is None:
+                return cancel_job(job_id)
+            job = job_store.get(job_id)
+            job_store.update(job_id, cancelled=True)
+            cancelled = job_store.update_if_status(
+                job_id, ('queued', 'running'),
+                status='cancelled', current_agent_name='Cancelled by user',
+                interrupted_stage=interrupted_stage(job, 'cancelled'),
+            )
+        if last:
+            logger.info('[Job %s] Last follower left, cancelling run', flight_id[:8])
+            cancel_job(flight_id)
+        return cancelled
+
+    def job_changed(self, job_id: str, changes: Dict[str, Any], job: Dict[str, Any]) -> None:
+        """JobStore change listener: mirror a flight's writes onto its followers."""
+        with self._lock:
+            flight = self._flights.get(job_id)
+            if flight is None:
+                return
+            followers = list(flight['followers'])
+            finished = job.get('status') in TERMINAL_STATUSES
+            if finished:
+                self._drop_locked(job_id)
+
+        if 'agent_result' in changes:
+            result = {k: v for k, v in changes['agent_result'].items() if k != 'version'}
+            for follower in followers:
+                job_store.append_result(follower, result)
+            return
+
+        fields = {k: changes[k] for k in MIRROR_FIELDS if k in changes}
+        if fields:
+            for follower in followers:
+                self._mirror(job_id, follower, fields)
+        if finished:
+            # Followers own hard links to the artifact, so the run record can go.
+            job_store.delete(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'runs': len(self._flights),
+                'jobs': len(self._flight_of),
+                'coalesced': self._coalesced,
+            }
+
+    # ── Internals ──
+
+    def _mirror(self, flight_id: str, follower: str, fields: Dict[str, Any]) -> None:
+        fields = dict(fields)
+        if fields.get('artifact_path'):
+            try:
+                fields['artifact_path'] = link_artifact(
+                    fields['artifact_path'], follower, os.path.basename(fields['artifact_path']))
+            except OSError as e:
+                logger.error('[Job %s] Could not share report of run %s: %s', follower[:8], flight_id[:8], e)
+                fields.update(download_ready=False, artifact_path=None, status='error',
+                              error='The report could not be prepared for download.')
+        job_store.update_if_status(follower, ('queued', 'running'), **fields)
+
+    def _copy_progress(self, flight_id: str, follower: str) -> None:
+        """Bring a newly attached follower up to the flight's current state (store lock held)."""
+        flight = job_store.get(flight_id) or {}
+        job = job_store.get(follower) or {}
+        # Results get the version of the write below so ``?since=`` polling sees them.
+        version = job.get('version', 0) + 1
+        results = [{**r, 'version': version} for r in flight.get('agent_results', [])]
+        fields = {k: flight[k] for k in MIRROR_FIELDS if k in flight and k != 'artifact_path'}
+        job_store.update(follower, flight_id=flight_id, agent_results=results, **fields)
+
+    def _drop_locked(self, flight_id: str) -> None:
+        flight = self._flights.pop(flight_id, None)
+        if flight is None:
+            return
+        if self._by_key.get(flight['key']) == flight_id:
+            del self._by_key[flight['key']]
+        for follower in flight['followers']:
+            self._flight_of.pop(follower, None)
+
+
+# Process-wide registry shared by single and batch requests
+flights = FlightRegistry()
@@ -0,0 +1,228 @@
+import json
+import logging
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger('dcf_pipeline')
+
+
+# ═══════════════════════════════════════════════════════════════
+#  CONTEXT PACKING  (token-budgeted hand-off between agents)
+# ═══════════════════════════════════════════════════════════════
+
+# Tokens of each earlier agent's output a downstream agent receives, by
+# consumer then source; override with DCF_CONTEXT_BUDGETS='{"agent4": {"agent3": 1200}}'.
+CONTEXT_BUDGETS: Dict[str, Dict[str, int]] = {
+    'agent2': {'agent1': 600},
+    'agent3': {'agent2': 1000},
+    'agent4': {'agent1': 300, 'agent2': 500, 'agent3': 1000},
+}
+try:
+    for _consumer, _sources in json.loads(os.environ.get('DCF_CONTEXT_BUDGETS') or '{}').items():
+        CONTEXT_BUDGETS.setdefault(_consumer, {}).update({src: int(n) for src, n in _sources.items()})
+except (ValueError, TypeError, AttributeError) as e:
+    logger.error('Ignoring invalid DCF_CONTEXT_BUDGETS: %s', e)
+
+# Lines that carry what the next agents (and the extraction) actually use.
+KEY_TERMS = {
+    'agent1': ('company status', 'legal name', 'ticker', 'country', 'industry', 'sector', 'exchange'),
+    'agent2': ('revenue', 'ebit', 'margin', 'wacc', 'beta', 'risk-free', 'equity risk', 'cost of debt',
+               'tax', 'debt', 'cash', 'shares', 'capex', 'd&a', 'depreciation', 'working capital', 'nwc',
+               'data quality'),
+    'agent3': ('wacc', 'terminal', 'growth', 'enterprise value', 'equity value', 'per share', 'fcf',
+               'free cash flow', 'present value', 'exit multiple', 'sensitivity', 'base-year', 'base year'),
+}
+BOILERPLATE = re.compile(
+    r'^\s*(thought:|i now (can give|know)|final answer:?\s*$|note:|disclaimer|this (analysis|report) is '
+    r'(for|provided)|please note|as an ai)',
+    re.IGNORECASE,
+)
+OMITTED = '[...]'
+# Tokenizer of the agent and extraction models.
+TOKENIZER_MODEL = 'gpt-4.1-mini'
+
+_TABLE_ROW = re.compile(r'^\s*\|.*\|\s*$')
+_HEADING = re.compile(r'^\s*(#{1,6}\s+\S.*|\*\*[^*]+\*\*:?|[^|:]{2,80}:)\s*$')
+_LIST_ITEM = re.compile(r'^\s*([-*•]|\d+[.)])\s+')
+_NUMBER = re.compile(r'\d[\d,]*(\.\d+)?\s*(%|x\b)?')
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+_encoder: Any = None
+_encoder_lock = threading.Lock()
+
+
+def _encoding() -> Any:
+    """tiktoken encoding of TOKENIZER_MODEL, or False when it cannot be loaded."""
+    global _encoder
+    if _encoder is None:
+        with _encoder_lock:
+            if _encoder is None:
+                try:
+                    import tiktoken
+                    try:
+                        _encoder = tiktoken.encoding_for_model(TOKENIZER_MODEL)
+                    except KeyError:
+                        _encoder = tiktoken.get_encoding('o200k_base')
+                except Exception as e:
+                    # tiktoken fetches its BPE file once; offline without a cache, estimate instead.
+                    logger.warning('tiktoken unavailable (%s); estimating context tokens', e)
+                    _encoder = False
+    return _encoder
+
+
+def preload_tokenizer() -> None:
+    """Load the tokenizer in the background so the first pipeline does not wait for it."""
+    threading.Thread(target=_encoding, name='dcf-tokenizer-load', daemon=True).start()
+
+
+def count_tokens(text: str) -> int:
+    """Tokens of ``text`` for the agent model (estimated when tiktoken is unavailable)."""
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return max(1, (len(text) + 3) // 4)
+
+
+def split_blocks(text: str) -> List[Dict[str, Any]]:
+    """Split an agent output into headings, tables, list items and paragraphs.
+
+    Each block keeps its position, its section heading and its kind; tables
+    and list items are never merged with their neighbours so packing can
+    drop or keep them whole.
+    """
+    blocks: List[Dict[str, Any]] = []
+    heading: Optional[int] = None
+    current: List[str] = []
+    kind = ''
+
+    def flush() -> None:
+        nonlocal current
+        if current:
+            blocks.append({'kind': kind, 'text': '\n'.join(current), 'heading': heading})
+            current = []
+
+    for line in text.splitlines():
+        if not line.strip():
+            flush()
+        elif _TABLE_ROW.match(line):
+            if kind != 'table':
+                flush()
+                kind = 'table'
+            current.append(line)
+        elif _HEADING.match(line):
+            flush()
+            blocks.append({'kind': 'heading', 'text': line.rstrip(), 'heading': None})
+            heading = len(blocks) - 1
+            kind = ''
+        elif _LIST_ITEM.match(line) or kind == 'table':
+            flush()
+            kind = 'item' if _LIST_ITEM.match(line) else 'text'
+            current.append(line)
+        else:
+            if not current:
+                kind = 'text'
+            current.append(line)
+    flush()
+    for i, block in enumerate(blocks):
+        block['index'] = i
+    return blocks
+
+
+def _priority(block: Dict[str, Any], terms: Sequence[str]) -> float:
+    text = block['text'].lower()
+    if BOILERPLATE.match(text):
+        return 0.0
+    score = 1.0
+    score += 2.0 * sum(term in text for term in terms)
+    score += min(len(_NUMBER.findall(text)), 12) * 0.5
+    if block['kind'] == 'table':
+        score += 3.0
+    # Earlier content is usually the summary the rest elaborates on.
+    return score - block['index'] * 0.01
+
+
+def _truncate(block: Dict[str, Any], budget: int) -> Optional[str]:
+    """The longest whole-row / whole-sentence prefix of a block within ``budget`` tokens."""
+    if block['kind'] == 'table':
+        rows = block['text'].split('\n')
+        header = 2 if len(rows) > 2 and set(rows[1].replace('|', '').strip()) <= set('-: ') else 1
+        kept = rows[:header]
+        for row in rows[header:]:
+            if count_tokens('\n'.join(kept + [row])) > budget:
+                break
+            kept.append(row)
+        return '\n'.join(kept) if len(kept) > header else None
+    kept: List[str] = []
+    for sentence in _SENTENCE_END.split(block['text']):
+        if count_tokens(' '.join(kept + [sentence])) > budget:
+            break
+        kept.append(sentence)
+    return ' '.join(kept) if kept else None
+
+
+def pack_context(text: str, budget: int, source: str = '') -> str:
+    """Fit an agent output into ``budget`` tokens, keeping its most useful blocks.
+
+    Output within budget is returned unchanged. Otherwise blocks are taken
+    by priority (tables, lines with the key terms of ``source`` and figures
+    first, boilerplate last), each with its section heading, and emitted in
+    their original order with ``[...]`` where content was left out. A block
+    is only cut at a row or sentence boundary.
+    """
+    text = (text or '').strip()
+    if count_tokens(text) <= budget:
+        return text
+    blocks = split_blocks(text)
+    terms = KEY_TERMS.get(source, ())
+    # Every kept block also pays for its separator and a possible omission marker.
+    overhead = count_tokens(f'\n\n{OMITTED}\n\n')
+    costs = {b['index']: count_tokens(b['text']) + overhead for b in blocks}
+    priorities = {b['index']: _priority(b, terms) for b in blocks if b['kind'] != 'heading'}
+    # Value per token, so a few key lines are not pushed out by one long table.
+    order = sorted(priorities, key=lambda i: -priorities[i] / costs[i])
+    chosen: Dict[int, str] = {}
+    remaining = budget - overhead
+
+    for index in order:
+        if remaining <= overhead:
+            break
+        if priorities[index] <= 0:
+            continue
+        block = blocks[index]
+        heading = block['heading']
+        heading_cost = costs[heading] if heading is not None and heading not in chosen else 0
+        body = block['text']
+        cost = costs[index] + heading_cost
+        if cost > remaining:
+            body = _truncate(block, remaining - heading_cost - overhead)
+            if body is None:
+                continue
+            cost = count_tokens(body) + overhead + heading_cost
+        chosen[index] = body
+        if heading_cost:
+            chosen[heading] = blocks[heading]['text']
+        remaining -= cost
+
+    packed = ''
+    previous = -1
+    for index in sorted(chosen):
+        if index != previous + 1:
+            packed += f'\n\n{OMITTED}\n\n' if packed else f'{OMITTED}\n\n'
+        elif packed:
+            # Consecutive list items stay one list.
+            packed += '\n' if blocks[index]['kind'] == blocks[previous]['kind'] == 'item' else '\n\n'
+        packed += chosen[index]
+        previous = index
+    if previous != len(blocks) - 1:
+        packed += f'\n\n{OMITTED}'
+    return packed
+
+
+def agent_context(consumer: str, source: str, text: str) -> str:
+    """``source``'s output packed into the budget ``consumer`` gives it."""
+    budget = CONTEXT_BUDGETS.get(consumer, {}).get(source)
+    return pack_context(text, budget, source) if budget is not None else (text or '')
@@ -0,0 +1,461 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger('dcf_pipeline')
+
+
+# ═══════════════════════════════════════════════════════════════
+#  DCF ENGINE  (deterministic valuation arithmetic)
+# ═══════════════════════════════════════════════════════════════
+#
+# The agents and the extraction call only supply *inputs* (base-year revenue
+# and year-by-year drivers). Everything derived from them — forecast rows,
+# discount factors, PV, terminal value, EV, equity and per-share value — is
+# computed here so the reports are always arithmetically consistent.
+#
+# Conventions: rates inside the engine are decimals (0.09), the structured
+# dict uses plain percentages (9.0). Monetary values are in millions.
+
+
+def _num(val: Any) -> Optional[float]:
+    try:
+        f = float(val)
+    except (TypeError, ValueError):
+        return None
+    return f if np.isfinite(f) else None
+
+
+def _series(values: List[Any], default: Optional[float]) -> Optional[np.ndarray]:
+    """Forward-fill missing values; leading gaps take ``default``."""
+    out = []
+    last = default
+    for v in values:
+        f = _num(v)
+        if f is not None:
+            last = f
+        out.append(last)
+    if any(v is None for v in out):
+        return None
+    return np.asarray(out, dtype=float)
+
+
+def _pct(val: Any) -> Optional[float]:
+    f = _num(val)
+    return f / 100.0 if f is not None else None
+
+
+def _ratio(numer: List[Any], denom: List[Any]) -> List[Optional[float]]:
+    out: List[Optional[float]] = []
+    for n, d in zip(numer, denom):
+        n, d = _num(n), _num(d)
+        out.append(abs(n) / d if n is not None and d else None)
+    return out
+
+
+def compute_dcf(
+    base_revenue: float,
+    growth: np.ndarray,
+    ebit_margin: np.ndarray,
+    tax_rate: np.ndarray,
+    da_pct: np.ndarray,
+    capex_pct: np.ndarray,
+    nwc_pct: np.ndarray,
+    wacc: float,
+    terminal_growth: float,
+    net_debt: float = 0.0,
+    shares: Optional[float] = None,
+    mid_year: bool = False,
+) -> Dict[str, Any]:
+    """Vectorized FCFF DCF over ``len(growth)`` forecast years.
+
+    ``da_pct``/``capex_pct`` are shares of revenue; ``nwc_pct`` is the change
+    in net working capital as a share of the change in revenue. The terminal
+    value uses the Gordon growth formula on the final year's FCFF.
+    """
+    if wacc <= terminal_growth:
+        raise ValueError(f'WACC ({wacc:.4f}) must exceed terminal growth ({terminal_growth:.4f})')
+
+    n = growth.shape[0]
+    revenue = base_revenue * np.cumprod(1.0 + growth)
+    prev_revenue = np.concatenate(([base_revenue], revenue[:-1]))
+    ebit = revenue * ebit_margin
+    nopat = ebit * (1.0 - tax_rate)
+    da = revenue * da_pct
+    capex = revenue * capex_pct
+    change_nwc = (revenue - prev_revenue) * nwc_pct
+    fcff = nopat + da - capex - change_nwc
+
+    periods = np.arange(1, n + 1, dtype=float) - (0.5 if mid_year else 0.0)
+    discount_factor = (1.0 + wacc) ** -periods
+    pv_fcf = fcff * discount_factor
+
+    terminal_value = fcff[-1] * (1.0 + terminal_growth) / (wacc - terminal_growth)
+    pv_terminal_value = terminal_value * (1.0 + wacc) ** -float(n)
+    enterprise_value = pv_fcf.sum() + pv_terminal_value
+    equity_value = enterprise_value - net_debt
+
+    return {
+        'revenue': revenue,
+        'growth': growth,
+        'ebit_margin': ebit_margin,
+        'ebit': ebit,
+        'tax_rate': tax_rate,
+        'nopat': nopat,
+        'da': da,
+        'capex': capex,
+        'change_nwc': change_nwc,
+        'fcff': fcff,
+        'discount_factor': discount_factor,
+        'pv_fcf': pv_fcf,
+        'terminal_value': float(terminal_value),
+        'pv_terminal_value': float(pv_terminal_value),
+        'enterprise_value': float(enterprise_value),
+        'net_debt': float(net_debt),
+        'equity_value': float(equity_value),
+        'shares_outstanding': shares,
+        'intrinsic_value_per_share': float(equity_value / shares) if shares else None,
+    }
+
+
+def engine_inputs(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Build ``compute_dcf`` keyword arguments from the extracted JSON.
+
+    Year-by-year drivers come from the ``forecast`` rows (growth, margin, tax
+    and D&A / capex / NWC ratios); ``base_year`` percentages fill any gaps.
+    Raises ValueError when a required input is missing.
+    """
+    assumptions = data.get('assumptions') or {}
+    base = data.get('base_year') or {}
+    forecast = data.get('forecast') or []
+    if not forecast:
+        raise ValueError('forecast drivers are missing')
+
+    wacc = _num(assumptions.get('wacc'))
+    terminal_growth = _num(assumptions.get('terminal_growth_rate'))
+    if wacc is None or terminal_growth is None:
+        raise ValueError('WACC and terminal growth rate are required')
+
+    growth = _series([r.get('revenue_growth_pct') for r in forecast], None)
+    margin = _series([r.get('ebit_margin_pct') for r in forecast], None)
+    if growth is None or margin is None:
+        raise ValueError('revenue growth and EBIT margin drivers are required')
+    tax = _series([r.get('tax_rate') for r in forecast], _num(assumptions.get('tax_rate')))
+    if tax is None:
+        raise ValueError('a tax rate is required')
+
+    base_revenue = _num(base.get('revenue'))
+    if base_revenue is None:
+        first_revenue = _num(forecast[0].get('revenue'))
+        if first_revenue is None:
+            raise ValueError('base-year revenue is required')
+        base_revenue = first_revenue / (1.0 + growth[0] / 100.0)
+
+    revenues = [r.get('revenue') for r in forecast]
+    prev_revenues = [base_revenue] + revenues[:-1]
+    revenue_deltas = [
+        (_num(cur) - _num(prev)) if _num(cur) is not None and _num(prev) is not None else None
+        for cur, prev in zip(revenues, prev_revenues)
+    ]
+    da_pct = _series(
+        _ratio([r.get('depreciation_amortization') for r in forecast], revenues),
+        _pct(base.get('depreciation_amortization_pct')),
+    )
+    capex_pct = _series(
+        _ratio([r.get('capex') for r in forecast], revenues),
+        _pct(base.get('capex_pct')),
+    )
+    if _num(base.get('nwc_pct')) is not None:
+        nwc_pct = np.full(len(forecast), _pct(base.get('nwc_pct')))
+    else:
+        nwc_pct = _series(
+            [(_num(r.get('change_nwc')) / d) if _num(r.get('change_nwc')) is not None and d else None
+             for r, d in zip(forecast, revenue_deltas)],
+            None,
+        )
+    # A missing cash-flow driver is not zero: better keep the stated figures than invent FCFF.
+    if da_pct is None or capex_pct is None or nwc_pct is None:
+        raise ValueError('D&A, capex and working-capital drivers are required')
+
+    return {
+        'base_revenue': base_revenue,
+        'growth': growth / 100.0,
+        'ebit_margin': margin / 100.0,
+        'tax_rate': tax / 100.0,
+        'da_pct': da_pct,
+        'capex_pct': capex_pct,
+        'nwc_pct': nwc_pct,
+        'wacc': wacc / 100.0,
+        'terminal_growth': terminal_growth / 100.0,
+        'net_debt': _num(data.get('net_debt')) or 0.0,
+        'shares': _num(data.get('shares_outstanding')),
+    }
+
+
+def apply_dcf_engine(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a copy of ``data`` with all valuation arithmetic recomputed.
+
+    The LLM's own headline numbers are kept under ``llm_reported`` so the
+    difference can be audited.
+    """
+    inputs = engine_inputs(data)
+    result = compute_dcf(**inputs)
+
+    forecast_in = data.get('forecast') or []
+    forecast = []
+    for i, row in enumerate(forecast_in):
+        forecast.append({
+            'year': row.get('year'),
+            'revenue': float(result['revenue'][i]),
+            'revenue_growth_pct': float(result['growth'][i] * 100.0),
+            'ebit_margin_pct': float(result['ebit_margin'][i] * 100.0),
+            'ebit': float(result['ebit'][i]),
+            'tax_rate': float(result['tax_rate'][i] * 100.0),
+            'nopat': float(result['nopat'][i]),
+            'depreciation_amortization': float(result['da'][i]),
+            'capex': float(result['capex'][i]),
+            'change_nwc': float(result['change_nwc'][i]),
+            'fcff': float(result['fcff'][i]),
+            'discount_factor': float(result['discount_factor'][i]),
+            'pv_fcf': float(result['pv_fcf'][i]),
+        })
+
+    out = dict(data)
+    out['llm_reported'] = {
+        k: data.get(k) for k in (
+            'terminal_value', 'pv_terminal_value', 'enterprise_value',
+            'equity_value', 'intrinsic_value_per_share',
+        )
+    }
+    out['forecast'] = forecast
+    for k in ('terminal_value', 'pv_terminal_value', 'enterprise_value', 'net_debt',
+              'equity_value', 'intrinsic_value_per_share'):
+        out[k] = result[k]
+    out['valuation_source'] = 'dcf_engine'
+    return out
+
+
+# ═══════════════════════════════════════════════════════════════
+#  SENSITIVITY GRID  (WACC × terminal growth, optional exit multiple)
+# ═══════════════════════════════════════════════════════════════
+
+SENSITIVITY_DEFAULTS = {
+    'wacc_steps': 9,
+    'wacc_step': 0.5,         # percentage points
+    'growth_steps': 9,
+    'growth_step': 0.25,      # percentage points
+    'exit_multiple_steps': 0,  # 0 disables the exit-multiple axis
+    'exit_multiple_step': 1.0,
+}
+MAX_SENSITIVITY_STEPS = 201
+
+
+def _axis(center: float, steps: int, step: float) -> np.ndarray:
+    steps = int(min(max(steps, 1), MAX_SENSITIVITY_STEPS))
+    return center + (np.arange(steps, dtype=float) - (steps - 1) / 2.0) * step
+
+
+def sensitivity_config(config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge a request's ``sensitivity`` options over the defaults (validated)."""
+    merged = dict(SENSITIVITY_DEFAULTS)
+    for key, value in (config or {}).items():
+        if key not in SENSITIVITY_DEFAULTS:
+            raise ValueError(f'Unknown sensitivity option "{key}"')
+        num = _num(value)
+        if num is None or num < 0:
+            raise ValueError(f'Sensitivity option "{key}" must be a non-negative number')
+        merged[key] = num
+    return merged
+
+
+def sensitivity_grid(
+    fcff: np.ndarray,
+    wacc: np.ndarray,
+    growth: np.ndarray,
+    net_debt: float = 0.0,
+    shares: Optional[float] = None,
+    exit_multiples: Optional[np.ndarray] = None,
+    terminal_ebitda: Optional[float] = None,
+    mid_year: bool = False,
+) -> Dict[str, Any]:
+    """Value per share (or equity value without shares) over every WACC × growth pair.
+
+    Rates are decimals. The PV of the explicit forecast is one matrix-vector
+    product per WACC; the terminal value is broadcast over the (WACC, growth)
+    plane. Cells with WACC <= growth are NaN. With ``exit_multiples`` a second
+    (WACC, multiple) plane values the terminal year at multiple × EBITDA.
+    """
+    n = fcff.shape[0]
+    periods = np.arange(1, n + 1, dtype=float) - (0.5 if mid_year else 0.0)
+    w = wacc[:, None]
+    discount = (1.0 + w) ** -periods[None, :]          # (W, n)
+    pv_explicit = discount @ fcff                        # (W,)
+    terminal_discount = (1.0 + wacc) ** -float(n)        # (W,)
+    divisor = shares if shares else 1.0
+
+    spread = w - growth[None, :]                         # (W, G)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tv = np.where(spread > 0, fcff[-1] * (1.0 + growth[None, :]) / spread, np.nan)
+    equity = pv_explicit[:, None] + tv * terminal_discount[:, None] - net_debt
+    grid = {'value_grid': equity / divisor}
+
+    if exit_multiples is not None and terminal_ebitda is not None:
+        tv_exit = exit_multiples[None, :] * terminal_ebitda  # (1, M)
+        equity_exit = pv_explicit[:, None] + tv_exit * terminal_discount[:, None] - net_debt
+        grid['exit_value_grid'] = equity_exit / divisor
+    return grid
+
+
+def _rows(matrix: np.ndarray) -> List[List[Optional[float]]]:
+    return [[float(v) if np.isfinite(v) else None for v in row] for row in matrix]
+
+
+def apply_sensitivity(data: Dict[str, Any], config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Return a copy of ``data`` with a dense ``sensitivity_grid`` built from its forecast.
+
+    Expects engine-consistent ``forecast`` rows (see ``apply_dcf_engine``).
+    Raises ValueError when the forecast or centre assumptions are missing.
+    """
+    cfg = sensitivity_config(config)
+    assumptions = data.get('assumptions') or {}
+    forecast = data.get('forecast') or []
+    wacc = _num(assumptions.get('wacc'))
+    growth = _num(assumptions.get('terminal_growth_rate'))
+    fcff = _series([r.get('fcff') for r in forecast], None) if forecast else None
+    if wacc is None or growth is None or fcff is None:
+        raise ValueError('forecast FCFF, WACC and terminal growth are required for sensitivity')
+
+    wacc_axis = _axis(wacc, int(cfg['wacc_steps']), cfg['wacc_step'])
+    growth_axis = _axis(growth, int(cfg['growth_steps']), cfg['growth_step'])
+    shares = _num(data.get('shares_outstanding'))
+
+    exit_axis = None
+    terminal_ebitda = None
+    exit_center = _num(assumptions.get('exit_multiple'))
+    if cfg['exit_multiple_steps'] and exit_center is not None:
+        exit_axis = np.clip(_axis(exit_center, int(cfg['exit_multiple_steps']), cfg['exit_multiple_step']), 0, None)
+        last = forecast[-1]
+        terminal_ebitda = (_num(last.get('ebit')) or 0.0) + (_num(last.get('depreciation_amortization')) or 0.0)
+
+    grid = sensitivity_grid(
+        fcff,
+        wacc_axis / 100.0,
+        growth_axis / 100.0,
+        net_debt=_num(data.get('net_debt')) or 0.0,
+        shares=shares,
+        exit_multiples=exit_axis,
+        terminal_ebitda=terminal_ebitda,
+    )
+
+    out = dict(data)
+    out['sensitivity_grid'] = {
+        'metric': 'value_per_share' if shares else 'equity_value',
+        'wacc': [float(v) for v in wacc_axis],
+        'growth': [float(v) for v in growth_axis],
+        'values': _rows(grid['value_grid']),
+    }
+    if exit_axis is not None:
+        out['sensitivity_grid']['exit_multiple'] = [float(v) for v in exit_axis]
+        out['sensitivity_grid']['exit_values'] = _rows(grid['exit_value_grid'])
+    return out
+
+
+# ═══════════════════════════════════════════════════════════════
+#  MONTE CARLO VALUATION  (opt-in: mode = "monte_carlo")
+# ═══════════════════════════════════════════════════════════════
+
+MONTE_CARLO_DEFAULTS = {
+    'scenarios': 100_000,
+    'chunk_size': 16_384,
+    'seed': None,
+    'growth_sd': 2.0,            # pp shift applied to every forecast year's growth
+    'margin_sd': 2.0,            # pp shift applied to every forecast year's EBIT margin
+    'wacc_sd': 1.0,              # pp
+    'terminal_growth_sd': 0.5,   # pp
+    'min_spread': 0.5,           # pp: terminal growth is capped at WACC - min_spread
+    'bins': 50,
+}
+MAX_MONTE_CARLO_SCENARIOS = 2_000_000
+MONTE_CARLO_PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+
+
+def monte_carlo_config(config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge a request's ``monte_carlo`` options over the defaults (validated)."""
+    merged = dict(MONTE_CARLO_DEFAULTS)
+    for key, value in (config or {}).items():
+        if key not in MONTE_CARLO_DEFAULTS:
+            raise ValueError(f'Unknown monte_carlo option "{key}"')
+        if key == 'seed' and value is None:
+            continue
+        num = _num(value)
+        if num is None or num < 0:
+            raise ValueError(f'monte_carlo option "{key}" must be a non-negative number')
+        merged[key] = num
+    merged['scenarios'] = int(min(max(merged['scenarios'], 1), MAX_MONTE_CARLO_SCENARIOS))
+    merged['chunk_size'] = int(max(merged['chunk_size'], 1))
+    merged['bins'] = int(min(max(merged['bins'], 1), 500))
+    if merged['seed'] is not None:
+        merged['seed'] = int(merged['seed'])
+    return merged
+
+
+def monte_carlo(inputs: Dict[str, Any], config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Simulate value per share (or equity value) around the ``engine_inputs`` point estimate.
+
+    Scenarios are evaluated ``chunk_size`` at a time as (chunk, years) arrays,
+    so peak memory is bounded by the chunk, not the scenario count.
+    """
+    cfg = monte_carlo_config(config)
+    rng = np.random.default_rng(cfg['seed'])
+    total, chunk = cfg['scenarios'], cfg['chunk_size']
+
+    growth, margin, tax = inputs['growth'], inputs['ebit_margin'], inputs['tax_rate']
+    da_pct, capex_pct, nwc_pct = inputs['da_pct'], inputs['capex_pct'], inputs['nwc_pct']
+    base_revenue, net_debt = inputs['base_revenue'], inputs['net_debt']
+    divisor = inputs['shares'] or 1.0
+    n = growth.shape[0]
+    periods = np.arange(1, n + 1, dtype=float)
+    min_spread = cfg['min_spread'] / 100.0
+
+    values = np.empty(total)
+    for start in range(0, total, chunk):
+        size = min(chunk, total - start)
+        dg = rng.normal(0.0, cfg['growth_sd'] / 100.0, size)[:, None]
+        dm = rng.normal(0.0, cfg['margin_sd'] / 100.0, size)[:, None]
+        wacc = np.maximum(rng.normal(inputs['wacc'], cfg['wacc_sd'] / 100.0, size), min_spread)
+        g = np.minimum(rng.normal(inputs['terminal_growth'], cfg['terminal_growth_sd'] / 100.0, size),
+                       wacc - min_spread)
+
+        revenue = base_revenue * np.cumprod(1.0 + growth[None, :] + dg, axis=1)
+        prev_revenue = np.empty_like(revenue)
+        prev_revenue[:, 0] = base_revenue
+        prev_revenue[:, 1:] = revenue[:, :-1]
+        fcff = (revenue * (margin[None, :] + dm) * (1.0 - tax[None, :])
+                + revenue * (da_pct - capex_pct)[None, :]
+                - (revenue - prev_revenue) * nwc_pct[None, :])
+
+        pv_explicit = (fcff * (1.0 + wacc[:, None]) ** -periods[None, :]).sum(axis=1)
+        tv = fcff[:, -1] * (1.0 + g) / (wacc - g)
+        values[start:start + size] = (pv_explicit + tv * (1.0 + wacc) ** -float(n) - net_debt) / divisor
+
+    pct = np.percentile(values, MONTE_CARLO_PERCENTILES)
+    # Histogram over the 1st-99th percentile range so a few extreme tails do not flatten it.
+    lo, hi = np.percentile(values, (1, 99))
+    counts, edges = np.histogram(np.clip(values, lo, hi), bins=cfg['bins'], range=(lo, hi))
+    return {
+        'metric': 'value_per_share' if inputs['shares'] else 'equity_value',
+        'scenarios': total,
+        'mean': float(values.mean()),
+        'std': float(values.std()),
+        'percentiles': {f'p{p}': float(v) for p, v in zip(MONTE_CARLO_PERCENTILES, pct)},
+        'histogram': {'edges': [float(e) for e in edges], 'counts': [int(c) for c in counts]},
+        'config': {k: v for k, v in cfg.items() if k != 'chunk_size'},
+    }
+
+
+def apply_monte_carlo(data: Dict[str, Any], config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Return a copy of ``data`` with a ``monte_carlo`` summary added."""
+    out = dict(data)
+    out['monte_carlo'] = monte_carlo(engine_inputs(data), config)
+    return out
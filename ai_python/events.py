@@ -0,0 +1,183 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from .jobs import TERMINAL_STATUSES, job_store
+
+logger = logging.getLogger('dcf_pipeline')
+
+
+# ═══════════════════════════════════════════════════════════════
+#  JOB EVENTS  (Server-Sent Events progress stream)
+# ═══════════════════════════════════════════════════════════════
+
+HEARTBEAT_SECONDS = 15.0
+# Events kept per job for replay; a client resuming from before the window gets the
+# job's results and stage rebuilt from the job store instead.
+HISTORY_EVENTS = int(os.environ.get('DCF_SSE_HISTORY_EVENTS', '100'))
+
+STAGE_FIELDS = ('status', 'current_agent', 'current_agent_name', 'queue_position')
+FINAL_FIELDS = ('status', 'error', 'download_ready', 'zip_filename', 'cancelled', 'interrupted_stage')
+
+
+def format_sse(event_id: int, event: str, data: Any) -> str:
+    """Encode one event in text/event-stream framing."""
+    return f'id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+class EventBroker:
+    """Per-job event log that fans job changes out to SSE subscribers.
+
+    Events are published from pipeline worker threads and consumed by async
+    request handlers; each subscriber owns an ``asyncio.Event`` that is set
+    thread-safely on its loop whenever new events arrive. Every job emits:
+
+    - ``stage``         when status / current agent / queue position changes
+    - ``agent_result``  once per completed agent
+    - ``status``        once, when the job reaches a terminal state
+
+    The log keeps the last ``HISTORY_EVENTS`` events of a job, and an
+    ``agent_result`` only as a reference: its text is read back from the
+    job store when the event is sent, so results are not held in memory
+    twice (nor at all with the SQLite store).
+    """
+
+    def __init__(self, history_events: int = HISTORY_EVENTS) -> None:
+        self.history_events = max(1, history_events)
+        self._lock = threading.Lock()
+        self._history: Dict[str, List[Tuple[int, str, Any]]] = {}
+        self._last_id: Dict[str, int] = {}
+        self._last_stage: Dict[str, Tuple] = {}
+        self._finished: Set[str] = set()
+        self._waiters: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+
+    # ── Producers ──
+
+    def publish(self, job_id: str, event: str, data: Any) -> None:
+        if event == 'agent_result':
+            data = {k: v for k, v in data.items() if k != 'result'}
+        with self._lock:
+            history = self._history.setdefault(job_id, [])
+            event_id = self._last_id[job_id] = self._last_id.get(job_id, 0) + 1
+            history.append((event_id, event, data))
+            if len(history) > self.history_events:
+                del history[:len(history) - self.history_events]
+            waiters = list(self._waiters.get(job_id, ()))
+        for loop, flag in waiters:
+            try:
+                loop.call_soon_threadsafe(flag.set)
+            except RuntimeError:
+                # Subscriber's loop already closed.
+                pass
+
+    def job_changed(self, job_id: str, changes: Dict[str, Any], job: Dict[str, Any]) -> None:
+        """JobStore change listener: translate writes into progress events."""
+        if 'agent_result' in changes:
+            self.publish(job_id, 'agent_result', changes['agent_result'])
+            return
+        if not any(k in changes for k in STAGE_FIELDS):
+            return
+
+        if job.get('status') in TERMINAL_STATUSES:
+            with self._lock:
+                if job_id in self._finished:
+                    return
+                self._finished.add(job_id)
+            self.publish(job_id, 'status', {k: job.get(k) for k in FINAL_FIELDS})
+            return
+
+        stage = tuple(job.get(k) for k in STAGE_FIELDS)
+        with self._lock:
+            if self._last_stage.get(job_id) == stage:
+                return
+            self._last_stage[job_id] = stage
+        self.publish(job_id, 'stage', dict(zip(STAGE_FIELDS, stage)))
+
+    def ensure_history(self, job_id: str, job: Dict[str, Any]) -> None:
+        """Rebuild the event log from a stored job (e.g. loaded after a restart)."""
+        with self._lock:
+            if self._history.get(job_id):
+                return
+        for result in job.get('agent_results') or ():
+            self.publish(job_id, 'agent_result', result)
+        self.job_changed(job_id, job, job)
+
+    def forget(self, job_id: str) -> None:
+        """Drop a job's event log (JobStore delete listener)."""
+        with self._lock:
+            self._history.pop(job_id, None)
+            self._last_id.pop(job_id, None)
+            self._last_stage.pop(job_id, None)
+            self._finished.discard(job_id)
+
+    # ── Consumers ──
+
+    def events_since(self, job_id: str, last_id: int) -> List[Tuple[int, str, Any]]:
+        """Events after ``last_id``, with agent results filled in from the job store."""
+        with self._lock:
+            history = list(self._history.get(job_id, ()))
+        events = [e for e in history if e[0] > last_id]
+        trimmed = bool(history) and last_id < history[0][0] - 1
+        if not trimmed and not any(event == 'agent_result' for _, event, _ in events):
+            return events
+        job = job_store.get(job_id) or {}
+        results = job.get('agent_results') or []
+        if trimmed:
+            # The client's position fell out of the window: resend what the store still has.
+            kept = {data.get('version') for _, event, data in events if event == 'agent_result'}
+            catch_up_id = history[0][0] - 1
+            catch_up = [(catch_up_id, 'agent_result', r) for r in results if r.get('version') not in kept]
+            catch_up.append((catch_up_id, 'stage', {k: job.get(k) for k in STAGE_FIELDS}))
+            events = catch_up + events
+        return [(event_id, event, _full_result(data, results) if event == 'agent_result' else data)
+                for event_id, event, data in events]
+
+    async def stream(self, job_id: str, last_id: int = 0,
+                     heartbeat: float = HEARTBEAT_SECONDS) -> AsyncIterator[str]:
+        """Yield SSE frames for ``job_id`` until its terminal ``status`` event."""
+        loop = asyncio.get_running_loop()
+        flag = asyncio.Event()
+        waiter = (loop, flag)
+        with self._lock:
+            self._waiters.setdefault(job_id, set()).add(waiter)
+        try:
+            while True:
+                flag.clear()
+                for event_id, event, data in self.events_since(job_id, last_id):
+                    last_id = event_id
+                    yield format_sse(event_id, event, data)
+                    if event == 'status':
+                        return
+                try:
+                    await asyncio.wait_for(flag.wait(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(job_id)
+                if waiters is not None:
+                    waiters.discard(waiter)
+                    if not waiters:
+                        del self._waiters[job_id]
+
+
+def _full_result(ref: Dict[str, Any], results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """The stored agent result an ``agent_result`` event refers to."""
+    for result in reversed(results):
+        if result.get('agent') == ref.get('agent') and result.get('version') == ref.get('version'):
+            return result
+    return ref
+
+
+def parse_last_event_id(value: Optional[str]) -> int:
+    try:
+        return max(0, int(value or 0))
+    except ValueError:
+        return 0
+
+
+# Process-wide broker fed by the job store
+broker = EventBroker()
@@ -1,5 +1,30 @@
+import asyncio
 import json
-from typing import Any, Dict, List
+import logging
+import math
+import os
+import time
+from datetime import date
+from typing import Annotated, Any, Dict, List, Optional, Tuple
+
+from pydantic import AfterValidator, BaseModel, BeforeValidator, ConfigDict, Field, ValidationError
+
+from .context import count_tokens
+from .llm_cache import cache_key, llm_cache
+from .local_extraction import parse_agent_outputs, parse_number
+from .ratelimit import limiter
+from .scheduler import key_fingerprint
+
+logger = logging.getLogger('dcf_pipeline')
+
+EXTRACTION_MODEL = 'gpt-4.1-mini'
+# "hybrid": parse the agent outputs locally and ask the LLM only for required fields
+# the parser could not resolve; "llm": always extract everything with the LLM;
+# "local": never call the LLM.
+EXTRACTION_MODE = os.environ.get('DCF_EXTRACTION_MODE', 'hybrid').strip().lower()
+if EXTRACTION_MODE not in ('hybrid', 'llm', 'local'):
+    logger.error('Ignoring invalid DCF_EXTRACTION_MODE "%s"; using "hybrid"', EXTRACTION_MODE)
+    EXTRACTION_MODE = 'hybrid'
 
 
 # ═══════════════════════════════════════════════════════════════
@@ -16,6 +41,8 @@ CRITICAL RULES:
 - If a value is truly missing, use null.
 - The forecast array must have exactly 10 years (2026-2035).
 - Do NOT invent data. Extract only what is present in the agent outputs.
+- "base_year" is the last actual (historical) year before the forecast. Its *_pct fields are
+  D&A and capex as % of revenue, and change in NWC as % of the change in revenue.
 - Return ONLY valid JSON, nothing else.
 
 Required JSON structure:
@@ -37,6 +64,13 @@ Required JSON structure:
     "beta": number,
     "equity_risk_premium": number
   },
+  "base_year": {
+    "year": number,
+    "revenue": number,
+    "depreciation_amortization_pct": number or null,
+    "capex_pct": number or null,
+    "nwc_pct": number or null
+  },
   "forecast": [
     {
       "year": 2026,
@@ -70,27 +104,422 @@ Required JSON structure:
 }"""
 
 
-def extract_structured_data(
+# ═══════════════════════════════════════════════════════════════
+#  TYPED SCHEMA  (validates local and LLM extraction alike)
+# ═══════════════════════════════════════════════════════════════
+
+def _number(value: Any) -> Optional[float]:
+    number = parse_number(value)
+    return number if number is not None and math.isfinite(number) else None
+
+
+def _year(value: Any) -> Optional[int]:
+    number = parse_number(value)
+    return int(number) if number is not None and 1900 <= number <= 2200 else None
+
+
+def _text(value: Any) -> Optional[str]:
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    return str(value).strip() or None
+
+
+def _texts(value: Any) -> List[str]:
+    if isinstance(value, str):
+        value = [value]
+    return [str(v).strip() for v in value or () if isinstance(v, (str, int, float)) and str(v).strip()] \
+        if isinstance(value, (list, tuple)) else []
+
+
+def _rows(value: Any) -> List[Any]:
+    return [v for v in value if isinstance(v, dict)] if isinstance(value, list) else []
+
+
+def _section(value: Any) -> Dict[str, Any]:
+    return value if isinstance(value, dict) else {}
+
+
+# Plausible values (percent / plain number); anything outside is treated as not found,
+# so a misread figure goes to the LLM instead of into the valuation.
+PLAUSIBLE_RANGES = {
+    'assumptions.wacc': (0.0, 50.0),
+    'assumptions.terminal_growth_rate': (-50.0, 50.0),
+    'assumptions.tax_rate': (0.0, 100.0),
+    'assumptions.risk_free_rate': (-5.0, 30.0),
+    'assumptions.beta': (0.0, 5.0),
+    'assumptions.equity_risk_premium': (0.0, 30.0),
+}
+
+
+def _plausible(path: str) -> AfterValidator:
+    low, high = PLAUSIBLE_RANGES[path]
+    return AfterValidator(lambda value: value if value is None or low <= value <= high else None)
+
+
+Number = Annotated[Optional[float], BeforeValidator(_number)]
+Year = Annotated[Optional[int], BeforeValidator(_year)]
+Text = Annotated[Optional[str], BeforeValidator(_text)]
+Texts = Annotated[List[str], BeforeValidator(_texts)]
+
+
+class _Schema(BaseModel):
+    # Unknown keys are kept: the reports may use whatever else the LLM returned.
+    model_config = ConfigDict(extra='allow')
+
+
+class Assumptions(_Schema):
+    revenue_growth_rates: Text = None
+    margin_assumptions: Text = None
+    wacc: Annotated[Number, _plausible('assumptions.wacc')] = None
+    terminal_growth_rate: Annotated[Number, _plausible('assumptions.terminal_growth_rate')] = None
+    exit_multiple: Number = None
+    tax_rate: Annotated[Number, _plausible('assumptions.tax_rate')] = None
+    risk_free_rate: Annotated[Number, _plausible('assumptions.risk_free_rate')] = None
+    beta: Annotated[Number, _plausible('assumptions.beta')] = None
+    equity_risk_premium: Annotated[Number, _plausible('assumptions.equity_risk_premium')] = None
+
+
+class BaseYear(_Schema):
+    year: Year = None
+    revenue: Number = None
+    depreciation_amortization_pct: Number = None
+    capex_pct: Number = None
+    nwc_pct: Number = None
+
+
+class ForecastYear(_Schema):
+    year: Year = None
+    revenue: Number = None
+    revenue_growth_pct: Number = None
+    ebit_margin_pct: Number = None
+    ebit: Number = None
+    tax_rate: Number = None
+    nopat: Number = None
+    depreciation_amortization: Number = None
+    capex: Number = None
+    change_nwc: Number = None
+    fcff: Number = None
+    discount_factor: Number = None
+    pv_fcf: Number = None
+
+
+class SensitivityPoint(_Schema):
+    wacc: Number = None
+    growth: Number = None
+    value_per_share: Number = None
+
+
+class ExtractedData(_Schema):
+    """The ``EXTRACTION_PROMPT`` structure; values are coerced (e.g. "8.6%" -> 8.6) or set to None."""
+    company_name: Text = None
+    ticker: Text = None
+    country: Text = None
+    industry: Text = None
+    analysis_date: Text = None
+    method_summary: Text = None
+    assumptions: Annotated[Assumptions, BeforeValidator(_section)] = Field(default_factory=Assumptions)
+    base_year: Annotated[BaseYear, BeforeValidator(_section)] = Field(default_factory=BaseYear)
+    forecast: Annotated[List[ForecastYear], BeforeValidator(_rows)] = Field(default_factory=list)
+    terminal_value: Number = None
+    pv_terminal_value: Number = None
+    enterprise_value: Number = None
+    net_debt: Number = None
+    equity_value: Number = None
+    shares_outstanding: Number = None
+    intrinsic_value_per_share: Number = None
+    sensitivity: Annotated[List[SensitivityPoint], BeforeValidator(_rows)] = Field(default_factory=list)
+    risk_notes: Texts = Field(default_factory=list)
+    validation_status: Text = None
+    validation_notes: Texts = Field(default_factory=list)
+
+
+# Every schema field, as reported in the extraction sources.
+FIELD_PATHS = (
+    'company_name', 'ticker', 'country', 'industry', 'analysis_date', 'method_summary',
+    *(f'assumptions.{name}' for name in Assumptions.model_fields),
+    *(f'base_year.{name}' for name in BaseYear.model_fields),
+    'forecast', 'terminal_value', 'pv_terminal_value', 'enterprise_value', 'net_debt', 'equity_value',
+    'shares_outstanding', 'intrinsic_value_per_share', 'sensitivity', 'risk_notes',
+    'validation_status', 'validation_notes',
+)
+# Schema sections by the agent whose output states them; each is extracted as soon as
+# that agent finishes. The valuation section (Agent 3's model) takes every other field.
+SECTIONS = {
+    1: ('company', ('company_name', 'ticker', 'country', 'industry')),
+    2: ('inputs', ('assumptions.risk_free_rate', 'assumptions.beta', 'assumptions.equity_risk_premium',
+                   'net_debt', 'shares_outstanding')),
+    4: ('validation', ('validation_status', 'validation_notes', 'risk_notes')),
+}
+SECTIONS[3] = ('valuation', tuple(p for p in FIELD_PATHS
+                                  if not any(p in fields for _, fields in SECTIONS.values())))
+SECTIONS = dict(sorted(SECTIONS.items()))
+# Fields the valuation cannot do without; only these make the hybrid mode call the LLM.
+REQUIRED_FIELDS = (
+    'assumptions.wacc', 'assumptions.terminal_growth_rate', 'assumptions.tax_rate', 'base_year.revenue',
+    'forecast', 'net_debt', 'shares_outstanding', 'validation_status',
+)
+# Forecast horizon the agent prompts and EXTRACTION_PROMPT ask for.
+FORECAST_YEARS = 10
+# Cash-flow drivers a forecast needs, stated per year or as a base-year share of revenue.
+CASH_FLOW_DRIVERS = (
+    ('depreciation_amortization', 'base_year.depreciation_amortization_pct'),
+    ('capex', 'base_year.capex_pct'),
+    ('change_nwc', 'base_year.nwc_pct'),
+)
+
+
+def validate_extraction(data: Dict[str, Any]) -> Dict[str, Any]:
+    """``data`` coerced to the extraction schema; returned as is if it does not fit at all."""
+    try:
+        return ExtractedData.model_validate(data).model_dump()
+    except ValidationError as e:
+        logger.warning('Extracted data does not match the schema, keeping it unvalidated: %s', e)
+        return data
+
+
+def _get(data: Dict[str, Any], path: str) -> Any:
+    for key in path.split('.'):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def _set(data: Dict[str, Any], path: str, value: Any) -> None:
+    *parents, leaf = path.split('.')
+    for key in parents:
+        data = data.setdefault(key, {})
+    data[leaf] = value
+
+
+def _drop_implausible(data: Dict[str, Any], sources: Dict[str, str]) -> None:
+    """Unset parsed values outside PLAUSIBLE_RANGES so they count as unresolved."""
+    for path, (low, high) in PLAUSIBLE_RANGES.items():
+        value = _get(data, path)
+        if path in sources and isinstance(value, (int, float)) and not low <= value <= high:
+            logger.warning('Extraction: ignoring implausible %s = %g read from the agent outputs', path, value)
+            _set(data, path, None)
+            del sources[path]
+
+
+def _forecast_complete(data: Dict[str, Any], sources: Dict[str, str]) -> bool:
+    """True if the forecast covers FORECAST_YEARS with growth, margin and every cash-flow driver."""
+    forecast = data.get('forecast') or []
+    if len(forecast) < FORECAST_YEARS:
+        return False
+    if any(r.get('revenue_growth_pct') is None or r.get('ebit_margin_pct') is None for r in forecast):
+        return False
+    return all(pct in sources or all(r.get(field) is not None for r in forecast)
+               for field, pct in CASH_FLOW_DRIVERS)
+
+
+def _unresolved(data: Dict[str, Any], sources: Dict[str, str]) -> List[str]:
+    """Required fields still missing (or, for the forecast, incomplete).
+
+    Base-year revenue is not needed when the forecast states revenue.
+    """
+    missing = [p for p in REQUIRED_FIELDS if p not in sources]
+    if 'forecast' in sources and not _forecast_complete(data, sources):
+        missing.append('forecast')
+    forecast = data.get('forecast') or []
+    if 'base_year.revenue' in missing and forecast and forecast[0].get('revenue') is not None:
+        missing.remove('base_year.revenue')
+    if 'assumptions.tax_rate' in missing and forecast and all(r.get('tax_rate') is not None for r in forecast):
+        missing.remove('assumptions.tax_rate')
+    return missing
+
+
+def _method_summary(data: Dict[str, Any]) -> Optional[str]:
+    assumptions = data.get('assumptions') or {}
+    if assumptions.get('wacc') is None or assumptions.get('terminal_growth_rate') is None:
+        return None
+    summary = (f'{len(data.get("forecast") or []) or "Multi"}-year unlevered free cash flow forecast discounted at '
+               f'a WACC of {assumptions["wacc"]:g}%, with a terminal value at {assumptions["terminal_growth_rate"]:g}% '
+               'perpetual growth')
+    if assumptions.get('exit_multiple') is not None:
+        summary += f' cross-checked against a {assumptions["exit_multiple"]:g}x exit multiple'
+    return summary + '.'
+
+
+async def _complete(client: Any, system: str, user_content: str, max_tokens: int,
+                    use_cache: bool, job_id: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """One JSON-mode extraction call (or its cached answer) and its usage.
+
+    The call waits for the shared rate limiter of the client's API key.
+    """
+    api_key = getattr(client, 'api_key', '')
+    key = cache_key(EXTRACTION_MODEL, 'extraction', system, user_content, key_fingerprint(api_key))
+    content = llm_cache.get(key) if use_cache else None
+    if content is not None:
+        return json.loads(content), {'model': EXTRACTION_MODEL, 'prompt_tokens': 0, 'completion_tokens': 0,
+                                     'cached': True}
+
+    async def call() -> Tuple[Any, Dict[str, int]]:
+        response = await client.chat.completions.create(
+            model=EXTRACTION_MODEL,
+            messages=[
+                {'role': 'system', 'content': system},
+                {'role': 'user', 'content': user_content},
+            ],
+            temperature=0,
+            max_tokens=max_tokens,
+            response_format={"type": "json_object"},
+        )
+        usage = getattr(response, 'usage', None)
+        return response, {'prompt_tokens': getattr(usage, 'prompt_tokens', 0) or 0,
+                          'completion_tokens': getattr(usage, 'completion_tokens', 0) or 0}
+
+    # OpenAI counts max_tokens against the tokens-per-minute limit until the call finishes.
+    response = await limiter.run(job_id, api_key, EXTRACTION_MODEL,
+                                 count_tokens(system) + count_tokens(user_content) + max_tokens, call)
+    content = response.choices[0].message.content
+    parsed = json.loads(content)
+    if use_cache:
+        llm_cache.put(key, content)
+    usage = getattr(response, 'usage', None)
+    return parsed, {
+        'model': EXTRACTION_MODEL,
+        'prompt_tokens': getattr(usage, 'prompt_tokens', 0) or 0,
+        'completion_tokens': getattr(usage, 'completion_tokens', 0) or 0,
+        'cached': False,
+    }
+
+
+def _agent_block(result: Dict[str, Any]) -> str:
+    return f"=== AGENT {result['agent']}: {result['name']} ===\n{result['result']}"
+
+
+class IncrementalExtraction:
+    """Extraction split by schema section and overlapped with the agents.
+
+    ``agent_done`` starts the section of that agent's fields in the
+    background: the outputs so far are parsed locally and, when a required
+    field of the section is unresolved (or always, in "llm" mode), the
+    ``AsyncOpenAI`` client is asked for the section's open fields from that
+    one agent's output. ``result`` waits for the sections and merges them
+    over a final local parse of all four outputs.
+    """
+
+    def __init__(self, client: Any, company_name: str, use_cache: bool = True,
+                 job_id: Optional[str] = None) -> None:
+        self.client = client
+        self.company_name = company_name
+        self.use_cache = use_cache
+        self.job_id = job_id
+        self._results: Dict[int, Dict[str, Any]] = {}
+        self._tasks: Dict[int, 'asyncio.Task[Dict[str, Any]]'] = {}
+
+    def agent_done(self, result: Dict[str, Any]) -> None:
+        """Start the section of ``result['agent']`` (needs a running event loop)."""
+        agent = result['agent']
+        self._results[agent] = result
+        if agent in SECTIONS and agent not in self._tasks:
+            self._tasks[agent] = asyncio.create_task(self._section(agent))
+
+    async def result(self) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
+        """The validated data, the summed token usage of the section calls and a source report."""
+        results = [self._results[a] for a in sorted(self._results)]
+        for agent in SECTIONS:
+            if agent not in self._tasks:
+                self._tasks[agent] = asyncio.create_task(self._section(agent))
+        sections = dict(zip(self._tasks, await asyncio.gather(*self._tasks.values())))
+
+        # Parse everything once more: a field may be stated by a later agent than its section's.
+        data, sources = parse_agent_outputs(results, self.company_name) if EXTRACTION_MODE != 'llm' else ({}, {})
+        _drop_implausible(data, sources)
+        incomplete = _unresolved(data, sources)
+        usage: Dict[str, Any] = {}
+        for agent, section in sorted(sections.items()):
+            for path, value in section['llm_values'].items():
+                if path not in sources or path in incomplete:
+                    _set(data, path, value)
+                    sources[path] = 'llm'
+            if section['usage']:
+                usage = {
+                    'model': EXTRACTION_MODEL,
+                    'prompt_tokens': usage.get('prompt_tokens', 0) + section['usage']['prompt_tokens'],
+                    'completion_tokens': usage.get('completion_tokens', 0) + section['usage']['completion_tokens'],
+                    'cached': usage.get('cached', True) and section['usage']['cached'],
+                }
+        missing = _unresolved(data, sources)
+        if missing:
+            logger.warning('Extraction: required field(s) not found in the agent outputs: %s', ', '.join(missing))
+
+        if 'analysis_date' not in sources:
+            _set(data, 'analysis_date', date.today().isoformat())
+            sources['analysis_date'] = 'default'
+        if 'method_summary' not in sources and _method_summary(data):
+            _set(data, 'method_summary', _method_summary(data))
+            sources['method_summary'] = 'default'
+
+        by_source: Dict[str, List[str]] = {}
+        for path in FIELD_PATHS:
+            by_source.setdefault(sources.get(path, 'missing'), []).append(path)
+        report = {
+            'mode': EXTRACTION_MODE,
+            'sources': by_source,
+            'sections': {SECTIONS[agent][0]: {k: section[k] for k in ('agent', 'llm_fields', 'wall_ms')}
+                         for agent, section in sorted(sections.items())},
+        }
+        return validate_extraction(data), usage, report
+
+    async def cancel(self) -> None:
+        """Cancel the sections still running and wait for all of them to finish."""
+        for task in self._tasks.values():
+            task.cancel()
+        # Retrieves every section's outcome, so none is logged as never retrieved.
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    # ── Internals ──
+
+    async def _section(self, agent: int) -> Dict[str, Any]:
+        started = time.monotonic()
+        name, fields = SECTIONS[agent]
+        section = {'agent': agent, 'llm_fields': [], 'llm_values': {}, 'usage': {}, 'wall_ms': 0.0}
+        output = self._results.get(agent)
+        if EXTRACTION_MODE == 'llm':
+            wanted = list(fields)
+        else:
+            data, sources = parse_agent_outputs([self._results[a] for a in sorted(self._results)],
+                                                self.company_name)
+            _drop_implausible(data, sources)
+            needed = [p for p in _unresolved(data, sources) if p in fields]
+            wanted = ([p for p in fields if p not in sources or p in needed]
+                      if needed and EXTRACTION_MODE == 'hybrid' else [])
+        if wanted and output is not None:
+            system = (f'{EXTRACTION_PROMPT}\n\nYou are given only the output of Agent {agent}. '
+                      'Return ONLY a JSON object with these fields, nested as in the structure above: '
+                      + ', '.join(wanted))
+            user_content = f'Company analyzed: {self.company_name}\n\nAgent output:\n{_agent_block(output)}'
+            parsed, section['usage'] = await _complete(self.client, system, user_content,
+                                                       8000 if 'forecast' in wanted else 2000, self.use_cache,
+                                                       self.job_id)
+            parsed = validate_extraction(parsed)
+            section['llm_fields'] = wanted
+            section['llm_values'] = {p: _get(parsed, p) for p in wanted if _get(parsed, p) not in (None, [], '')}
+        section['wall_ms'] = round((time.monotonic() - started) * 1000, 1)
+        logger.info('Extraction section "%s" (agent %d): %d field(s) from the LLM in %.0f ms',
+                    name, agent, len(section['llm_values']), section['wall_ms'])
+        return section
+
+
+async def extract_structured_data(
     client: Any,
     company_name: str,
     all_results: List[Dict[str, Any]],
-) -> Dict[str, Any]:
-    """Call OpenAI to extract structured JSON from the combined agent outputs."""
-    combined = '\n\n'.join([
-        f"=== AGENT {r['agent']}: {r['name']} ===\n{r['result']}"
-        for r in all_results
-    ])
-
-    response = client.chat.completions.create(
-        model='gpt-4.1-mini',
-        messages=[
-            {'role': 'system', 'content': EXTRACTION_PROMPT},
-            {'role': 'user', 'content': f'Company analyzed: {company_name}\n\nFull agent outputs:\n{combined}'},
-        ],
-        temperature=0,
-        max_tokens=8000,
-        response_format={"type": "json_object"},
-    )
-
-    return json.loads(response.choices[0].message.content)
+    use_cache: bool = True,
+    job_id: Optional[str] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
+    """Extract the ``EXTRACTION_PROMPT`` structure from finished agent outputs in one go.
 
+    Returns the validated data, the token usage of the LLM calls (empty when
+    none was made; zero tokens when served from the cache) and a report of
+    where each field came from.
+    """
+    extraction = IncrementalExtraction(client, company_name, use_cache, job_id)
+    for result in all_results:
+        extraction.agent_done(result)
+    try:
+        return await extraction.result()
+    finally:
+        await extraction.cancel()
@@ -1,22 +1,490 @@
+import copy
+import json
 import logging
-from typing import Any, Dict
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, ContextManager, Dict, Iterable, List, Optional, Set
 
 logger = logging.getLogger('dcf_pipeline')
 
 
-# In-memory job store shared across the app and pipeline
-jobs: Dict[str, Dict[str, Any]] = {}
+# ═══════════════════════════════════════════════════════════════
+#  JOB STORE  (shared across the app and pipeline)
+# ═══════════════════════════════════════════════════════════════
+
+JOB_STORE_BACKEND = os.environ.get('DCF_JOB_STORE', 'memory').lower()
+JOB_STORE_PATH = os.environ.get('DCF_JOB_STORE_PATH', 'dcf_jobs.sqlite3')
+JOB_TTL_SECONDS = float(os.environ.get('DCF_JOB_TTL_SECONDS', str(6 * 3600)))
+JOB_STORE_MAX_BYTES = int(os.environ.get('DCF_JOB_STORE_MAX_BYTES', str(256 * 1024 * 1024)))
+JOB_STORE_MAX_JOBS = int(os.environ.get('DCF_JOB_STORE_MAX_JOBS', '1000'))
+JOB_SWEEP_SECONDS = float(os.environ.get('DCF_JOB_SWEEP_SECONDS', '60'))
+
+TERMINAL_STATUSES = ('complete', 'error', 'cancelled')
+
+
+def _field_sizes(fields: Dict[str, Any]) -> Dict[str, int]:
+    """JSON-encoded size of each field; a record's size is the sum over its fields.
+
+    ``{"k": v, ...}`` encodes to exactly sum(len(k) + len(v) + 4), so a write
+    only needs to encode the fields it changes.
+    """
+    return {
+        key: len(json.dumps(key)) + len(json.dumps(value, default=str)) + 4
+        for key, value in fields.items()
+    }
+
+
+_EMPTY_RESULTS_SIZE = _field_sizes({'agent_results': []})['agent_results']
+
+
+def _snapshot(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy a job so callers can read it without holding the store lock."""
+    snap = dict(job)
+    snap['agent_results'] = list(job.get('agent_results') or ())
+    return snap
+
+
+class JobStore:
+    """Interface for job state backends.
+
+    Jobs are plain dicts. Readers get snapshots; all writes go through
+    ``update``/``append_result`` so backends can persist and account for them.
+    Every write bumps the job's ``version``; appended agent results carry the
+    version they were added at, so clients can ask for changes since a version.
+    Finished jobs (see TERMINAL_STATUSES) are evicted after ``ttl`` seconds or
+    least-recently-used first once ``max_bytes``/``max_jobs`` is exceeded.
+    Expired jobs are not returned by ``get`` even before ``purge`` (run after
+    writes and every JOB_SWEEP_SECONDS by the service) removes them.
+    Queued and running jobs, and jobs pinned with ``pin``, are never evicted.
+    ``persistent`` stores outlive the process, so they know every job that can
+    still own files in the artifact spool.
+    """
+
+    persistent = False
+
+    def __init__(self, ttl: float = JOB_TTL_SECONDS, max_bytes: int = JOB_STORE_MAX_BYTES,
+                 max_jobs: int = JOB_STORE_MAX_JOBS) -> None:
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_jobs = max_jobs
+        self._pinned: Set[str] = set()
+        self._delete_listeners: List[Callable[[str], None]] = []
+        self._change_listeners: List[Callable[[str, Dict[str, Any], Dict[str, Any]], None]] = []
+
+    def on_change(self, listener: Callable[[str, Dict[str, Any], Dict[str, Any]], None]) -> None:
+        """Register ``listener(job_id, changes, job)`` to run after every write.
+
+        ``changes`` holds the fields just written (``{'agent_result': ...}`` for
+        appended results, the whole job on create); ``job`` is a snapshot of the
+        job after the write. Listeners run under the store lock and must be quick.
+        """
+        self._change_listeners.append(listener)
+
+    def _notify_changed(self, job_id: str, changes: Dict[str, Any], job: Dict[str, Any]) -> None:
+        if not self._change_listeners:
+            return
+        snap = _snapshot(job)
+        for listener in self._change_listeners:
+            try:
+                listener(job_id, changes, snap)
+            except Exception as e:
+                logger.warning('[Job %s] Change listener failed: %s', job_id[:8], e)
+
+    def on_delete(self, listener: Callable[[str], None]) -> None:
+        """Register ``listener(job_id)`` to run when a job is deleted or evicted."""
+        self._delete_listeners.append(listener)
+
+    def _notify_deleted(self, job_id: str) -> None:
+        for listener in self._delete_listeners:
+            try:
+                listener(job_id)
+            except Exception as e:
+                logger.warning('[Job %s] Delete listener failed: %s', job_id[:8], e)
+
+    def locked(self) -> ContextManager:
+        """Hold the store lock across several reads/writes.
+
+        Change listeners run under the same lock, so nothing else can write
+        (or observe a half-done sequence of writes) while it is held.
+        """
+        return self._lock
+
+    def pin(self, job_ids: Iterable[str]) -> None:
+        """Keep ``job_ids`` from being expired or evicted until ``unpin``."""
+        with self._lock:
+            self._pinned.update(job_ids)
+
+    def unpin(self, job_ids: Iterable[str]) -> None:
+        with self._lock:
+            self._pinned.difference_update(job_ids)
+
+    def create(self, job_id: str, job: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def update(self, job_id: str, **fields: Any) -> bool:
+        """Merge ``fields`` into the job. Returns False if the job is gone."""
+        raise NotImplementedError
+
+    def update_if_status(self, job_id: str, statuses: Iterable[str], **fields: Any) -> bool:
+        """Atomically merge ``fields`` only while the job status is in ``statuses``."""
+        raise NotImplementedError
+
+    def append_result(self, job_id: str, result: Dict[str, Any]) -> bool:
+        """Append an agent result to the job's ``agent_results``."""
+        raise NotImplementedError
+
+    def delete(self, job_id: str) -> None:
+        raise NotImplementedError
+
+    def purge(self) -> int:
+        """Evict expired / over-budget finished jobs. Returns the number evicted."""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def __contains__(self, job_id: str) -> bool:
+        return self.get(job_id) is not None
+
+
+class MemoryJobStore(JobStore):
+    """In-process store with LRU ordering, TTL expiry and a byte budget."""
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._lock = threading.RLock()
+        self._jobs: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._field_bytes: Dict[str, Dict[str, int]] = {}
+        self._finished_at: Dict[str, float] = {}
+        self._total_bytes = 0
+
+    def create(self, job_id: str, job: Dict[str, Any]) -> None:
+        stored = copy.deepcopy(job)
+        stored['version'] = 1
+        sizes = _field_sizes(stored)
+        with self._lock:
+            self._jobs[job_id] = stored
+            self._total_bytes -= self._sizes.pop(job_id, 0)
+            self._field_bytes[job_id] = {}
+            self._account(job_id, sizes)
+            self._notify_changed(job_id, job, stored)
+            self.purge()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            finished = self._finished_at.get(job_id)
+            if finished is not None and time.time() - finished > self.ttl and job_id not in self._pinned:
+                self.delete(job_id)
+                return None
+            self._jobs.move_to_end(job_id)
+            return _snapshot(job)
+
+    def update(self, job_id: str, **fields: Any) -> bool:
+        sizes = _field_sizes(fields)
+        with self._lock:
+            return self._update(job_id, fields, sizes)
+
+    def update_if_status(self, job_id: str, statuses: Iterable[str], **fields: Any) -> bool:
+        sizes = _field_sizes(fields)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.get('status') not in tuple(statuses):
+                return False
+            return self._update(job_id, fields, sizes)
+
+    def append_result(self, job_id: str, result: Dict[str, Any]) -> bool:
+        # Encoded as a list item (", " separator); the version added below is a few bytes more.
+        size = len(json.dumps(result, default=str)) + 2
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            job['version'] = job.get('version', 0) + 1
+            job.setdefault('agent_results', []).append({**result, 'version': job['version']})
+            results = self._field_bytes[job_id].get('agent_results') or _EMPTY_RESULTS_SIZE
+            self._account(job_id, {'agent_results': results + size})
+            self._notify_changed(job_id, {'agent_result': job['agent_results'][-1]}, job)
+            return True
+
+    def delete(self, job_id: str) -> None:
+        with self._lock:
+            if self._jobs.pop(job_id, None) is not None:
+                self._total_bytes -= self._sizes.pop(job_id, 0)
+                self._field_bytes.pop(job_id, None)
+                self._finished_at.pop(job_id, None)
+                self._notify_deleted(job_id)
+
+    def purge(self) -> int:
+        with self._lock:
+            now = time.time()
+            evicted = 0
+            for job_id, finished in list(self._finished_at.items()):
+                if now - finished > self.ttl and job_id not in self._pinned:
+                    self.delete(job_id)
+                    evicted += 1
+            # LRU order: OrderedDict iterates least recently used first.
+            for job_id in list(self._jobs):
+                if self._total_bytes <= self.max_bytes and len(self._jobs) <= self.max_jobs:
+                    break
+                if job_id in self._finished_at and job_id not in self._pinned:
+                    self.delete(job_id)
+                    evicted += 1
+            if evicted:
+                logger.info('Job store evicted %d finished job(s)', evicted)
+            return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'jobs': len(self._jobs),
+                'finished_jobs': len(self._finished_at),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'max_jobs': self.max_jobs,
+                'ttl_seconds': self.ttl,
+            }
+
+    def _update(self, job_id: str, fields: Dict[str, Any], sizes: Dict[str, int]) -> bool:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return False
+        job.update(fields)
+        job['version'] = job.get('version', 0) + 1
+        self._account(job_id, sizes)
+        self._notify_changed(job_id, fields, job)
+        if job_id in self._finished_at:
+            self.purge()
+        return True
+
+    def _account(self, job_id: str, sizes: Dict[str, int]) -> None:
+        """Apply the encoded sizes of the fields just written (computed before locking)."""
+        job = self._jobs[job_id]
+        field_bytes = self._field_bytes[job_id]
+        field_bytes.update(sizes)
+        field_bytes.update(_field_sizes({'version': job['version']}))
+        size = sum(field_bytes.values())
+        self._total_bytes += size - self._sizes.get(job_id, 0)
+        self._sizes[job_id] = size
+        if job.get('status') in TERMINAL_STATUSES:
+            self._finished_at.setdefault(job_id, time.time())
+        else:
+            self._finished_at.pop(job_id, None)
+
+
+class SqliteJobStore(JobStore):
+    """SQLite-backed store; jobs survive restarts of the service.
+
+    Jobs that were queued or running when the process stopped cannot be
+    resumed by a fresh worker pool, so they are marked as failed on open.
+    """
+
+    persistent = True
+
+    def __init__(self, path: str = JOB_STORE_PATH, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            ' job_id TEXT PRIMARY KEY,'
+            ' data TEXT NOT NULL,'
+            ' status TEXT,'
+            ' size INTEGER NOT NULL,'
+            ' finished_at REAL,'
+            ' accessed_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS ix_jobs_finished ON jobs(finished_at)')
+        self._fail_orphans()
+
+    def _fail_orphans(self) -> None:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id FROM jobs WHERE status NOT IN ('complete', 'error', 'cancelled')"
+            ).fetchall()
+            for (job_id,) in rows:
+                self.update(
+                    job_id,
+                    status='error',
+                    error='The DCF service restarted before this job finished.',
+                )
+            if rows:
+                logger.warning('Job store marked %d interrupted job(s) as failed', len(rows))
+
+    def _load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute('SELECT data FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _save(self, job_id: str, job: Dict[str, Any]) -> None:
+        now = time.time()
+        finished = now if job.get('status') in TERMINAL_STATUSES else None
+        data = json.dumps(job, default=str)
+        self._conn.execute(
+            'INSERT INTO jobs (job_id, data, status, size, finished_at, accessed_at) '
+            'VALUES (?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT(job_id) DO UPDATE SET data = excluded.data, status = excluded.status, '
+            ' size = excluded.size, accessed_at = excluded.accessed_at, '
+            ' finished_at = CASE WHEN excluded.finished_at IS NULL THEN NULL '
+            '  ELSE COALESCE(jobs.finished_at, excluded.finished_at) END',
+            (job_id, data, job.get('status'), len(data), finished, now),
+        )
+
+    def create(self, job_id: str, job: Dict[str, Any]) -> None:
+        with self._lock:
+            job = {**job, 'version': 1}
+            self._save(job_id, job)
+            self._notify_changed(job_id, job, job)
+            self.purge()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT data, finished_at FROM jobs WHERE job_id = ?', (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if row[1] is not None and now - row[1] > self.ttl and job_id not in self._pinned:
+                self.delete(job_id)
+                return None
+            self._conn.execute('UPDATE jobs SET accessed_at = ? WHERE job_id = ?', (now, job_id))
+            return json.loads(row[0])
+
+    def update(self, job_id: str, **fields: Any) -> bool:
+        with self._lock:
+            job = self._load(job_id)
+            if job is None:
+                return False
+            job.update(fields)
+            job['version'] = job.get('version', 0) + 1
+            self._save(job_id, job)
+            self._notify_changed(job_id, fields, job)
+            if job.get('status') in TERMINAL_STATUSES:
+                self.purge()
+            return True
+
+    def update_if_status(self, job_id: str, statuses: Iterable[str], **fields: Any) -> bool:
+        with self._lock:
+            job = self._load(job_id)
+            if job is None or job.get('status') not in tuple(statuses):
+                return False
+            return self.update(job_id, **fields)
+
+    def append_result(self, job_id: str, result: Dict[str, Any]) -> bool:
+        with self._lock:
+            job = self._load(job_id)
+            if job is None:
+                return False
+            job['version'] = job.get('version', 0) + 1
+            job.setdefault('agent_results', []).append({**result, 'version': job['version']})
+            self._save(job_id, job)
+            self._notify_changed(job_id, {'agent_result': job['agent_results'][-1]}, job)
+            return True
+
+    def delete(self, job_id: str) -> None:
+        with self._lock:
+            if self._conn.execute('DELETE FROM jobs WHERE job_id = ?', (job_id,)).rowcount:
+                self._notify_deleted(job_id)
+
+    def purge(self) -> int:
+        with self._lock:
+            expired = self._conn.execute(
+                'SELECT job_id FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?',
+                (time.time() - self.ttl,),
+            ).fetchall()
+            expired = [job_id for (job_id,) in expired if job_id not in self._pinned]
+            for job_id in expired:
+                self.delete(job_id)
+            evicted = len(expired)
+            total_bytes, total_jobs = self._conn.execute(
+                'SELECT COALESCE(SUM(size), 0), COUNT(*) FROM jobs'
+            ).fetchone()
+            if total_bytes > self.max_bytes or total_jobs > self.max_jobs:
+                rows = self._conn.execute(
+                    'SELECT job_id, size FROM jobs WHERE finished_at IS NOT NULL ORDER BY accessed_at'
+                ).fetchall()
+                for job_id, size in rows:
+                    if total_bytes <= self.max_bytes and total_jobs <= self.max_jobs:
+                        break
+                    if job_id in self._pinned:
+                        continue
+                    self.delete(job_id)
+                    total_bytes -= size
+                    total_jobs -= 1
+                    evicted += 1
+            if evicted:
+                logger.info('Job store evicted %d finished job(s)', evicted)
+            return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total_bytes, total_jobs, finished = self._conn.execute(
+                'SELECT COALESCE(SUM(size), 0), COUNT(*), COUNT(finished_at) FROM jobs'
+            ).fetchone()
+            return {
+                'backend': 'sqlite',
+                'path': self.path,
+                'jobs': total_jobs,
+                'finished_jobs': finished,
+                'bytes': total_bytes,
+                'max_bytes': self.max_bytes,
+                'max_jobs': self.max_jobs,
+                'ttl_seconds': self.ttl,
+            }
+
+
+def create_job_store(backend: str = JOB_STORE_BACKEND) -> JobStore:
+    """Build the job store selected by DCF_JOB_STORE (memory | sqlite)."""
+    if backend == 'sqlite':
+        return SqliteJobStore()
+    if backend != 'memory':
+        logger.warning('Unknown DCF_JOB_STORE "%s", falling back to memory', backend)
+    return MemoryJobStore()
+
+
+# Job store shared across the app and pipeline
+job_store: JobStore = create_job_store()
+
+
+def new_job(company_name: str, **fields: Any) -> Dict[str, Any]:
+    """Initial record of a DCF job waiting for a worker."""
+    job = {
+        'status': 'queued',
+        'current_agent': 0,
+        'current_agent_name': 'Waiting in queue',
+        'agent_results': [],
+        'error': None,
+        'download_ready': False,
+        'artifact_path': None,
+        'zip_filename': None,
+        'company_name': company_name,
+        'cancelled': False,
+        'queue_position': None,
+    }
+    job.update(fields)
+    return job
 
 
 def check_cancelled(job_id: str) -> bool:
     """Return True if the job was cancelled and mark final state."""
-    job = jobs.get(job_id)
+    job = job_store.get(job_id)
     if not job:
         return True
     if job.get('cancelled'):
         logger.info('[Job %s] Job was cancelled by user. Stopping pipeline.', job_id[:8])
-        job['status'] = 'cancelled'
-        job['current_agent_name'] = 'Cancelled by user'
+        job_store.update(job_id, status='cancelled', current_agent_name='Cancelled by user')
         return True
     return False
-
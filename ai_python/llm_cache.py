@@ -0,0 +1,197 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger('dcf_pipeline')
+
+
+# ═══════════════════════════════════════════════════════════════
+#  LLM RESPONSE CACHE  (memory LRU in front of an on-disk store)
+# ═══════════════════════════════════════════════════════════════
+
+CACHE_DIR = os.environ.get('DCF_LLM_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'dcf_llm_cache'))
+CACHE_TTL_SECONDS = float(os.environ.get('DCF_LLM_CACHE_TTL_SECONDS', str(24 * 3600)))
+CACHE_MAX_BYTES = int(os.environ.get('DCF_LLM_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+CACHE_MEMORY_ENTRIES = int(os.environ.get('DCF_LLM_CACHE_MEMORY_ENTRIES', '256'))
+CACHE_ENABLED = os.environ.get('DCF_LLM_CACHE', 'on').lower() not in ('0', 'off', 'false', 'no')
+
+
+def cache_key(model: str, role: str, prompt: str, upstream: str = '', scope: str = '') -> str:
+    """Content address of one LLM call: model, role, prompt and upstream input.
+
+    ``scope`` (the caller's API key fingerprint) keeps one account's answers
+    from being served to another.
+    """
+    upstream_hash = hashlib.sha256(upstream.encode('utf-8')).hexdigest()
+    payload = json.dumps([scope, model, role, prompt, upstream_hash], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """Two-tier cache of LLM outputs keyed by ``cache_key``.
+
+    The memory tier is a small LRU of recent entries; the disk tier stores one
+    JSON file per key under ``directory``. Entries older than ``ttl`` are
+    ignored and removed; when the disk tier exceeds ``max_bytes`` the oldest
+    files are deleted until it is back under 90% of the budget.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, ttl: float = CACHE_TTL_SECONDS,
+                 max_bytes: int = CACHE_MAX_BYTES, memory_entries: int = CACHE_MEMORY_ENTRIES,
+                 enabled: bool = CACHE_ENABLED) -> None:
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._memory: 'OrderedDict[str, Tuple[float, str]]' = OrderedDict()
+        self._disk_bytes: Optional[int] = None
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self._hits += 1
+                    return entry[1]
+                del self._memory[key]
+
+        value = self._disk_get(key, now)
+        with self._lock:
+            if value is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._remember(key, value[0], value[1])
+            return value[1]
+
+    def put(self, key: str, value: str) -> None:
+        if not self.enabled:
+            return
+        created = time.time()
+        with self._lock:
+            self._remember(key, created, value)
+        try:
+            self._disk_put(key, created, value)
+        except OSError as e:
+            logger.warning('LLM cache write failed for %s: %s', key[:12], e)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'hits': self._hits,
+                'misses': self._misses,
+                'memory_entries': len(self._memory),
+                'disk_bytes': self._disk_bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl,
+            }
+
+    # ── Memory tier ──
+
+    def _remember(self, key: str, created: float, value: str) -> None:
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    # ── Disk tier ──
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f'{key}.json')
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[float, str]]:
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if now - entry.get('created', 0) > self.ttl:
+            self._disk_remove(path)
+            return None
+        return entry['created'], entry['value']
+
+    def _disk_put(self, key: str, created: float, value: str) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        data = json.dumps({'created': created, 'value': value}).encode('utf-8')
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan()[0]
+            else:
+                self._disk_bytes += len(data) - replaced
+            over_budget = self._disk_bytes > self.max_bytes
+        if over_budget:
+            self._shrink()
+
+    def _disk_remove(self, path: str) -> int:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return 0
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes -= size
+        return size
+
+    def _scan(self) -> Tuple[int, list]:
+        total = 0
+        files = []
+        for root, _dirs, names in os.walk(self.directory):
+            for name in names:
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                total += st.st_size
+                files.append((st.st_mtime, st.st_size, path))
+        return total, files
+
+    def _shrink(self) -> None:
+        total, files = self._scan()
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        for _mtime, size, path in sorted(files):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        with self._lock:
+            self._disk_bytes = total
+        logger.info('LLM cache evicted %d entries (%d bytes on disk)', removed, total)
+
+
+# Process-wide cache shared by the pipeline and extraction
+llm_cache = LLMCache()
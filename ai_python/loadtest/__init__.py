@@ -0,0 +1,7 @@
+"""
+Load testing without OpenAI: a fake OpenAI-compatible server and a load driver.
+
+    python -m ai_python.loadtest.fake_openai --port 5900
+    OPENAI_BASE_URL=http://127.0.0.1:5900/v1 python -m ai_python
+    python -m ai_python.loadtest.driver --concurrency 1,2,4,8 --pid <service pid>
+"""
@@ -0,0 +1,290 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+
+# ═══════════════════════════════════════════════════════════════
+#  LOAD DRIVER  (closed-loop users per concurrency step, stage latencies)
+# ═══════════════════════════════════════════════════════════════
+
+PERCENTILES = (0.50, 0.95, 0.99)
+MAX_RETRY_AFTER = 30.0
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile (a p99 of few samples is their maximum)."""
+    values = sorted(values)
+    return values[max(0, math.ceil(q * len(values)) - 1)] if values else 0.0
+
+
+def _stage_name(stage: Dict[str, Any]) -> str:
+    if stage.get('status') == 'queued':
+        return 'queued'
+    return stage.get('current_agent_name') or stage.get('status') or 'unknown'
+
+
+def read_process(pid: int) -> Optional[Dict[str, float]]:
+    """RSS (MB) and thread count of a local process, from /proc (Linux only)."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+    except OSError:
+        return None
+    return {'rss_mb': round(int(fields['VmRSS'].split()[0]) / 1024, 1), 'threads': int(fields['Threads'])}
+
+
+class LoadDriver:
+    """Runs DCF jobs against a live service and records what each one went through.
+
+    Each virtual user starts a job (``/api/dcf/start``, honouring 429
+    Retry-After), follows it to the end by polling ``/api/dcf/status`` or
+    over the SSE stream, downloads the report, and starts the next job until
+    the step's time is up. Every stage change the job reports (queued,
+    agents 1-4, extraction, report generation) is timed; so are the whole
+    job and the download. Users get their own API key so the per-key limit
+    of the scheduler does not cap the run.
+    """
+
+    def __init__(self, base_url: str, options: Dict[str, Any], progress: str = 'poll',
+                 poll_interval: float = 1.0, pid: Optional[int] = None, sample_interval: float = 5.0) -> None:
+        self.base_url = base_url.rstrip('/')
+        self.options = options
+        self.progress = progress
+        self.poll_interval = poll_interval
+        self.pid = pid
+        self.sample_interval = sample_interval
+        self._seq = 0
+
+    async def run_step(self, client: httpx.AsyncClient, concurrency: int, duration: float) -> Dict[str, Any]:
+        """``concurrency`` users starting jobs for ``duration`` seconds; waits for the last ones to finish."""
+        started = time.time()
+        deadline = started + duration
+        jobs: List[Dict[str, Any]] = []
+        samples: List[Dict[str, Any]] = []
+        sampler = asyncio.create_task(self._sample(client, started, samples))
+        try:
+            await asyncio.gather(*(self._user(client, user, deadline, jobs) for user in range(concurrency)))
+        finally:
+            sampler.cancel()
+        await self._take_sample(client, started, samples)
+        return summarize(concurrency, time.time() - started, jobs, samples)
+
+    # ── Internals ──
+
+    async def _user(self, client: httpx.AsyncClient, user: int, deadline: float, jobs: List[Dict[str, Any]]) -> None:
+        while time.time() < deadline:
+            self._seq += 1
+            jobs.append(await self._job(client, f'Loadtest Company {self._seq}', f'sk-loadtest-{user}', deadline))
+
+    async def _job(self, client: httpx.AsyncClient, company: str, api_key: str, deadline: float) -> Dict[str, Any]:
+        record: Dict[str, Any] = {'company': company, 'rejected': 0, 'stages': {}}
+        body = {'company_name': company, 'api_key': api_key, 'prompts': {}, **self.options}
+        submitted = time.time()
+        while True:
+            try:
+                response = await client.post(f'{self.base_url}/api/dcf/start', json=body)
+            except httpx.HTTPError as e:
+                record.update(status='error', error=f'start: {e!r}', total=time.time() - submitted)
+                return record
+            if response.status_code != 429:
+                break
+            record['rejected'] += 1
+            if time.time() >= deadline:
+                record.update(status='rejected', total=time.time() - submitted)
+                return record
+            await asyncio.sleep(min(float(response.headers.get('Retry-After', 1)), MAX_RETRY_AFTER))
+        if response.status_code != 200:
+            record.update(status='error', error=f'start: HTTP {response.status_code}', total=time.time() - submitted)
+            return record
+
+        accepted = time.time()
+        job_id = response.json()['job_id']
+        record['job_id'] = job_id
+        try:
+            follow = self._follow_events if self.progress == 'sse' else self._follow_status
+            final = await follow(client, job_id, accepted, record['stages'])
+        except httpx.HTTPError as e:
+            record.update(status='error', error=f'progress: {e!r}', total=time.time() - submitted)
+            return record
+        record['total'] = time.time() - submitted
+        record['status'] = final.get('status')
+        record['error'] = final.get('error')
+        if final.get('status') == 'complete':
+            started = time.time()
+            download = await client.get(f'{self.base_url}/api/dcf/download/{job_id}')
+            record['download'] = time.time() - started
+            record['download_bytes'] = len(download.content) if download.status_code == 200 else 0
+            if download.status_code != 200:
+                record.update(status='error', error=f'download: HTTP {download.status_code}')
+        return record
+
+    async def _follow_status(self, client: httpx.AsyncClient, job_id: str, since: float,
+                             stages: Dict[str, float]) -> Dict[str, Any]:
+        current, entered = None, since
+        while True:
+            response = await client.get(f'{self.base_url}/api/dcf/status/{job_id}')
+            response.raise_for_status()
+            status = response.json()
+            now = time.time()
+            name = _stage_name(status)
+            if status['status'] in ('complete', 'error', 'cancelled'):
+                if current is not None:
+                    stages[current] = stages.get(current, 0.0) + now - entered
+                return status
+            if name != current:
+                # Time before the first answer counts towards the first stage seen.
+                if current is not None:
+                    stages[current] = stages.get(current, 0.0) + now - entered
+                    entered = now
+                current = name
+            await asyncio.sleep(self.poll_interval)
+
+    async def _follow_events(self, client: httpx.AsyncClient, job_id: str, since: float,
+                             stages: Dict[str, float]) -> Dict[str, Any]:
+        current, entered = None, since
+        event = None
+        async with client.stream('GET', f'{self.base_url}/api/dcf/events/{job_id}') as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.startswith('event:'):
+                    event = line[6:].strip()
+                elif line.startswith('data:') and event in ('stage', 'status'):
+                    data = json.loads(line[5:])
+                    now = time.time()
+                    if current is not None:
+                        stages[current] = stages.get(current, 0.0) + now - entered
+                        entered = now
+                    if event == 'status':
+                        return data
+                    current = _stage_name(data)
+        raise httpx.ReadError(f'event stream of job {job_id} ended without a status')
+
+    async def _sample(self, client: httpx.AsyncClient, started: float, samples: List[Dict[str, Any]]) -> None:
+        while True:
+            await self._take_sample(client, started, samples)
+            await asyncio.sleep(self.sample_interval)
+
+    async def _take_sample(self, client: httpx.AsyncClient, started: float, samples: List[Dict[str, Any]]) -> None:
+        sample: Dict[str, Any] = {'t': round(time.time() - started, 1)}
+        if self.pid:
+            sample.update(read_process(self.pid) or {})
+        try:
+            queue = (await client.get(f'{self.base_url}/api/dcf/queue')).json()
+            sample.update(running=queue.get('running'), queued=queue.get('queued'))
+        except (httpx.HTTPError, ValueError):
+            pass
+        samples.append(sample)
+
+
+def summarize(concurrency: int, seconds: float, jobs: List[Dict[str, Any]],
+              samples: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Throughput, outcome counts and latency percentiles (seconds) of one step."""
+    completed = [j for j in jobs if j.get('status') == 'complete' and 'download_bytes' in j]
+    latencies: Dict[str, List[float]] = {}
+    positions: Dict[str, List[int]] = {}
+    for job in completed:
+        for position, (stage, secs) in enumerate(job['stages'].items()):
+            latencies.setdefault(stage, []).append(secs)
+            positions.setdefault(stage, []).append(position)
+    # Pipeline order; polling can miss a short stage, so order by average position.
+    order = sorted(latencies, key=lambda stage: sum(positions[stage]) / len(positions[stage]))
+    latencies = {stage: latencies[stage] for stage in order}
+    latencies['download'] = [job['download'] for job in completed]
+    latencies['total'] = [job['total'] for job in completed]
+    return {
+        'concurrency': concurrency,
+        'seconds': round(seconds, 1),
+        'jobs': len(jobs),
+        'completed': len(completed),
+        'failed': len([j for j in jobs if j.get('status') not in ('complete', 'rejected')]),
+        'rejected_starts': sum(j['rejected'] for j in jobs),
+        'jobs_per_minute': round(len(completed) * 60 / seconds, 2) if seconds else 0.0,
+        'latency': {
+            stage: {f'p{int(q * 100)}': round(percentile(values, q), 3) for q in PERCENTILES}
+            for stage, values in latencies.items()
+        },
+        'peak_rss_mb': max((s['rss_mb'] for s in samples if 'rss_mb' in s), default=None),
+        'peak_threads': max((s['threads'] for s in samples if 'threads' in s), default=None),
+        'errors': sorted({j['error'] for j in jobs if j.get('error')})[:10],
+        'samples': samples,
+    }
+
+
+def print_step(step: Dict[str, Any]) -> None:
+    print(f"\n== concurrency {step['concurrency']}: {step['completed']}/{step['jobs']} complete, "
+          f"{step['failed']} failed, {step['rejected_starts']} start(s) rejected, "
+          f"{step['jobs_per_minute']} jobs/min over {step['seconds']} s")
+    print(f"{'stage':<36}" + ''.join(f'{f"p{int(q * 100)} s":>10}' for q in PERCENTILES))
+    for stage, values in step['latency'].items():
+        print(f'{stage:<36}' + ''.join(f'{v:>10.2f}' for v in values.values()))
+    print(f"{'t s':>8}{'rss MB':>9}{'threads':>9}{'running':>9}{'queued':>8}")
+    for s in step['samples']:
+        print(f"{s['t']:>8.1f}{s.get('rss_mb', '-'):>9}{s.get('threads', '-'):>9}"
+              f"{s.get('running', '-'):>9}{s.get('queued', '-'):>8}")
+    for error in step['errors']:
+        print(f'  error: {error}')
+
+
+def print_summary(steps: List[Dict[str, Any]]) -> None:
+    print(f"\n{'users':>6}{'jobs/min':>10}{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}{'failed':>8}"
+          f"{'429s':>6}{'rss MB':>9}{'threads':>9}")
+    for step in steps:
+        total = step['latency'].get('total', {})
+        print(f"{step['concurrency']:>6}{step['jobs_per_minute']:>10.2f}{total.get('p50', 0):>9.1f}"
+              f"{total.get('p95', 0):>9.1f}{total.get('p99', 0):>9.1f}{step['failed']:>8}{step['rejected_starts']:>6}"
+              f"{step['peak_rss_mb'] or '-':>9}{step['peak_threads'] or '-':>9}")
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    options: Dict[str, Any] = {'bypass_cache': not args.cached}
+    if args.monte_carlo:
+        options['mode'] = 'monte_carlo'
+    driver = LoadDriver(args.url, options, args.progress, args.poll_interval, args.pid, args.sample_interval)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=100)
+    steps = []
+    async with httpx.AsyncClient(timeout=httpx.Timeout(60.0, read=None), limits=limits) as client:
+        (await client.get(f'{driver.base_url}/api/health')).raise_for_status()
+        for concurrency in args.concurrency:
+            step = await driver.run_step(client, concurrency, args.duration)
+            print_step(step)
+            steps.append(step)
+    return steps
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Drive DCF jobs through a running service (point it at the fake OpenAI server) '
+                    'and report throughput, stage latencies and process RSS / threads per concurrency step.')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='service base URL')
+    parser.add_argument('--concurrency', default='1,2,4,8',
+                        type=lambda s: [int(n) for n in s.split(',') if n.strip()],
+                        help='comma-separated concurrent users, one step each')
+    parser.add_argument('--duration', type=float, default=120.0, help='seconds each step keeps starting jobs')
+    parser.add_argument('--progress', choices=('poll', 'sse'), default='poll',
+                        help='follow jobs by polling /status or over /events')
+    parser.add_argument('--poll-interval', type=float, default=1.0)
+    parser.add_argument('--pid', type=int, help='service process id, to sample its RSS and threads (Linux)')
+    parser.add_argument('--sample-interval', type=float, default=5.0)
+    parser.add_argument('--cached', action='store_true',
+                        help='allow LLM cache hits and coalescing (default: every job calls the LLM)')
+    parser.add_argument('--monte-carlo', action='store_true', help='run jobs in Monte Carlo mode')
+    parser.add_argument('--output', help='write every step, with its resource samples, to a JSON file')
+    args = parser.parse_args()
+    if args.pid and not os.path.exists(f'/proc/{args.pid}'):
+        parser.error(f'no process {args.pid} (RSS / thread sampling reads /proc)')
+
+    steps = asyncio.run(run(args))
+    print_summary(steps)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(steps, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+import argparse
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from ..benchmarks.data import extraction_payload
+from ..extraction import EXTRACTION_PROMPT
+
+logger = logging.getLogger('dcf_pipeline')
+
+
+# ═══════════════════════════════════════════════════════════════
+#  FAKE OPENAI  (chat completions with canned outputs, latency and faults)
+# ═══════════════════════════════════════════════════════════════
+
+FAKE_DEFAULTS = {
+    'latency_ms': 300.0,          # before the first token
+    'jitter_ms': 100.0,           # uniform +/- around latency_ms
+    'tokens_per_second': 150.0,   # completion throughput; 0 answers at once
+    'agent_tokens': 1200.0,       # approximate length of each agent's answer
+    'error_rate': 0.0,            # share of requests failing with HTTP 500
+    'rate_limit_rate': 0.0,       # share of requests rejected with HTTP 429
+    'retry_after_seconds': 1.0,   # Retry-After of injected 429s
+}
+RATE_OPTIONS = ('error_rate', 'rate_limit_rate')
+
+# Agents are recognised by the role CrewAI puts in their prompt.
+AGENT_ROLES = {
+    'agent1': 'Company Existence Validator',
+    'agent2': 'Financial Data Collector',
+    'agent3': 'Valuation Modeling Expert',
+    'agent4': 'Financial Realism Auditor',
+}
+
+
+def _forecast_table() -> str:
+    """Agent 3's year-by-year drivers as a markdown table, from the sample valuation."""
+    rows = ['| Year | Revenue growth % | EBIT margin % | Tax rate % |', '|---|---|---|---|']
+    rows += [f"| {r['year']}E | {r['revenue_growth_pct']:.1f}% | {r['ebit_margin_pct']:.1f}% | {r['tax_rate']:.0f}% |"
+             for r in extraction_payload()['forecast']]
+    return '\n'.join(rows) + '\n'
+
+
+# CrewAI only accepts an answer in its ReAct "Final Answer" format.
+CANNED_OUTPUTS = {
+    'agent1': 'Company Status: Exists\nLegal name: Northwind Traders Inc.\nTicker: NWT\n'
+              'Country: United States\nIndustry: Specialty Retail\nWebsite: northwind.example\n',
+    'agent2': 'Historical financials (USD millions): revenue 12,400, EBIT margin 11%, D&A 3.1% of revenue, '
+              'capex 4.0% of revenue, NWC 8% of incremental revenue.\nWACC inputs: risk-free 4.1%, beta 1.08, '
+              'ERP 5.0%, tax rate 24%.\nBalance sheet: net debt 2,150; shares outstanding 410.\n'
+              'Data quality score: 8/10\n',
+    'agent3': 'Base-year revenue 12,400. Revenue growth 7% tapering to 3%; EBIT margin 11% rising to 14%; '
+              'tax rate 24%; D&A 3.1% and capex 4.0% of revenue; change in NWC 8% of incremental revenue.\n'
+              'WACC 8.6%, terminal growth 2.5%, exit multiple 11x.\n\n' + _forecast_table(),
+    'agent4': 'Assumption review, metric cross-checks, peer comparison and terminal value checks complete.\n'
+              'Final validation status: Validated\n',
+}
+FILLER = 'Supporting detail: the figures above are consistent with filings and peer data. '
+
+
+def fake_config(config: Optional[Dict[str, Any]] = None, base: Optional[Dict[str, Any]] = None) -> Dict[str, float]:
+    """Merge ``config`` over ``base`` (default FAKE_DEFAULTS); raises ValueError on bad input."""
+    merged = dict(base or FAKE_DEFAULTS)
+    for key, value in (config or {}).items():
+        if key not in FAKE_DEFAULTS:
+            raise ValueError(f'Unknown option "{key}"')
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f'"{key}" must be a number') from None
+        if value < 0 or (key in RATE_OPTIONS and value > 1):
+            raise ValueError(f'"{key}" must be ' + ('between 0 and 1' if key in RATE_OPTIONS else 'non-negative'))
+        merged[key] = value
+    return merged
+
+
+def _tokens(text: str) -> int:
+    # Close enough to tiktoken for English prose and JSON.
+    return max(1, len(text) // 4)
+
+
+def request_kind(messages: List[Dict[str, Any]]) -> str:
+    """"agent1".."agent4", "extraction" or "other", from the request's prompts."""
+    system = '\n'.join(str(m.get('content') or '') for m in messages if m.get('role') == 'system')
+    for text in (system, '\n'.join(str(m.get('content') or '') for m in messages)):
+        if EXTRACTION_PROMPT[:60] in text:
+            return 'extraction'
+        for kind, role in AGENT_ROLES.items():
+            if role in text:
+                return kind
+    return 'other'
+
+
+class FakeOpenAI:
+    """Answers ``/v1/chat/completions`` like OpenAI, from canned outputs.
+
+    Agent calls get a fixed report padded to ``agent_tokens``; the extraction
+    call gets a complete valuation in the ``EXTRACTION_PROMPT`` schema for the
+    company named in the request. Each answer waits ``latency_ms`` (+/-
+    ``jitter_ms``) plus its length at ``tokens_per_second`` (streamed in
+    small chunks when the client asks for a stream). A share of requests
+    fails with HTTP 500 or 429, as configured.
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, seed: Optional[int] = None) -> None:
+        self.config = fake_config(config)
+        self._random = random.Random(seed)
+        self._started = time.time()
+        self._requests: Dict[str, int] = {}
+        self._errors = 0
+        self._rate_limited = 0
+        self._in_flight = 0
+        self._max_in_flight = 0
+        self._completion_tokens = 0
+
+    def configure(self, changes: Dict[str, Any]) -> Dict[str, float]:
+        self.config = fake_config(changes, self.config)
+        logger.info('Fake OpenAI reconfigured: %s', self.config)
+        return self.config
+
+    def answer(self, kind: str, messages: List[Dict[str, Any]]) -> str:
+        if kind == 'extraction':
+            user = '\n'.join(str(m.get('content') or '') for m in messages if m.get('role') == 'user')
+            match = re.search(r'Company analyzed: (.+)', user)
+            payload = extraction_payload()
+            if match:
+                payload['company_name'] = match.group(1).strip()
+            return json.dumps(payload)
+        text = CANNED_OUTPUTS.get(kind, 'Done.\n')
+        target = int(self.config['agent_tokens']) * 4
+        if len(text) < target:
+            text += FILLER * ((target - len(text)) // len(FILLER) + 1)
+        return f'Thought: I now can give a great answer\nFinal Answer: {text}'
+
+    async def complete(self, body: Dict[str, Any]) -> Any:
+        messages = body.get('messages') or []
+        kind = request_kind(messages)
+        self._requests[kind] = self._requests.get(kind, 0) + 1
+
+        draw = self._random.random()
+        if draw < self.config['rate_limit_rate']:
+            self._rate_limited += 1
+            return _error(429, 'Rate limit reached (injected by the fake server).', 'rate_limit_exceeded',
+                          {'Retry-After': f"{self.config['retry_after_seconds']:g}"})
+        if draw < self.config['rate_limit_rate'] + self.config['error_rate']:
+            self._errors += 1
+            return _error(500, 'The server had an error (injected by the fake server).', 'server_error')
+
+        content = self.answer(kind, messages)
+        usage = {
+            'prompt_tokens': sum(_tokens(str(m.get('content') or '')) for m in messages),
+            'completion_tokens': _tokens(content),
+        }
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+        self._completion_tokens += usage['completion_tokens']
+        completion_id = f'chatcmpl-{uuid.uuid4().hex}'
+        model = body.get('model') or 'gpt-4.1-mini'
+        if body.get('stream'):
+            return StreamingResponse(self._stream(completion_id, model, content, usage),
+                                     media_type='text/event-stream')
+
+        self._enter()
+        try:
+            await asyncio.sleep(self._first_token_delay() + self._generation_time(content))
+        finally:
+            self._in_flight -= 1
+        return {
+            'id': completion_id,
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': usage,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'uptime_seconds': round(time.time() - self._started, 1),
+            'requests': dict(self._requests),
+            'errors_injected': self._errors,
+            'rate_limited': self._rate_limited,
+            'in_flight': self._in_flight,
+            'max_in_flight': self._max_in_flight,
+            'completion_tokens': self._completion_tokens,
+            'config': self.config,
+        }
+
+    # ── Internals ──
+
+    def _enter(self) -> None:
+        self._in_flight += 1
+        self._max_in_flight = max(self._max_in_flight, self._in_flight)
+
+    def _first_token_delay(self) -> float:
+        jitter = self.config['jitter_ms']
+        return max(0.0, self.config['latency_ms'] + self._random.uniform(-jitter, jitter)) / 1000
+
+    def _generation_time(self, text: str) -> float:
+        rate = self.config['tokens_per_second']
+        return _tokens(text) / rate if rate else 0.0
+
+    async def _stream(self, completion_id: str, model: str, content: str, usage: Dict[str, int]):
+        self._enter()
+        try:
+            await asyncio.sleep(self._first_token_delay())
+            chunks = [content[i:i + 64] for i in range(0, len(content), 64)]
+            for i, chunk in enumerate(chunks):
+                delta = {'role': 'assistant', 'content': chunk} if i == 0 else {'content': chunk}
+                yield _chunk(completion_id, model, delta, None)
+                await asyncio.sleep(self._generation_time(chunk))
+            yield _chunk(completion_id, model, {}, 'stop', usage)
+            yield 'data: [DONE]\n\n'
+        finally:
+            self._in_flight -= 1
+
+
+def _chunk(completion_id: str, model: str, delta: Dict[str, Any], finish_reason: Optional[str],
+           usage: Optional[Dict[str, int]] = None) -> str:
+    data = {
+        'id': completion_id,
+        'object': 'chat.completion.chunk',
+        'created': int(time.time()),
+        'model': model,
+        'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+    }
+    if usage is not None:
+        data['usage'] = usage
+    return f'data: {json.dumps(data)}\n\n'
+
+
+def _error(status: int, message: str, code: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    return JSONResponse(
+        {'error': {'message': message, 'type': code, 'param': None, 'code': code}},
+        status_code=status, headers=headers,
+    )
+
+
+def create_app(fake: FakeOpenAI) -> FastAPI:
+    app = FastAPI()
+
+    @app.post('/v1/chat/completions')
+    async def chat_completions(request: Request):
+        return await fake.complete(await request.json())
+
+    @app.get('/v1/models')
+    def models():
+        return {'object': 'list', 'data': [{'id': 'gpt-4.1-mini', 'object': 'model', 'owned_by': 'fake'}]}
+
+    @app.get('/fake/stats')
+    def fake_stats():
+        """Requests by kind, injected faults, concurrency and current settings."""
+        return fake.stats()
+
+    @app.post('/fake/config')
+    def fake_configure(data: dict):
+        """Change latency, throughput or fault injection while a load test runs."""
+        try:
+            return fake.configure(data)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='OpenAI-compatible stand-in server for load tests.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5900)
+    parser.add_argument('--seed', type=int, help='seed for jitter and fault injection')
+    for key, default in FAKE_DEFAULTS.items():
+        parser.add_argument('--' + key.replace('_', '-'), dest=key, type=float, default=default,
+                            help=f'(default {default:g})')
+    args = parser.parse_args()
+
+    import uvicorn
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    try:
+        fake = FakeOpenAI({key: getattr(args, key) for key in FAKE_DEFAULTS}, seed=args.seed)
+    except ValueError as e:
+        parser.error(str(e))
+    uvicorn.run(create_app(fake), host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,393 @@
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .context import split_blocks
+
+
+# ═══════════════════════════════════════════════════════════════
+#  LOCAL EXTRACTION  (rule-based parse of the agent outputs)
+# ═══════════════════════════════════════════════════════════════
+
+# Labelled numbers: schema path -> (label patterns with sign, value kind, agents to search in order).
+# Kinds: "pct" (plain percent), "share_pct" (must be written as "% of revenue"), "number",
+# "multiple", "money" (USD millions) and "price" (per-share amount, never rescaled).
+LABELLED_NUMBERS: Dict[str, Tuple[Tuple[Tuple[str, float], ...], str, Tuple[int, ...]]] = {
+    'assumptions.wacc': (((r'\bwacc\b', 1), (r'weighted average cost of capital', 1), (r'discount rate', 1)),
+                         'pct', (3, 2, 4)),
+    'assumptions.terminal_growth_rate': (((r'terminal (?:growth|g)(?: rate)?', 1),
+                                          (r'perpetu(?:al|ity) growth(?: rate)?', 1),
+                                          (r'long[- ]term growth(?: rate)?', 1)), 'pct', (3, 2, 4)),
+    'assumptions.exit_multiple': (((r'(?:exit|terminal) (?:ev/ebitda )?multiple', 1),), 'multiple', (3, 2, 4)),
+    'assumptions.tax_rate': (((r'(?:effective |marginal |corporate )?tax rate', 1),), 'pct', (3, 2, 4)),
+    'assumptions.risk_free_rate': (((r'risk[- ]free(?: rate)?', 1),), 'pct', (2, 3, 4)),
+    'assumptions.beta': (((r'(?<!unlevered )(?<!asset )\b(?:(?:re)?levered |equity )?beta\b', 1),), 'number',
+                         (2, 3, 4)),
+    'assumptions.equity_risk_premium': (((r'(?:equity|market) risk premium', 1), (r'\b(?:erp|mrp)\b', 1)),
+                                        'pct', (2, 3, 4)),
+    'base_year.revenue': (((r'base[- ]year revenue', 1), (r'(?:ltm|ttm|last actual|latest annual) revenue', 1)),
+                          'money', (3, 2)),
+    'base_year.depreciation_amortization_pct': (((r'\bd&a\b', 1), (r'depreciation(?: (?:and|&) amortization)?', 1)),
+                                                'share_pct', (2, 3)),
+    'base_year.capex_pct': (((r'\bcapex\b', 1), (r'capital expenditures?', 1)), 'share_pct', (2, 3)),
+    'base_year.nwc_pct': (((r'\b(?:change in )?nwc\b', 1), (r'(?:change in )?(?:net )?working capital', 1)),
+                          'share_pct', (2, 3)),
+    'terminal_value': (((r'(?<!pv of )(?<!present value of )terminal value(?: \(tv\))?', 1),), 'money', (3, 4)),
+    'pv_terminal_value': (((r'(?:pv|present value) of (?:the )?(?:terminal value|tv)', 1),), 'money', (3, 4)),
+    'enterprise_value': (((r'enterprise value(?: \(ev\))?', 1),), 'money', (3, 4)),
+    'net_debt': (((r'net debt', 1), (r'net cash(?: position)?', -1)), 'money', (2, 3, 4)),
+    'equity_value': (((r'equity value(?! per)', 1),), 'money', (3, 4)),
+    'shares_outstanding': (((r'(?:diluted )?shares outstanding', 1), (r'(?:diluted )?share count', 1),
+                            (r'number of shares', 1)), 'money', (2, 3, 4)),
+    'intrinsic_value_per_share': (((r'(?:intrinsic|implied|fair) (?:value|share price)(?: per share)?', 1),
+                                   (r'value per share', 1)), 'price', (3, 4)),
+}
+# "Label: text" lines of Agent 1's verification report.
+LABELLED_TEXT = {
+    'company_name': r'(?:legal|registered|official) (?:company )?name|company name',
+    'ticker': r'ticker(?: symbol)?|stock symbol',
+    'country': r'country(?: of (?:incorporation|domicile))?|headquarters country',
+    'industry': r'industry|sector',
+}
+# Free-text assumptions: the clause that states them.
+CLAUSES = {
+    'assumptions.revenue_growth_rates': r'revenue growth',
+    'assumptions.margin_assumptions': r'(?:ebit|operating) margin',
+}
+# Forecast table rows/columns, most specific first.
+FORECAST_METRICS = (
+    ('pv_fcf', r'\b(?:pv|present value)\b.*\b(?:fcff?|free cash flow|cash flow)'),
+    ('discount_factor', r'discount factor'),
+    ('revenue_growth_pct', r'growth'),
+    ('ebit_margin_pct', r'margin'),
+    ('nopat', r'nopat|after[- ]tax (?:ebit|operating)'),
+    ('ebit', r'\bebit\b|operating (?:income|profit)'),
+    ('tax_rate', r'tax rate|tax \(?%'),
+    ('depreciation_amortization', r'\bd&a\b|depreciation'),
+    ('capex', r'capex|capital expenditure'),
+    ('change_nwc', r'\bnwc\b|working capital'),
+    ('fcff', r'\bfcff?\b|free cash flow'),
+    ('revenue', r'revenue|sales'),
+)
+METRIC_KINDS = {
+    'revenue_growth_pct': 'pct', 'ebit_margin_pct': 'pct', 'tax_rate': 'pct', 'discount_factor': 'number',
+}
+MIN_FORECAST_YEARS = 3
+TICKER_EXCHANGES = {'NYSE', 'NASDAQ', 'LSE', 'TSX', 'OTC', 'AMEX', 'ASX', 'HKEX', 'SIX', 'XETRA', 'EURONEXT'}
+NOTE_HEADINGS = r'note|finding|issue|concern|adjust|recommend|observation|flag|check'
+MAX_NOTES = 10
+
+# What may sit between a label and its number: separators (a dash followed by a space is one,
+# not a minus sign), filler words and parenthesised label groups such as "(2035+)" or "(FY24)";
+# only a bare number in parentheses, "(1,234)", is a value (negative).
+_CONNECTOR = re.compile(
+    r'(?:[\s:=~≈*]|[-–—](?![$€£]?\d)|\((?:fy\s*)?(?:19|20)\d{2}\b[^)]{0,10}\)'
+    r'|\((?![$€£\s]*[\d,.]+\s*[a-z%×]{0,8}\s*\))[^)]{0,15}\)|[$€£]'
+    r'|\b(?:of|is|at|was|were|approx\.?|approximately|around|about|estimated|calculated|assumed|used|usd|us\$|eur)\b)*',
+    re.IGNORECASE,
+)
+# A minus sign touches its digits ("-2.5", "−2.5"); "(" only opens a bare parenthesised amount.
+_NUMBER = re.compile(
+    r'(?P<sign>[-−–](?=[$€£]?\d)|\((?=[$€£\s]*[\d,.]+\s*[a-z%×]{0,8}\s*\)))?\s*[$€£]?\s*'
+    r'(?P<num>\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?)\s*'
+    r'(?P<unit>%|x\b|×|bn\b|billion\b|b\b|tn\b|trillion\b|mm\b|mn\b|million\b|m\b|k\b|thousand\b)?',
+    re.IGNORECASE,
+)
+_YEAR = re.compile(r'^(?:fy\s*)?(?P<year>(?:19|20)\d{2})\s*(?P<suffix>[aefp])?$', re.IGNORECASE)
+_SEPARATOR_ROW = re.compile(r'^[\s|:\-]+$')
+_BULLET = re.compile(r'^\s*(?:[-*•]|\d+[.)])\s+')
+_MONEY_SCALE = {'bn': 1e3, 'billion': 1e3, 'b': 1e3, 'tn': 1e6, 'trillion': 1e6, 'k': 1e-3, 'thousand': 1e-3}
+
+
+def parse_number(text: Any, kind: str = 'plain') -> Optional[float]:
+    """The first number in ``text`` read as ``kind`` (see LABELLED_NUMBERS; "plain" ignores units), or None."""
+    if text is None or isinstance(text, bool):
+        return None
+    if isinstance(text, (int, float)):
+        return float(text)
+    match = _NUMBER.search(str(text))
+    return _scaled(match, kind) if match else None
+
+
+def parse_agent_outputs(results: List[Dict[str, Any]],
+                        company_name: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """Read the extraction schema's fields straight from the agent outputs.
+
+    Returns the partial data (``EXTRACTION_PROMPT`` layout) and the source of
+    every field it filled: "local" when read from the text, "derived" when
+    computed from other figures the text states (e.g. growth from a revenue
+    row) and "request" for the company name the job was started with.
+    """
+    texts = {r['agent']: _strip_react(r.get('result') or '') for r in results if r.get('agent')}
+    lines = {agent: _lines(text) for agent, text in texts.items()}
+    data: Dict[str, Any] = {'assumptions': {}, 'base_year': {}}
+    sources: Dict[str, str] = {}
+
+    def put(path: str, value: Any, source: str = 'local') -> None:
+        if value is None or path in sources:
+            return
+        target = data
+        *parents, leaf = path.split('.')
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[leaf] = value
+        sources[path] = source
+
+    for path, pattern in LABELLED_TEXT.items():
+        value = _labelled_text(lines.get(1, ()), pattern)
+        if path == 'ticker' and value is not None:
+            value = _ticker(value)
+        put(path, value)
+    put('company_name', company_name, 'request')
+
+    for path, (labels, kind, agents) in LABELLED_NUMBERS.items():
+        for agent in agents:
+            value = _labelled_number(lines.get(agent, ()), labels, kind)
+            if value is not None:
+                put(path, value)
+                break
+
+    for path, pattern in CLAUSES.items():
+        for agent in (3, 2):
+            value = _clause(lines.get(agent, ()), pattern)
+            if value:
+                put(path, value)
+                break
+
+    forecast, history = _forecast_table([texts[a] for a in (3, 4, 2) if a in texts],
+                                        data['base_year'].get('year'))
+    if forecast:
+        if history and 'base_year.revenue' not in sources and history[-1].get('revenue') is not None:
+            put('base_year.year', history[-1]['year'])
+            put('base_year.revenue', history[-1]['revenue'])
+        put('base_year.year', forecast[0]['year'] - 1, 'derived')
+        derived = _derive_drivers(forecast, data['base_year'].get('revenue'))
+        put('forecast', forecast, 'derived' if derived else 'local')
+
+    status = _validation_status(lines.get(4, ()), texts.get(4, ''))
+    put('validation_status', status)
+    put('risk_notes', _notes(texts, (3, 4, 2), r'risk') or None)
+    put('validation_notes', _notes(texts, (4,), NOTE_HEADINGS) or None)
+    return data, sources
+
+
+# ── Internals ──
+
+def _scaled(match: 're.Match[str]', kind: str) -> Optional[float]:
+    value = float(match.group('num').replace(',', ''))
+    if match.group('sign'):
+        value = -value
+    unit = (match.group('unit') or '').lower()
+    if kind == 'plain':
+        return value
+    if kind in ('pct', 'share_pct'):
+        if unit == '%':
+            return value
+        if kind == 'share_pct' or unit:
+            return None
+        # A rate written as a fraction (0.086) is a percentage here.
+        return value * 100 if 0 < abs(value) < 1 else value
+    if kind == 'number':
+        return value if not unit else None
+    if kind == 'multiple':
+        return value if unit in ('', 'x', '×') else None
+    if unit in ('%', 'x', '×'):
+        return None
+    if kind == 'price':
+        return value
+    if unit in _MONEY_SCALE:
+        return value * _MONEY_SCALE[unit]
+    # Amounts are in millions; a bare full figure (12,400,000,000) is rescaled.
+    return value / 1e6 if not unit and abs(value) >= 1e6 else value
+
+
+def _strip_react(text: str) -> str:
+    marker = re.search(r'final answer:\s*', text, re.IGNORECASE)
+    return text[marker.end():] if marker else text
+
+
+def _cells(row: str) -> List[str]:
+    return [c.strip() for c in row.strip().strip('|').split('|')]
+
+
+def _lines(text: str) -> List[str]:
+    """Lines with markdown emphasis and bullets removed; table rows as "label: cells"."""
+    out = []
+    for line in text.replace('**', '').replace('__', '').splitlines():
+        if not line.strip() or _SEPARATOR_ROW.match(line):
+            continue
+        if line.strip().startswith('|'):
+            cells = _cells(line)
+            line = f'{cells[0]}: {" | ".join(cells[1:])}' if len(cells) > 1 else cells[0]
+        out.append(_BULLET.sub('', line).strip())
+    return out
+
+
+def _labelled_number(lines: List[str], labels: Tuple[Tuple[str, float], ...], kind: str) -> Optional[float]:
+    for pattern, sign in labels:
+        label = re.compile(pattern, re.IGNORECASE)
+        for line in lines:
+            for match in label.finditer(line):
+                start = _CONNECTOR.match(line, match.end()).end()
+                number = _NUMBER.match(line, start)
+                if kind == 'share_pct' and number:
+                    tail = line[number.end():number.end() + 24].lower()
+                    if 'of revenue' not in tail and 'of sales' not in tail and 'of incremental' not in tail:
+                        continue
+                value = _scaled(number, kind) if number else None
+                if value is not None:
+                    return value * sign
+    return None
+
+
+def _labelled_text(lines: List[str], pattern: str) -> Optional[str]:
+    label = re.compile(rf'^(?:{pattern})\s*[:\-–—]\s*(?P<value>\S.*)$', re.IGNORECASE)
+    for line in lines:
+        match = label.match(line)
+        if match:
+            value = match.group('value').strip().rstrip(',;')
+            # A closing full stop goes, unless it ends an abbreviation ("Inc.", "Ltd.").
+            if value.endswith('.') and len(value.rsplit(None, 1)[-1]) > 5:
+                value = value[:-1]
+            if value and len(value) <= 150:
+                return value
+    return None
+
+
+def _ticker(value: str) -> Optional[str]:
+    tokens = [t for t in re.findall(r'\b[A-Z][A-Z0-9.]{0,9}\b', value) if t not in TICKER_EXCHANGES]
+    if not tokens or re.search(r'\b(?:n/?a|none|not (?:listed|public)|private)\b', value, re.IGNORECASE):
+        return None
+    return tokens[-1]
+
+
+def _clause(lines: List[str], pattern: str) -> Optional[str]:
+    label = re.compile(pattern, re.IGNORECASE)
+    for line in lines:
+        match = label.search(line)
+        if match and '%' in line[match.end():]:
+            clause = re.split(r';|\.(?!\d)', line[match.start():])[0].strip()
+            return clause[:200] if '%' in clause else None
+    return None
+
+
+def _tables(text: str) -> List[List[List[str]]]:
+    tables: List[List[List[str]]] = []
+    current: List[List[str]] = []
+    for line in text.replace('**', '').splitlines():
+        if line.strip().startswith('|'):
+            if not _SEPARATOR_ROW.match(line):
+                current.append(_cells(line))
+            continue
+        if current:
+            tables.append(current)
+            current = []
+    if current:
+        tables.append(current)
+    return tables
+
+
+def _year(cell: str) -> Optional[Tuple[int, str]]:
+    match = _YEAR.match(cell.strip())
+    return (int(match.group('year')), (match.group('suffix') or '').lower()) if match else None
+
+
+def _metric(label: str) -> Optional[str]:
+    for field, pattern in FORECAST_METRICS:
+        if re.search(pattern, label, re.IGNORECASE):
+            return field
+    return None
+
+
+def _year_rows(table: List[List[str]]) -> Dict[Tuple[int, str], Dict[str, Optional[float]]]:
+    """{(year, suffix): {metric: value}} from a table with years as columns or as rows."""
+    header = table[0]
+    rows: Dict[Tuple[int, str], Dict[str, Optional[float]]] = {}
+    year_columns = {i: _year(c) for i, c in enumerate(header) if i and _year(c)}
+    if len(year_columns) >= 2:
+        for row in table[1:]:
+            field = _metric(row[0]) if row else None
+            if field is None:
+                continue
+            for i, year in year_columns.items():
+                if i < len(row):
+                    rows.setdefault(year, {})[field] = parse_number(row[i], METRIC_KINDS.get(field, 'money'))
+        return rows
+    if not re.search(r'year|fy|period', header[0], re.IGNORECASE):
+        return rows
+    fields = {i: _metric(c) for i, c in enumerate(header) if i and _metric(c)}
+    for row in table[1:]:
+        year = _year(row[0]) if row else None
+        if year is None:
+            continue
+        rows[year] = {field: parse_number(row[i], METRIC_KINDS.get(field, 'money'))
+                      for i, field in fields.items() if i < len(row)}
+    return rows
+
+
+def _forecast_table(texts: List[str], base_year: Optional[int]
+                    ) -> Tuple[Optional[List[Dict[str, Any]]], List[Dict[str, Any]]]:
+    """The forecast rows (and historical rows) of the most complete year table."""
+    best: Tuple[List[Dict[str, Any]], List[Dict[str, Any]]] = ([], [])
+    for text in texts:
+        for table in _tables(text):
+            rows = _year_rows(table)
+            if not rows:
+                continue
+            estimates = [y for (y, suffix) in rows if suffix in ('e', 'f', 'p')]
+            if base_year is not None:
+                first = base_year + 1
+            elif estimates:
+                first = min(estimates)
+            else:
+                first = datetime.now().year
+            forecast, history = [], []
+            for (year, suffix), values in sorted(rows.items()):
+                row = {'year': year, **values}
+                (history if year < first or suffix == 'a' else forecast).append(row)
+            if len(forecast) > len(best[0]):
+                best = (forecast, history)
+    return (best[0] if len(best[0]) >= MIN_FORECAST_YEARS else None), best[1]
+
+
+def _derive_drivers(forecast: List[Dict[str, Any]], base_revenue: Optional[float]) -> bool:
+    """Fill growth / margin from the revenue and EBIT rows; True if anything was derived."""
+    derived = False
+    previous = base_revenue
+    for row in forecast:
+        revenue = row.get('revenue')
+        if row.get('revenue_growth_pct') is None and revenue is not None and previous:
+            row['revenue_growth_pct'] = (revenue / previous - 1) * 100
+            derived = True
+        if row.get('ebit_margin_pct') is None and revenue and row.get('ebit') is not None:
+            row['ebit_margin_pct'] = row['ebit'] / revenue * 100
+            derived = True
+        previous = revenue
+    return derived
+
+
+def _validation_status(lines: List[str], text: str) -> Optional[str]:
+    status = _labelled_text(lines, r'(?:final |overall )?(?:validation|audit) status|final status') or text
+    lowered = status.lower()
+    if 'rejected' in lowered:
+        return 'Rejected'
+    if re.search(r'adjusted\s*(?:&|and)\s*validated', lowered):
+        return 'Adjusted & Validated'
+    if 'validated' in lowered:
+        return 'Validated'
+    return None
+
+
+def _notes(texts: Dict[int, str], agents: Tuple[int, ...], headings: str) -> List[str]:
+    """List items under headings matching ``headings``, in agent order, without duplicates."""
+    notes: List[str] = []
+    for agent in agents:
+        blocks = split_blocks(texts.get(agent, ''))
+        for block in blocks:
+            heading = blocks[block['heading']]['text'] if block['heading'] is not None else ''
+            if block['kind'] != 'item' or not re.search(headings, heading, re.IGNORECASE):
+                continue
+            note = _BULLET.sub('', block['text'].replace('**', '')).strip()
+            if note and note not in notes:
+                notes.append(' '.join(note.split()))
+    return notes[:MAX_NOTES]
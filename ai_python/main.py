@@ -1,16 +1,31 @@
+import asyncio
+import os
 import uuid
-import threading
-import base64
+import zipfile
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Iterator, Optional
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse
 
-import io
 import logging
 
-from .jobs import jobs
-from .pipeline import run_dcf_pipeline
+from .artifacts import etag_matches, remove_artifacts, sweep_orphans
+from .batches import BATCH_PARALLELISM, MAX_BATCH_PARALLELISM, MAX_BATCH_SIZE, batch_runner
+from .checkpoints import CheckpointError, checkpoint_summary, rerun_job, resume_job
+from .coalescing import flights
+from .context import preload_tokenizer
+from .dcf_engine import monte_carlo_config, sensitivity_config
+from .events import broker, parse_last_event_id
+from .jobs import JOB_SWEEP_SECONDS, job_store, new_job
+from .llm_cache import llm_cache
+from .pipeline import deadlines_config
+from .ratelimit import limiter
+from .rendering import render_stage
+from .reports import REPORT_FILES, REPORT_MEDIA_TYPES, ZIP_CHUNK
+from .scheduler import QueueFullError, run_blocking, scheduler
+from .telemetry import metrics
 
 # Configure logging once for the whole service
 logging.basicConfig(
@@ -20,7 +35,44 @@ logging.basicConfig(
 )
 logger = logging.getLogger('dcf_pipeline')
 
-app = FastAPI()
+# Spooled report files live exactly as long as their job does.
+job_store.on_delete(remove_artifacts)
+job_store.on_change(broker.job_changed)
+job_store.on_delete(broker.forget)
+job_store.on_change(batch_runner.job_changed)
+job_store.on_change(metrics.job_changed)
+# Registered last: it deletes finished runs after mirroring them.
+job_store.on_change(flights.job_changed)
+
+
+async def _sweep_jobs() -> None:
+    """Evict expired jobs that nothing writes to or reads any more."""
+    while True:
+        await asyncio.sleep(JOB_SWEEP_SECONDS)
+        try:
+            await run_blocking(job_store.purge)
+        except Exception as e:
+            logger.warning('Job store sweep failed: %s', e)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pipelines are coroutines: run them on this loop instead of one thread each.
+    scheduler.bind_loop(asyncio.get_running_loop())
+    render_stage.start()
+    preload_tokenizer()
+    # Only a persistent store knows every job that may own spooled files; the
+    # memory store is empty at start-up and per process, so it cannot tell.
+    if job_store.persistent:
+        sweep_orphans(lambda job_id: job_id in job_store)
+    sweeper = asyncio.create_task(_sweep_jobs())
+    yield
+    sweeper.cancel()
+    scheduler.bind_loop(None)
+    render_stage.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -34,6 +86,33 @@ app.add_middleware(
 #  FASTAPI ROUTES
 # ═══════════════════════════════════════════════════════════════
 
+def _parse_options(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate the per-request pipeline options shared by single and batch runs."""
+    try:
+        sensitivity = sensitivity_config(data.get('sensitivity'))
+    except (AttributeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f'Invalid sensitivity options: {e}')
+    mode = data.get('mode') or 'standard'
+    if mode not in ('standard', 'monte_carlo'):
+        raise HTTPException(status_code=400, detail='Mode must be "standard" or "monte_carlo"')
+    try:
+        monte_carlo = monte_carlo_config(data.get('monte_carlo'))
+    except (AttributeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f'Invalid monte_carlo options: {e}')
+    try:
+        deadlines = deadlines_config(data.get('deadlines'))
+    except (AttributeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f'Invalid deadlines: {e}')
+    return {
+        # Skip the LLM response cache and force fresh agent/extraction calls.
+        'use_cache': not bool(data.get('bypass_cache', False)),
+        'sensitivity': sensitivity,
+        'mode': mode,
+        'monte_carlo': monte_carlo,
+        'deadlines': deadlines,
+    }
+
+
 @app.post('/api/dcf/start')
 def start_dcf(data: dict):
     """Start a DCF analysis pipeline."""
@@ -49,102 +128,438 @@ def start_dcf(data: dict):
     if not api_key or api_key == 'NO_KEY':
         raise HTTPException(status_code=400, detail='Please configure a valid OpenAI API key in Settings.')
 
+    try:
+        priority = int(data.get('priority', 0))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail='Priority must be an integer')
+    options = _parse_options(data)
+
     job_id = str(uuid.uuid4())
-    logger.info('New DCF job started: %s for company "%s"', job_id[:8], company_name)
-    jobs[job_id] = {
-        'status': 'running',
-        'current_agent': 1,
-        'current_agent_name': 'Company Existence Validation',
-        'agent_results': [],
-        'error': None,
-        'download_ready': False,
-        'zip_data': None,
-        'zip_filename': None,
-        'company_name': company_name,
-        'cancelled': False,
-    }
+    # Prompts and options are kept so the job can be resumed or re-run from a checkpoint.
+    job_store.create(job_id, new_job(company_name, prompts=prompts, options=options))
 
-    thread = threading.Thread(
-        target=run_dcf_pipeline,
-        args=(job_id, company_name, api_key, prompts)
-    )
-    thread.daemon = True
-    thread.start()
+    try:
+        position = flights.submit(job_id, company_name, api_key, prompts, options, priority)
+    except QueueFullError as e:
+        job_store.delete(job_id)
+        logger.warning('Rejected DCF job for company "%s": %s', company_name, e)
+        raise HTTPException(status_code=429, detail=str(e), headers={'Retry-After': '30'})
 
-    return {'job_id': job_id}
+    job_store.update(job_id, queue_position=position)
+    logger.info('New DCF job accepted: %s for company "%s" (queue position: %s)',
+                job_id[:8], company_name, position or 'started')
 
+    return {'job_id': job_id, 'status': 'queued' if position else 'running', 'queue_position': position}
 
-@app.get('/api/dcf/status/{job_id}')
-def dcf_status(job_id: str):
-    """Get the status of a DCF analysis job."""
-    job = jobs.get(job_id)
-    if not job:
-        raise HTTPException(status_code=404, detail='Job not found')
 
+def _queue_position(job_id: str, job: Dict[str, Any]) -> Optional[int]:
+    # A job waits in the scheduler under the id of the run it follows.
+    return scheduler.position(job.get('flight_id') or job_id)
+
+
+def _status_payload(job_id: str, job: Dict[str, Any], since: Optional[int] = None) -> Dict[str, Any]:
+    """Status response body; with ``since`` only results added after that version."""
+    results = job['agent_results']
+    if since is not None:
+        results = [r for r in results if r.get('version', 0) > since]
     return {
         'status': job['status'],
         'current_agent': job['current_agent'],
         'current_agent_name': job['current_agent_name'],
-        'agent_results': job['agent_results'],
+        'agent_results': results,
         'error': job['error'],
         'download_ready': job['download_ready'],
         'zip_filename': job.get('zip_filename'),
         'cancelled': job.get('cancelled', False),
+        'interrupted_stage': job.get('interrupted_stage'),
+        'render_timings': job.get('render_timings'),
+        'telemetry': job.get('telemetry'),
+        'extraction': job.get('extraction'),
+        'rate_limit': job.get('rate_limit'),
+        'checkpoint': checkpoint_summary(job),
+        'rerun_of': job.get('rerun_of'),
+        'queue_position': _queue_position(job_id, job),
+        'version': job.get('version', 0),
+        'delta': since is not None,
     }
 
 
+@app.get('/api/dcf/status/{job_id}')
+def dcf_status(job_id: str, request: Request, response: Response, since: Optional[int] = None):
+    """Get the status of a DCF analysis job.
+
+    Every response carries the job ``version`` and an ETag; ``If-None-Match``
+    returns 304 while nothing changed, and ``?since=<version>`` returns only
+    the agent results appended after that version.
+    """
+    job = job_store.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail='Job not found')
+
+    # Queue position lives in the scheduler, so it is part of the validator too.
+    etag = f'W/"{job.get("version", 0)}-{_queue_position(job_id, job) or 0}"'
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if etag_matches(request.headers.get('if-none-match', ''), etag):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return _status_payload(job_id, job, since)
+
+
+@app.get('/api/dcf/events/{job_id}')
+async def dcf_events(job_id: str, request: Request):
+    """Stream job progress as Server-Sent Events.
+
+    Emits ``stage`` on every status/agent transition, ``agent_result`` once per
+    completed agent and a final ``status`` event, then closes. Reconnecting
+    clients resume after the ``Last-Event-ID`` they send.
+    """
+    job = job_store.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail='Job not found')
+    broker.ensure_history(job_id, job)
+
+    last_id = parse_last_event_id(request.headers.get('last-event-id'))
+    return StreamingResponse(
+        broker.stream(job_id, last_id),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
 @app.post('/api/dcf/cancel/{job_id}')
 def dcf_cancel(job_id: str):
     """Request cancellation of a running DCF analysis job."""
-    job = jobs.get(job_id)
+    job = job_store.get(job_id)
     if not job:
         raise HTTPException(status_code=404, detail='Job not found')
 
-    job['cancelled'] = True
-    # Mark job as cancelled immediately from API point of view.
-    if job.get('status') == 'running':
-        job['status'] = 'cancelled'
-        job['current_agent_name'] = 'Cancelled by user'
+    flights.cancel(job_id)
+    job = job_store.get(job_id) or job
 
     logger.info('Cancellation requested for job %s', job_id[:8])
-    return {
-        'status': job['status'],
-        'current_agent': job['current_agent'],
-        'current_agent_name': job['current_agent_name'],
-        'agent_results': job['agent_results'],
-        'error': job['error'],
-        'download_ready': job['download_ready'],
-        'zip_filename': job.get('zip_filename'),
-        'cancelled': True,
-    }
+    return {**_status_payload(job_id, job), 'cancelled': True}
 
 
-@app.get('/api/dcf/download/{job_id}')
-def dcf_download(job_id: str):
-    """Download the ZIP file for a completed DCF analysis."""
-    job = jobs.get(job_id)
-    if not job:
+def _rerun_request(data: Optional[dict]) -> tuple:
+    """The API key and priority of a resume / re-run request."""
+    data = data or {}
+    api_key = (data.get('api_key') or '').strip()
+    if not api_key or api_key == 'NO_KEY':
+        raise HTTPException(status_code=400, detail='Please configure a valid OpenAI API key in Settings.')
+    try:
+        priority = int(data.get('priority', 0))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail='Priority must be an integer')
+    return api_key, priority
+
+
+@app.post('/api/dcf/resume/{job_id}')
+def dcf_resume(job_id: str, data: Optional[dict] = None):
+    """Continue a failed or cancelled job from its last checkpointed stage.
+
+    Agents whose results were checkpointed and the extracted data are not
+    run again; the job keeps its id, so status polling and SSE carry on.
+    """
+    if not job_store.get(job_id):
+        raise HTTPException(status_code=404, detail='Job not found')
+    api_key, priority = _rerun_request(data)
+    try:
+        position = resume_job(job_id, api_key, priority)
+    except CheckpointError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={'Retry-After': '30'})
+
+    return {'job_id': job_id, 'status': 'queued' if position else 'running', 'queue_position': position}
+
+
+@app.post('/api/dcf/rerun/{job_id}')
+def dcf_rerun(job_id: str, from_agent: int, data: Optional[dict] = None):
+    """Re-run agents ``from_agent``..4 of a finished job as a new job.
+
+    Earlier agents' results are copied from the source job; ``prompts`` in the
+    body replace the source job's prompts (e.g. an edited "agent4"), and
+    ``bypass_cache`` forces fresh calls for the re-run stages.
+    """
+    if not job_store.get(job_id):
         raise HTTPException(status_code=404, detail='Job not found')
+    api_key, priority = _rerun_request(data)
+    prompts = (data or {}).get('prompts')
+    if prompts is not None and not isinstance(prompts, dict):
+        raise HTTPException(status_code=400, detail='Prompts must be an object')
+    bypass = (data or {}).get('bypass_cache')
+    try:
+        new_id, position = rerun_job(job_id, from_agent, api_key, prompts,
+                                     use_cache=None if bypass is None else not bool(bypass), priority=priority)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except CheckpointError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={'Retry-After': '30'})
+
+    return {'job_id': new_id, 'rerun_of': job_id, 'from_agent': from_agent,
+            'status': 'queued' if position else 'running', 'queue_position': position}
 
-    if not job.get('download_ready') or not job.get('zip_data'):
+
+def _ready_artifact(job: Dict[str, Any]) -> str:
+    """Path of a job's spooled archive; 404 until it is ready, 410 once it is gone."""
+    path = job.get('artifact_path')
+    if not job.get('download_ready') or not path:
         raise HTTPException(status_code=404, detail='Download is not ready yet')
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=410, detail='The report for this job is no longer available')
+    return path
 
-    zip_bytes = base64.b64decode(job['zip_data'])
-    filename = job.get('zip_filename', 'dcf_valuation.zip')
 
-    return StreamingResponse(
-        io.BytesIO(zip_bytes),
+def _artifact_response(job: Dict[str, Any], request: Request) -> Response:
+    """Stream a job's spooled ZIP with ETag/If-None-Match and Range support."""
+    path = _ready_artifact(job)
+    etag = f'"{job["artifact_etag"]}"'
+    if etag_matches(request.headers.get('if-none-match', ''), etag):
+        return Response(status_code=304, headers={'ETag': etag})
+
+    return FileResponse(
+        path,
         media_type='application/zip',
-        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+        filename=job.get('zip_filename') or 'dcf_valuation.zip',
+        headers={'ETag': etag, 'Cache-Control': 'private, max-age=0, must-revalidate'},
     )
 
 
-@app.get('/api/health')
-def health():
-    return {'status': 'UP'}
+@app.api_route('/api/dcf/download/{job_id}', methods=['GET', 'HEAD'])
+def dcf_download(job_id: str, request: Request):
+    """Download the ZIP file for a completed DCF analysis.
+
+    The archive is streamed from the spool file; ETag/If-None-Match and
+    HTTP Range (resumable downloads) are supported.
+    """
+    job = job_store.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail='Job not found')
+    return _artifact_response(job, request)
+
+
+def _iter_member(archive: zipfile.ZipFile, name: str) -> Iterator[bytes]:
+    with archive, archive.open(name) as member:
+        while chunk := member.read(ZIP_CHUNK):
+            yield chunk
+
+
+@app.api_route('/api/dcf/download/{job_id}/{part}', methods=['GET', 'HEAD'])
+def dcf_download_file(job_id: str, part: str, request: Request):
+    """Download one file of a completed DCF analysis: ``word`` or ``excel``.
+
+    The file is streamed out of the job's archive, where it is stored
+    uncompressed, so nothing is unpacked or re-encoded. ETag/If-None-Match
+    are supported; use the archive download for HTTP Range.
+    """
+    name = REPORT_FILES.get(part)
+    if name is None:
+        raise HTTPException(status_code=404,
+                            detail=f'Unknown report file "{part}" (use one of: {", ".join(REPORT_FILES)})')
+    job = job_store.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail='Job not found')
+    path = _ready_artifact(job)
+
+    etag = f'"{job["artifact_etag"]}-{part}"'
+    if etag_matches(request.headers.get('if-none-match', ''), etag):
+        return Response(status_code=304, headers={'ETag': etag})
+
+    try:
+        archive = zipfile.ZipFile(path)
+        size = archive.getinfo(name).file_size
+    except (OSError, KeyError, zipfile.BadZipFile):
+        raise HTTPException(status_code=404, detail='This job has no such report file')
+    stem = os.path.splitext(job.get('zip_filename') or 'dcf_valuation.zip')[0]
+    headers = {
+        'ETag': etag,
+        'Cache-Control': 'private, max-age=0, must-revalidate',
+        'Content-Length': str(size),
+        'Content-Disposition': f'attachment; filename="{stem}{os.path.splitext(name)[1]}"',
+    }
+    if request.method == 'HEAD':
+        archive.close()
+        return Response(headers=headers, media_type=REPORT_MEDIA_TYPES[part])
+    return StreamingResponse(_iter_member(archive, name), media_type=REPORT_MEDIA_TYPES[part], headers=headers)
+
+
+# ═══════════════════════════════════════════════════════════════
+#  BATCH API
+# ═══════════════════════════════════════════════════════════════
 
+def _get_batch(batch_id: str) -> Dict[str, Any]:
+    batch = job_store.get(batch_id)
+    if not batch or batch.get('kind') != 'batch':
+        raise HTTPException(status_code=404, detail='Batch not found')
+    return batch
+
+
+def _batch_payload(batch_id: str, batch: Dict[str, Any]) -> Dict[str, Any]:
+    jobs = []
+    for child in batch['jobs']:
+        # Finished batches keep each child's outcome after the child is evicted.
+        job = job_store.get(child['job_id']) or child
+        jobs.append({
+            'job_id': child['job_id'],
+            'company_name': child['company_name'],
+            'status': job.get('status', 'expired'),
+            'current_agent': job.get('current_agent', 0),
+            'current_agent_name': job.get('current_agent_name'),
+            'queue_position': _queue_position(child['job_id'], job),
+            'error': job.get('error'),
+            'download_ready': job.get('download_ready', False),
+            'summary': job.get('summary'),
+        })
+    return {
+        'batch_id': batch_id,
+        'status': batch['status'],
+        'progress': batch['current_agent_name'],
+        'total': len(jobs),
+        'finished': batch.get('finished', 0),
+        'succeeded': batch.get('succeeded'),
+        'parallelism': batch.get('parallelism'),
+        'duplicates': batch.get('duplicates', []),
+        'error': batch['error'],
+        'download_ready': batch['download_ready'],
+        'zip_filename': batch.get('zip_filename'),
+        'cancelled': batch.get('cancelled', False),
+        'version': batch.get('version', 0),
+        'jobs': jobs,
+    }
+
+
+@app.post('/api/dcf/batch')
+def start_batch(data: dict):
+    """Start DCF analyses for a list of companies sharing prompts and options.
+
+    Repeated names (case/whitespace-insensitive) are run once. At most
+    ``parallelism`` companies of the batch are in the scheduler at a time.
+    """
+    if not data:
+        raise HTTPException(status_code=400, detail='No data provided')
+
+    companies = data.get('companies')
+    api_key = data.get('api_key', '').strip()
+    prompts = data.get('prompts', {})
+
+    if not isinstance(companies, list) or not all(isinstance(c, str) for c in companies):
+        raise HTTPException(status_code=400, detail='Companies must be a list of names')
+    companies = [c for c in companies if c.strip()]
+    if not companies:
+        raise HTTPException(status_code=400, detail='At least one company name is required')
+    if len(companies) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f'A batch accepts at most {MAX_BATCH_SIZE} companies')
+    if not api_key or api_key == 'NO_KEY':
+        raise HTTPException(status_code=400, detail='Please configure a valid OpenAI API key in Settings.')
 
-if __name__ == '__main__':
-    import uvicorn
+    try:
+        priority = int(data.get('priority', 0))
+        parallelism = int(data.get('parallelism', BATCH_PARALLELISM))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail='Priority and parallelism must be integers')
+    if not 1 <= parallelism <= MAX_BATCH_PARALLELISM:
+        raise HTTPException(status_code=400, detail=f'Parallelism must be between 1 and {MAX_BATCH_PARALLELISM}')
+    options = _parse_options(data)
 
-    uvicorn.run(app, host='0.0.0.0', port=5000)
+    batch_id = batch_runner.start(companies, api_key, prompts, options, parallelism, priority)
+    return _batch_payload(batch_id, job_store.get(batch_id))
+
+
+@app.get('/api/dcf/batch/{batch_id}')
+def batch_status(batch_id: str):
+    """Status of a batch and of every company in it."""
+    return _batch_payload(batch_id, _get_batch(batch_id))
+
+
+@app.get('/api/dcf/batch/{batch_id}/events')
+async def batch_events(batch_id: str, request: Request):
+    """Stream batch progress as Server-Sent Events.
+
+    Emits ``job`` whenever a company is scheduled or finishes, ``stage`` on
+    batch progress and a final ``status`` event once the combined archive is
+    ready (or the batch failed / was cancelled).
+    """
+    batch = _get_batch(batch_id)
+    broker.ensure_history(batch_id, batch)
+
+    last_id = parse_last_event_id(request.headers.get('last-event-id'))
+    return StreamingResponse(
+        broker.stream(batch_id, last_id),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+@app.post('/api/dcf/batch/{batch_id}/cancel')
+def batch_cancel(batch_id: str):
+    """Cancel every company of a batch that has not finished yet."""
+    _get_batch(batch_id)
+    batch_runner.cancel(batch_id)
+    logger.info('Cancellation requested for batch %s', batch_id[:8])
+    return _batch_payload(batch_id, job_store.get(batch_id))
+
+
+@app.api_route('/api/dcf/batch/{batch_id}/download', methods=['GET', 'HEAD'])
+def batch_download(batch_id: str, request: Request):
+    """Download the combined archive: per-company reports plus batch_summary.xlsx."""
+    return _artifact_response(_get_batch(batch_id), request)
+
+
+@app.get('/api/dcf/queue')
+def dcf_queue():
+    """Scheduler queue depth, worker occupancy and wait times."""
+    return {**scheduler.stats(), 'coalescing': flights.stats()}
+
+
+@app.get('/api/dcf/render')
+def dcf_render():
+    """Report render pool size, queueing and render timings."""
+    return render_stage.stats()
+
+
+@app.get('/api/dcf/store')
+def dcf_store():
+    """Job store size, retention and eviction settings."""
+    return job_store.stats()
+
+
+@app.get('/api/dcf/cache')
+def dcf_cache():
+    """LLM response cache hit/miss counters and size."""
+    return llm_cache.stats()
+
+
+@app.get('/api/dcf/ratelimit')
+def dcf_ratelimit():
+    """Current OpenAI rate limits, concurrency and throttling per API key and model."""
+    return limiter.stats()
+
+
+@app.get('/api/metrics')
+def dcf_metrics():
+    """Prometheus metrics: stage latency histograms, token / cost counters and queue gauges."""
+    queue = scheduler.stats()
+    render = render_stage.stats()
+    store = job_store.stats()
+    buckets = limiter.stats()['buckets']
+    gauges = {
+        'dcf_scheduler_running_jobs': ('Pipelines currently running.', queue['running']),
+        'dcf_scheduler_queued_jobs': ('Pipelines waiting for a worker.', queue['queued']),
+        'dcf_scheduler_rejected_jobs': ('Jobs rejected because the queue was full (since start).', queue['rejected']),
+        'dcf_render_in_flight': ('Report renders in progress.', render['in_flight']),
+        'dcf_job_store_jobs': ('Jobs held in the job store.', store['jobs']),
+        'dcf_coalesced_runs': ('Live runs shared by identical requests.', flights.stats()['runs']),
+        'dcf_openai_calls_in_flight': ('OpenAI calls in progress.', sum(b['in_flight'] for b in buckets)),
+        'dcf_openai_calls_throttled': ('OpenAI calls waiting for the rate limiter.', sum(b['waiting'] for b in buckets)),
+        'dcf_openai_rate_limited': ('OpenAI calls answered with 429 (since start).',
+                                    sum(b['rate_limited'] for b in buckets)),
+    }
+    return Response(metrics.render(gauges), media_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.get('/api/health')
+def health():
+    return {'status': 'UP'}
@@ -1,26 +1,262 @@
-import base64
+import asyncio
+import copy
 import logging
 import os
 import re
+import time
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Tuple
 
-from crewai import Agent, Task, Crew, Process
-from openai import OpenAI
+from crewai import Agent, Task, LLM
+from openai import AsyncOpenAI
 
-from .extraction import extract_structured_data
-from .jobs import jobs, check_cancelled
-from .reports import create_word, create_excel, create_zip
+from .context import agent_context, count_tokens
+from .dcf_engine import apply_dcf_engine, apply_monte_carlo, apply_sensitivity
+from .extraction import IncrementalExtraction
+from .jobs import job_store, check_cancelled
+from .llm_cache import cache_key, llm_cache
+from .ratelimit import COMPLETION_ESTIMATE, limiter
+from .rendering import render_stage
+from .reports import safe_company_name, valuation_summary
+from .scheduler import key_fingerprint, run_blocking, scheduler
+from .telemetry import JobTelemetry, metrics
 
 
 logger = logging.getLogger('dcf_pipeline')
 
+AGENT_MODEL = 'gpt-4.1-mini'
 
-def run_dcf_pipeline(job_id: str, company_name: str, api_key: str, prompts: Dict[str, Any]) -> None:
-    """Run the 4 CrewAI agents sequentially, then generate ZIP (Word + Excel)."""
+# Deadlines (seconds) for each agent, the extraction call and the whole job;
+# overridable per request with options["deadlines"] = {"agent", "extraction", "job"}.
+AGENT_TIMEOUT_SECONDS = float(os.environ.get('DCF_AGENT_TIMEOUT_SECONDS', '600'))
+EXTRACTION_TIMEOUT_SECONDS = float(os.environ.get('DCF_EXTRACTION_TIMEOUT_SECONDS', '300'))
+JOB_TIMEOUT_SECONDS = float(os.environ.get('DCF_JOB_TIMEOUT_SECONDS', '1800'))
+
+
+class DeadlineExceeded(Exception):
+    """A pipeline stage ran past its deadline."""
+
+
+def deadlines_config(config: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """Validate per-request deadline overrides; raises ValueError on bad input."""
+    deadlines = {
+        'agent': AGENT_TIMEOUT_SECONDS,
+        'extraction': EXTRACTION_TIMEOUT_SECONDS,
+        'job': JOB_TIMEOUT_SECONDS,
+    }
+    for key, value in (config or {}).items():
+        if key not in deadlines:
+            raise ValueError(f'unknown deadline "{key}"')
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f'{key} must be a number of seconds')
+        if value <= 0:
+            raise ValueError(f'{key} must be positive')
+        deadlines[key] = value
+    return deadlines
+
+
+async def _within(coro, seconds: float, stage: str) -> Any:
+    """Await ``coro``, cancelling it (and its in-flight request) after ``seconds``."""
+    try:
+        return await asyncio.wait_for(coro, timeout=seconds)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(f'{stage} exceeded its {seconds:g}s deadline') from None
+
+
+def interrupted_stage(job: Optional[Dict[str, Any]], reason: str) -> Optional[Dict[str, Any]]:
+    """Where a running job was stopped (``reason``: "cancelled" or "timeout")."""
+    if not job or job.get('status') != 'running':
+        return None
+    return {'agent': job.get('current_agent'), 'name': job.get('current_agent_name'), 'reason': reason}
+
+
+def _agent_messages(agent: Agent, task: Task) -> List[Dict[str, str]]:
+    """The chat prompt of a tool-less CrewAI agent: its persona as system, its task as user message."""
+    return [
+        {'role': 'system', 'content': f'You are {agent.role}. {agent.backstory}\nYour personal goal is: {agent.goal}'},
+        {'role': 'user', 'content': (f'Current Task: {task.description}\n\n'
+                                     f'This is the expected criteria for your final answer: {task.expected_output}\n'
+                                     'You MUST return the actual complete content as the final answer, not a summary.')},
+    ]
+
+
+async def _kickoff(job_id: str, client: AsyncOpenAI, agent_num: int, agent: Agent, task: Task,
+                   use_cache: bool) -> Tuple[str, Dict[str, Any]]:
+    """Run one agent's task, serving the output from the LLM cache when possible.
+
+    The agents have no tools, so a CrewAI kickoff is a single chat completion
+    made on a thread that cannot be interrupted. The same prompt is sent on
+    the job's ``AsyncOpenAI`` client instead: no thread is held while OpenAI
+    answers, and cancelling the job or hitting a deadline aborts the request.
+    The call goes through the shared rate limiter of the client's API key,
+    which retries a 429 or a transient error.
+    Returns the output and its usage (tokens, cache hit).
+    """
+    api_key = client.api_key
+    prompt = f'{agent.goal}\n{agent.backstory}\n{task.expected_output}'
+    key = cache_key(AGENT_MODEL, agent.role, prompt, task.description, key_fingerprint(api_key))
+    if use_cache:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            logger.info('[Job %s] Agent %d served from LLM cache', job_id[:8], agent_num)
+            return cached, {'cached': True}
+
+    messages = _agent_messages(agent, task)
+
+    async def call() -> Tuple[Tuple[str, Dict[str, Any]], Dict[str, Any]]:
+        response = await client.chat.completions.create(model=AGENT_MODEL, messages=messages)
+        token_usage = getattr(response, 'usage', None)
+        usage = {
+            'prompt_tokens': getattr(token_usage, 'prompt_tokens', 0) or 0,
+            'completion_tokens': getattr(token_usage, 'completion_tokens', 0) or 0,
+        }
+        return (response.choices[0].message.content or '', usage), usage
+
+    tokens = sum(count_tokens(m['content']) for m in messages) + COMPLETION_ESTIMATE
+    result, usage = await limiter.run(job_id, api_key, AGENT_MODEL, tokens, call)
+    if use_cache:
+        llm_cache.put(key, result)
+    return result, usage
+
+
+async def _run_agent(job_id: str, client: AsyncOpenAI, agent_num: int, agent: Agent, task: Task, use_cache: bool,
+                     deadline: float, stage: str, telemetry: JobTelemetry, restored: Dict[int, str]) -> str:
+    """One agent under its deadline, recorded as telemetry stage ``agent<n>``.
+
+    An agent whose output was restored from the job's checkpoint is not run again.
+    """
+    if agent_num in restored:
+        logger.info('[Job %s] Agent %d restored from checkpoint', job_id[:8], agent_num)
+        return restored[agent_num]
+    started = time.monotonic()
+    result, usage = await _within(_kickoff(job_id, client, agent_num, agent, task, use_cache), deadline, stage)
+    telemetry.record(f'agent{agent_num}', time.monotonic() - started, model=AGENT_MODEL, **usage)
+    return result
+
+
+def _accept(job_id: str, agent_num: int, name: str, result: str, restored: Dict[int, str],
+            checkpoint: Dict[str, Any], extraction: Optional[IncrementalExtraction]) -> None:
+    """Record a good agent result, advance the job's checkpoint past it and start its extraction section."""
+    if agent_num not in restored:
+        job_store.append_result(job_id, {'agent': agent_num, 'name': name, 'result': result})
+    checkpoint.update(stage=f'agent{agent_num}', agents=agent_num)
+    job_store.update(job_id, checkpoint=dict(checkpoint))
+    if extraction is not None:
+        extraction.agent_done({'agent': agent_num, 'name': name, 'result': result})
+
+
+def _value(job_id: str, structured: Dict[str, Any], options: Dict[str, Any]) -> Dict[str, Any]:
+    """Recompute forecast and valuation from the extracted drivers, plus grid / simulation."""
+    try:
+        structured = apply_dcf_engine(structured)
+        logger.info(
+            '[Job %s] DCF engine: EV %.1f, value/share %s (LLM reported %s)',
+            job_id[:8],
+            structured['enterprise_value'],
+            structured['intrinsic_value_per_share'],
+            structured['llm_reported'].get('intrinsic_value_per_share'),
+        )
+    except ValueError as engine_err:
+        logger.warning('[Job %s] DCF engine skipped, keeping extracted figures: %s', job_id[:8], engine_err)
+
+    try:
+        structured = apply_sensitivity(structured, options.get('sensitivity'))
+    except ValueError as grid_err:
+        logger.warning('[Job %s] Sensitivity grid skipped: %s', job_id[:8], grid_err)
+
+    if options.get('mode') == 'monte_carlo':
+        try:
+            structured = apply_monte_carlo(structured, options.get('monte_carlo'))
+            logger.info('[Job %s] Monte Carlo: %d scenarios, median %.2f', job_id[:8],
+                        structured['monte_carlo']['scenarios'],
+                        structured['monte_carlo']['percentiles']['p50'])
+        except ValueError as mc_err:
+            logger.warning('[Job %s] Monte Carlo skipped: %s', job_id[:8], mc_err)
+
+    return structured
+
+
+def cancel_job(job_id: str) -> bool:
+    """Request cancellation of a job; True if it was still queued or running.
+
+    A queued job is dropped from the scheduler and never starts; a running
+    one has its task cancelled, which aborts the LLM request in flight.
+    """
+    job = job_store.get(job_id)
+    job_store.update(job_id, cancelled=True)
+    # Mark job as cancelled immediately from API point of view.
+    cancelled = job_store.update_if_status(
+        job_id, ('queued', 'running'),
+        status='cancelled', current_agent_name='Cancelled by user',
+        interrupted_stage=interrupted_stage(job, 'cancelled'),
+    )
+    scheduler.cancel(job_id)
+    return cancelled
+
+
+async def run_dcf_pipeline(job_id: str, company_name: str, api_key: str, prompts: Dict[str, Any],
+                           options: Optional[Dict[str, Any]] = None) -> None:
+    """Run the 4 CrewAI agents sequentially, then generate ZIP (Word + Excel).
+
+    A coroutine: the scheduler runs it on the service event loop, where a job
+    waiting on OpenAI holds no thread. Blocking work goes to ``run_blocking``.
+
+    ``options`` carries per-request flags: ``use_cache`` (default True) lets
+    agent and extraction calls be answered from the LLM response cache;
+    ``sensitivity`` overrides the WACC / growth / exit-multiple grid axes;
+    ``mode`` = "monte_carlo" adds a simulation configured by ``monte_carlo``;
+    ``deadlines`` overrides the agent / extraction / whole-job time limits.
+    Cancelling the task (``cancel_job``) or hitting a deadline stops the job
+    at once, keeping the finished agents' results and the interrupted stage.
+    """
+    options = options or {}
+    deadlines = options.get('deadlines') or deadlines_config(None)
+    # The shared rate limiter retries 429s and transient errors itself.
+    client = AsyncOpenAI(api_key=api_key, max_retries=0)
+    metrics.run_started(job_id)
+    try:
+        await asyncio.wait_for(
+            _run_stages(job_id, company_name, api_key, client, prompts, options, deadlines),
+            timeout=deadlines['job'],
+        )
+    except asyncio.TimeoutError:
+        logger.warning('[Job %s] Job exceeded its %gs deadline', job_id[:8], deadlines['job'])
+        job_store.update_if_status(
+            job_id, ('running',),
+            status='error', error=f'The job exceeded its {deadlines["job"]:g}s deadline.',
+            interrupted_stage=interrupted_stage(job_store.get(job_id), 'timeout'),
+        )
+    except asyncio.CancelledError:
+        logger.info('[Job %s] Pipeline task cancelled', job_id[:8])
+        # Normally cancel_job already recorded the state; this covers shutdown.
+        job_store.update_if_status(
+            job_id, ('running',),
+            status='cancelled', current_agent_name='Cancelled',
+            interrupted_stage=interrupted_stage(job_store.get(job_id), 'cancelled'),
+        )
+        raise
+    finally:
+        await client.close()
+        metrics.run_ended(job_id)
+        limiter.forget(job_id)
+
+
+async def _run_stages(job_id: str, company_name: str, api_key: str, client: AsyncOpenAI,
+                      prompts: Dict[str, Any], options: Dict[str, Any], deadlines: Dict[str, float]) -> None:
+    """Agents, extraction, valuation and reports, each stage under its deadline."""
+    use_cache = options.get('use_cache', True)
+    telemetry = JobTelemetry(job_id)
+    # A resumed or re-run job starts with the agents (and extraction) its checkpoint covers.
+    job = job_store.get(job_id) or {}
+    checkpoint = dict(job.get('checkpoint') or {'stage': None, 'agents': 0, 'extracted': None})
+    restored = {r['agent']: r['result'] for r in job.get('agent_results') or ()
+                if r.get('agent') and r['agent'] <= checkpoint['agents']}
+    # Extraction runs section by section in the background as each agent is accepted.
+    extraction = (IncrementalExtraction(client, company_name, use_cache, job_id)
+                  if checkpoint.get('extracted') is None else None)
     try:
-        os.environ['OPENAI_API_KEY'] = api_key
-        client = OpenAI(api_key=api_key)
         logger.info('[Job %s] === DCF PIPELINE STARTED for "%s" ===', job_id[:8], company_name)
 
         prompt_agent1 = prompts.get('agent1', 'You are a corporate intelligence verification agent.')
@@ -32,8 +268,13 @@ def run_dcf_pipeline(job_id: str, company_name: str, api_key: str, prompts: Dict
             return
 
         # ─── Agent 1: Company Existence Validation ───────────────────
-        jobs[job_id]['current_agent'] = 1
-        jobs[job_id]['current_agent_name'] = 'Company Existence Validation'
+        job_store.update(
+            job_id,
+            status='running',
+            queue_position=None,
+            current_agent=1,
+            current_agent_name='Company Existence Validation',
+        )
         logger.info('[Job %s] Agent 1 (Company Existence Validation) starting...', job_id[:8])
 
         agent1 = Agent(
@@ -41,7 +282,7 @@ def run_dcf_pipeline(job_id: str, company_name: str, api_key: str, prompts: Dict
             goal=f'Verify if the company "{company_name}" exists and gather basic corporate info',
             backstory=prompt_agent1,
             verbose=False,
-            llm='gpt-4.1-mini',
+            llm=LLM(model=AGENT_MODEL, api_key=api_key),
         )
         task1 = Task(
             # For Agent 1, the task description is the same as its backstory prompt.
@@ -53,9 +294,10 @@ def run_dcf_pipeline(job_id: str, company_name: str, api_key: str, prompts: Dict
                 '\"Company Status: [Exists/Does Not Exist/Uncertain]\".'
             ),
         )
-        crew1 = Crew(agents=[agent1], tasks=[task1], process=Process.sequential, verbose=False)
-        result1 = crew1.kickoff()
-        result1_str = str(result1)
+        result1_str = await _run_agent(
+            job_id, client, 1, agent1, task1, use_cache, deadlines['agent'], 'Agent 1 (Company Existence Validation)',
+            telemetry, restored,
+        )
 
         logger.info('[Job %s] Agent 1 completed. Result length: %d chars', job_id[:8], len(result1_str))
 
@@ -81,27 +323,27 @@ def run_dcf_pipeline(job_id: str, company_name: str, api_key: str, prompts: Dict
                 job_id[:8],
                 status,
             )
-            jobs[job_id]['agent_results'].append({
+            job_store.append_result(job_id, {
                 'agent': 1, 'name': 'Company Existence Validation', 'result': result1_str,
             })
-            jobs[job_id]['status'] = 'error'
             safe_status = status or "Unknown"
-            jobs[job_id]['error'] = (
-                f'Company verification failed: The company "{company_name}" was marked as "{safe_status}" '
-                'by the verification agent, so the DCF pipeline was stopped.'
+            job_store.update(
+                job_id,
+                status='error',
+                error=(
+                    f'Company verification failed: The company "{company_name}" was marked as "{safe_status}" '
+                    'by the verification agent, so the DCF pipeline was stopped.'
+                ),
             )
             return
 
-        jobs[job_id]['agent_results'].append({
-            'agent': 1, 'name': 'Company Existence Validation', 'result': result1_str,
-        })
+        _accept(job_id, 1, 'Company Existence Validation', result1_str, restored, checkpoint, extraction)
 
         if check_cancelled(job_id):
             return
 
         # ─── Agent 2: DCF Input Data Collection ─────────────────────
-        jobs[job_id]['current_agent'] = 2
-        jobs[job_id]['current_agent_name'] = 'DCF Input Data Collection'
+        job_store.update(job_id, current_agent=2, current_agent_name='DCF Input Data Collection')
         logger.info('[Job %s] Agent 2 (DCF Input Data Collection) starting...', job_id[:8])
 
         agent2 = Agent(
@@ -109,13 +351,13 @@ def run_dcf_pipeline(job_id: str, company_name: str, api_key: str, prompts: Dict
             goal=f'Collect all required DCF input data for {company_name}',
             backstory=prompt_agent2,
             verbose=False,
-            llm='gpt-4.1-mini',
+            llm=LLM(model=AGENT_MODEL, api_key=api_key),
         )
         task2 = Task(
             description=(
                 f'{prompt_agent2}\n\n'
                 'Read carefully the full result of Agent 1 provided below and then perform your task.\n\n'
-                f'Agent 1 result:\n{result1_str[:3000]}'
+                f"Agent 1 result:\n{agent_context('agent2', 'agent1', result1_str)}"
             ),
             agent=agent2,
             expected_output=(
@@ -123,21 +365,19 @@ def run_dcf_pipeline(job_id: str, company_name: str, api_key: str, prompts: Dict
                 'with data quality score.'
             ),
         )
-        crew2 = Crew(agents=[agent2], tasks=[task2], process=Process.sequential, verbose=False)
-        result2 = crew2.kickoff()
-        result2_str = str(result2)
+        result2_str = await _run_agent(
+            job_id, client, 2, agent2, task2, use_cache, deadlines['agent'], 'Agent 2 (DCF Input Data Collection)',
+            telemetry, restored,
+        )
 
         logger.info('[Job %s] Agent 2 completed. Result length: %d chars', job_id[:8], len(result2_str))
-        jobs[job_id]['agent_results'].append({
-            'agent': 2, 'name': 'DCF Input Data Collection', 'result': result2_str,
-        })
+        _accept(job_id, 2, 'DCF Input Data Collection', result2_str, restored, checkpoint, extraction)
 
         if check_cancelled(job_id):
             return
 
         # ─── Agent 3: DCF Calculation ────────────────────────────────
-        jobs[job_id]['current_agent'] = 3
-        jobs[job_id]['current_agent_name'] = 'DCF Calculation'
+        job_store.update(job_id, current_agent=3, current_agent_name='DCF Calculation')
         logger.info('[Job %s] Agent 3 (DCF Calculation) starting...', job_id[:8])
 
         agent3 = Agent(
@@ -145,35 +385,36 @@ def run_dcf_pipeline(job_id: str, company_name: str, api_key: str, prompts: Dict
             goal=f'Build a complete 10-year DCF model for {company_name}',
             backstory=prompt_agent3,
             verbose=False,
-            llm='gpt-4.1-mini',
+            llm=LLM(model=AGENT_MODEL, api_key=api_key),
         )
         task3 = Task(
             description=(
                 f'{prompt_agent3}\n\n'
                 'Read carefully the full result of Agent 2 provided below and then perform your task.\n\n'
-                f'Agent 2 result:\n{result2_str[:4000]}'
+                f"Agent 2 result:\n{agent_context('agent3', 'agent2', result2_str)}"
             ),
             agent=agent3,
             expected_output=(
                 'Complete DCF model with forecast tables, FCF calculations, PV, terminal value, '
-                'EV, equity value, per-share value, and sensitivity analysis.'
+                'EV, equity value, per-share value, and sensitivity analysis. State the base-year '
+                'revenue and every year-by-year driver explicitly (revenue growth %, EBIT margin %, '
+                'tax rate, D&A, capex and change in NWC), because the final valuation arithmetic is '
+                'recomputed from these drivers.'
             ),
         )
-        crew3 = Crew(agents=[agent3], tasks=[task3], process=Process.sequential, verbose=False)
-        result3 = crew3.kickoff()
-        result3_str = str(result3)
+        result3_str = await _run_agent(
+            job_id, client, 3, agent3, task3, use_cache, deadlines['agent'], 'Agent 3 (DCF Calculation)',
+            telemetry, restored,
+        )
 
         logger.info('[Job %s] Agent 3 completed. Result length: %d chars', job_id[:8], len(result3_str))
-        jobs[job_id]['agent_results'].append({
-            'agent': 3, 'name': 'DCF Calculation', 'result': result3_str,
-        })
+        _accept(job_id, 3, 'DCF Calculation', result3_str, restored, checkpoint, extraction)
 
         if check_cancelled(job_id):
             return
 
         # ─── Agent 4: Validation & Realism Audit ────────────────────
-        jobs[job_id]['current_agent'] = 4
-        jobs[job_id]['current_agent_name'] = 'Validation & Realism Audit'
+        job_store.update(job_id, current_agent=4, current_agent_name='Validation & Realism Audit')
         logger.info('[Job %s] Agent 4 (Validation & Realism Audit) starting...', job_id[:8])
 
         agent4 = Agent(
@@ -181,15 +422,15 @@ def run_dcf_pipeline(job_id: str, company_name: str, api_key: str, prompts: Dict
             goal=f'Audit and validate the DCF analysis for {company_name}',
             backstory=prompt_agent4,
             verbose=False,
-            llm='gpt-4.1-mini',
+            llm=LLM(model=AGENT_MODEL, api_key=api_key),
         )
         task4 = Task(
             description=(
                 f'{prompt_agent4}\n\n'
                 'Read carefully the full results of the previous agents provided below and then perform your task.\n\n'
-                f'Agent 1 (Company verification):\n{result1_str[:1500]}\n\n'
-                f'Agent 2 (Financial data):\n{result2_str[:2500]}\n\n'
-                f'Agent 3 (DCF model):\n{result3_str[:4000]}'
+                f"Agent 1 (Company verification):\n{agent_context('agent4', 'agent1', result1_str)}\n\n"
+                f"Agent 2 (Financial data):\n{agent_context('agent4', 'agent2', result2_str)}\n\n"
+                f"Agent 3 (DCF model):\n{agent_context('agent4', 'agent3', result3_str)}"
             ),
             agent=agent4,
             expected_output=(
@@ -197,62 +438,96 @@ def run_dcf_pipeline(job_id: str, company_name: str, api_key: str, prompts: Dict
                 '[Validated / Adjusted & Validated / Rejected].'
             ),
         )
-        crew4 = Crew(agents=[agent4], tasks=[task4], process=Process.sequential, verbose=False)
-        result4 = crew4.kickoff()
-        result4_str = str(result4)
+        result4_str = await _run_agent(
+            job_id, client, 4, agent4, task4, use_cache, deadlines['agent'], 'Agent 4 (Validation & Realism Audit)',
+            telemetry, restored,
+        )
 
         logger.info('[Job %s] Agent 4 completed. Result length: %d chars', job_id[:8], len(result4_str))
 
         if 'rejected' in result4_str.lower():
             logger.warning('[Job %s] Agent 4: Analysis REJECTED. Stopping pipeline.', job_id[:8])
-            jobs[job_id]['agent_results'].append({
+            if extraction is not None:
+                # Nothing will be valued: stop the sections' OpenAI calls now.
+                await extraction.cancel()
+            job_store.append_result(job_id, {
                 'agent': 4, 'name': 'Validation & Realism Audit', 'result': result4_str,
             })
-            jobs[job_id]['status'] = 'error'
-            jobs[job_id]['error'] = (
-                'Validation agent rejected the analysis. See agent 4 results for details.'
+            job_store.update(
+                job_id,
+                status='error',
+                error='Validation agent rejected the analysis. See agent 4 results for details.',
             )
             return
 
-        jobs[job_id]['agent_results'].append({
-            'agent': 4, 'name': 'Validation & Realism Audit', 'result': result4_str,
-        })
+        _accept(job_id, 4, 'Validation & Realism Audit', result4_str, restored, checkpoint, extraction)
 
         if check_cancelled(job_id):
             return
 
         # ─── Extract structured data ────────────────────────────────
-        jobs[job_id]['current_agent'] = 0
-        jobs[job_id]['current_agent_name'] = 'Extracting structured data...'
-        logger.info('[Job %s] All 4 agents done. Extracting structured JSON data...', job_id[:8])
+        job_store.update(job_id, current_agent=0, current_agent_name='Extracting structured data...')
+        logger.info('[Job %s] All 4 agents done. Merging structured JSON data...', job_id[:8])
+
+        if extraction is None:
+            logger.info('[Job %s] Structured data restored from checkpoint', job_id[:8])
+            structured = copy.deepcopy(checkpoint['extracted'])
+        else:
+            # Only what the sections still have to do is on the critical path now.
+            started = time.monotonic()
+            structured, usage, report = await _within(
+                extraction.result(), deadlines['extraction'], 'Structured data extraction',
+            )
+            telemetry.record('extraction', time.monotonic() - started, **usage)
+            job_store.update(job_id, extraction=report)
+            checkpoint.update(stage='extraction', extracted=copy.deepcopy(structured))
+            job_store.update(job_id, checkpoint=dict(checkpoint))
 
-        structured = extract_structured_data(client, company_name, jobs[job_id]['agent_results'])
+        # Valuation arithmetic and rendering are CPU-bound: keep them off the event loop.
+        structured = await run_blocking(_value, job_id, structured, options)
 
         # ─── Generate Word + Excel + ZIP ────────────────────────────
-        jobs[job_id]['current_agent_name'] = 'Generating reports...'
+        job_store.update(job_id, current_agent_name='Generating reports...')
         logger.info('[Job %s] Generating Word document and Excel file...', job_id[:8])
 
-        word_bytes = create_word(structured, company_name)
-        excel_bytes = create_excel(structured)
-        zip_bytes = create_zip(word_bytes, excel_bytes)
+        artifact, render_timings = await render_stage.render(
+            job_id, structured, company_name, job_store.get(job_id)['agent_results'],
+        )
+        logger.info('[Job %s] Reports rendered: %s', job_id[:8], render_timings)
+        for stage in ('word', 'excel', 'zip'):
+            telemetry.record(stage, render_timings[f'{stage}_ms'] / 1000,
+                             queue_seconds=render_timings[f'{stage}_queue_ms'] / 1000)
 
         # Dynamic filename: companyname_valuation_YYYYMMDD.zip
-        raw = company_name.split('-')[0].strip() if '-' in company_name else company_name
-        safe_name = re.sub(r'[^a-zA-Z0-9_-]', '_', raw)
-        safe_name = re.sub(r'_+', '_', safe_name).strip('_').lower()
         date_str = datetime.now().strftime('%Y%m%d')
-        zip_filename = f'{safe_name}_valuation_{date_str}.zip'
-
-        jobs[job_id]['zip_data'] = base64.b64encode(zip_bytes).decode('utf-8')
-        jobs[job_id]['zip_filename'] = zip_filename
-        jobs[job_id]['download_ready'] = True
-        jobs[job_id]['status'] = 'complete'
-        jobs[job_id]['current_agent'] = 0
-        jobs[job_id]['current_agent_name'] = 'Complete'
+        zip_filename = f'{safe_company_name(company_name)}_valuation_{date_str}.zip'
+
+        job_store.update(
+            job_id,
+            artifact_path=artifact['path'],
+            artifact_size=artifact['size'],
+            artifact_etag=artifact['etag'],
+            zip_filename=zip_filename,
+            summary=valuation_summary(structured),
+            render_timings=render_timings,
+            download_ready=True,
+            status='complete',
+            current_agent=0,
+            current_agent_name='Complete',
+        )
         logger.info('[Job %s] === PIPELINE COMPLETE. ZIP ready: %s ===', job_id[:8], zip_filename)
 
+    except DeadlineExceeded as e:
+        logger.warning('[Job %s] %s', job_id[:8], e)
+        job_store.update_if_status(
+            job_id, ('running',),
+            status='error', error=f'{e}.',
+            interrupted_stage=interrupted_stage(job_store.get(job_id), 'timeout'),
+        )
     except Exception as e:
         logger.error('[Job %s] PIPELINE FAILED: %s', job_id[:8], str(e), exc_info=True)
-        jobs[job_id]['status'] = 'error'
-        jobs[job_id]['error'] = str(e)
+        job_store.update(job_id, status='error', error=str(e))
+    finally:
+        if extraction is not None:
+            await extraction.cancel()
 
@@ -0,0 +1,372 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .jobs import job_store
+from .scheduler import key_fingerprint
+
+logger = logging.getLogger('dcf_pipeline')
+
+
+# ═══════════════════════════════════════════════════════════════
+#  RATE LIMITER  (shared OpenAI budget per API key and model)
+# ═══════════════════════════════════════════════════════════════
+
+# Requests and tokens per minute allowed per (API key, model); override per
+# model with DCF_RATE_LIMITS='{"gpt-4.1-mini": {"rpm": 500, "tpm": 200000}}'.
+REQUESTS_PER_MINUTE = int(os.environ.get('DCF_RATE_RPM', '500'))
+TOKENS_PER_MINUTE = int(os.environ.get('DCF_RATE_TPM', '200000'))
+MODEL_LIMITS: Dict[str, Dict[str, int]] = {}
+try:
+    MODEL_LIMITS.update({
+        model: {k: int(limits[k]) for k in ('rpm', 'tpm') if k in limits}
+        for model, limits in json.loads(os.environ.get('DCF_RATE_LIMITS') or '{}').items()
+    })
+except (ValueError, TypeError, AttributeError) as e:
+    logger.error('Ignoring invalid DCF_RATE_LIMITS: %s', e)
+
+# Calls in flight per (API key, model): starts here, grows by one per window
+# of successful calls and halves on a 429.
+INITIAL_CONCURRENCY = int(os.environ.get('DCF_RATE_CONCURRENCY', '4'))
+MAX_CONCURRENCY = int(os.environ.get('DCF_RATE_MAX_CONCURRENCY', '16'))
+# Retries of a call answered with 429 (after its Retry-After) or a 5xx / connection error.
+RATE_LIMIT_RETRIES = int(os.environ.get('DCF_RATE_LIMIT_RETRIES', '4'))
+TRANSIENT_RETRIES = 2
+# Completion tokens reserved for a call without max_tokens (reconciled afterwards).
+COMPLETION_ESTIMATE = int(os.environ.get('DCF_RATE_COMPLETION_ESTIMATE', '1500'))
+# Shrink concurrency when recent latency per completion token exceeds this
+# multiple of its long-run average.
+LATENCY_FACTOR = 2.0
+DECREASE_INTERVAL_SECONDS = 5.0
+IDLE_BUCKET_SECONDS = 600.0
+_MAX_SLEEP_SECONDS = 1.0
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, 'status_code', None) or getattr(getattr(exc, 'response', None), 'status_code', None)
+    return status if isinstance(status, int) else None
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    """A 429 from OpenAI (raised by the openai SDK or LiteLLM); an exhausted quota is not retried."""
+    if getattr(exc, 'code', None) == 'insufficient_quota':
+        return False
+    return _status_code(exc) == 429 or type(exc).__name__ == 'RateLimitError'
+
+
+def _is_transient(exc: BaseException) -> bool:
+    status = _status_code(exc)
+    return (status is not None and status >= 500) or type(exc).__name__ in (
+        'APIConnectionError', 'APITimeoutError', 'InternalServerError', 'ServiceUnavailableError', 'Timeout')
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, 'response', None), 'headers', None) or {}
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        if headers.get('retry-after'):
+            return float(headers['retry-after'])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+class _Bucket:
+    """Token buckets (requests, tokens) and the AIMD concurrency limit of one key and model."""
+
+    def __init__(self, key_id: str, model: str) -> None:
+        limits = MODEL_LIMITS.get(model, {})
+        self.key_id = key_id
+        self.model = model
+        self.rpm = max(1, limits.get('rpm', REQUESTS_PER_MINUTE))
+        self.tpm = max(1, limits.get('tpm', TOKENS_PER_MINUTE))
+        self.requests = float(self.rpm)
+        self.tokens = float(self.tpm)
+        self.concurrency = float(max(1, min(INITIAL_CONCURRENCY, MAX_CONCURRENCY)))
+        self.in_flight = 0
+        self.waiting = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.latency_fast: Optional[float] = None
+        self.latency_slow: Optional[float] = None
+        self.refilled = self.used = time.monotonic()
+        self.calls = self.throttled_calls = self.rate_limited = 0
+        self.throttle_seconds = 0.0
+
+    def try_acquire(self, tokens: int, now: float) -> float:
+        """Take a slot and the call's budget, or return the seconds to wait before trying again."""
+        elapsed = now - self.refilled
+        self.refilled = now
+        self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60)
+        self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60)
+        self.used = now
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.in_flight >= int(self.concurrency):
+            return 0.05
+        # A call larger than the whole bucket goes once the bucket is full.
+        tokens = min(tokens, self.tpm)
+        if self.requests < 1:
+            return (1 - self.requests) * 60 / self.rpm
+        if self.tokens < tokens:
+            return (tokens - self.tokens) * 60 / self.tpm
+        self.requests -= 1
+        self.tokens -= tokens
+        self.in_flight += 1
+        self.calls += 1
+        return 0.0
+
+    def succeeded(self, reserved: int, used: int, completion_tokens: int, seconds: float, now: float) -> None:
+        self.in_flight -= 1
+        self.tokens += reserved - used
+        latency = seconds / max(1, completion_tokens)
+        self.latency_fast = latency if self.latency_fast is None else 0.7 * self.latency_fast + 0.3 * latency
+        self.latency_slow = latency if self.latency_slow is None else 0.95 * self.latency_slow + 0.05 * latency
+        if self.latency_fast > LATENCY_FACTOR * self.latency_slow:
+            self._decrease(0.9, now)
+        else:
+            self.concurrency = min(MAX_CONCURRENCY, self.concurrency + 1 / self.concurrency)
+
+    def failed(self, reserved: int, exc: BaseException, attempt: int, now: float) -> Optional[float]:
+        """Release the call's slot; the seconds to wait before retrying it, or None to give up."""
+        self.in_flight -= 1
+        if is_rate_limited(exc):
+            # A rejected call consumed no tokens; everyone on this key backs off.
+            self.tokens += reserved
+            self.rate_limited += 1
+            self._decrease(0.5, now)
+            delay = _retry_after(exc) or min(30.0, 2 ** attempt) * (1 + random.random() / 2)
+            self.paused_until = max(self.paused_until, now + delay)
+            return delay if attempt < RATE_LIMIT_RETRIES else None
+        if _is_transient(exc) and attempt < TRANSIENT_RETRIES:
+            return min(8.0, 0.5 * 2 ** attempt) * (1 + random.random() / 2)
+        return None
+
+    def limits(self) -> Dict[str, Any]:
+        return {
+            'requests_per_minute': self.rpm,
+            'tokens_per_minute': self.tpm,
+            'concurrency': int(self.concurrency),
+        }
+
+    def _decrease(self, factor: float, now: float) -> None:
+        # One decrease per interval: the calls already in flight report the same congestion.
+        if now - self.last_decrease >= DECREASE_INTERVAL_SECONDS:
+            self.concurrency = max(1.0, self.concurrency * factor)
+            self.last_decrease = now
+            logger.info('Rate limiter %s/%s: concurrency lowered to %d',
+                        self.key_id, self.model, int(self.concurrency))
+
+
+class RateLimiter:
+    """Process-wide limiter for OpenAI calls, shared by every job using an API key.
+
+    Each (API key, model) pair has a requests-per-minute and a
+    tokens-per-minute token bucket plus a concurrency limit adjusted AIMD
+    style: it grows while calls succeed at a steady latency, halves on a 429
+    (which also pauses the pair for its Retry-After) and shrinks when
+    latency per completion token rises sharply. ``run`` waits for budget on
+    the event loop, makes the call, retries 429s and transient errors and
+    keeps the calling job's ``rate_limit`` entry (its throttle waits and
+    current limits) on the job, written only when that view changes.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._buckets: Dict[Tuple[str, str], _Bucket] = {}
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+
+    async def run(self, job_id: Optional[str], api_key: str, model: str, tokens: int,
+                  call: Callable[[], Awaitable[Tuple[Any, Dict[str, int]]]]) -> Any:
+        """Await ``call()`` within the budget; it returns (result, usage with prompt/completion tokens).
+
+        ``call`` should make exactly one OpenAI request, so that the budget,
+        retries and latency samples are per request.
+        """
+        bucket = self._bucket(api_key, model)
+        attempt = 0
+        while True:
+            waiting, waited = False, 0.0
+            try:
+                while True:
+                    wait = self._acquire(bucket, job_id, tokens, waiting)
+                    if not wait:
+                        break
+                    waiting = True
+                    await asyncio.sleep(wait)
+                    waited += wait
+            except BaseException:
+                self._gave_up(bucket, job_id, waiting)
+                raise
+            if waiting:
+                self._waited(bucket, job_id, waited)
+            started = time.monotonic()
+            try:
+                result, usage = await call()
+            except Exception as e:
+                delay = self._failed(bucket, job_id, tokens, e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                self._cancelled(bucket)
+                raise
+            self._succeeded(bucket, job_id, tokens, usage, time.monotonic() - started)
+            return result
+
+    def job_snapshot(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """A job's throttling so far and the current limits of the models it called."""
+        with self._lock:
+            record = self._jobs.get(job_id)
+            return self._snapshot(record) if record is not None else None
+
+    def forget(self, job_id: str) -> None:
+        """Drop a finished job's counters (its last snapshot stays on the job)."""
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Current limits and throttling of every (API key fingerprint, model) pair."""
+        with self._lock:
+            return {
+                'initial_concurrency': INITIAL_CONCURRENCY,
+                'max_concurrency': MAX_CONCURRENCY,
+                'buckets': [
+                    {
+                        'key_id': bucket.key_id,
+                        'model': bucket.model,
+                        **bucket.limits(),
+                        'in_flight': bucket.in_flight,
+                        'waiting': bucket.waiting,
+                        'calls': bucket.calls,
+                        'throttled_calls': bucket.throttled_calls,
+                        'throttle_seconds': round(bucket.throttle_seconds, 3),
+                        'rate_limited': bucket.rate_limited,
+                    }
+                    for bucket in self._buckets.values()
+                ],
+            }
+
+    # ── Internals ──
+
+    def _bucket(self, api_key: str, model: str) -> _Bucket:
+        key = (key_fingerprint(api_key or ''), model)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                now = time.monotonic()
+                for idle in [k for k, b in self._buckets.items()
+                             if not b.in_flight and not b.waiting and now - b.used > IDLE_BUCKET_SECONDS]:
+                    del self._buckets[idle]
+                bucket = self._buckets[key] = _Bucket(*key)
+            return bucket
+
+    def _acquire(self, bucket: _Bucket, job_id: Optional[str], tokens: int, waiting: bool) -> float:
+        with self._lock:
+            wait = bucket.try_acquire(tokens, time.monotonic())
+            started_waiting = bool(wait and not waiting)
+            if started_waiting:
+                bucket.waiting += 1
+                if job_id is not None:
+                    self._job(job_id, bucket)['waiting'] += 1
+        if started_waiting and job_id is not None:
+            self._publish(job_id)
+        return min(wait, _MAX_SLEEP_SECONDS)
+
+    def _job(self, job_id: str, bucket: _Bucket) -> Dict[str, Any]:
+        record = self._jobs.setdefault(job_id, {
+            'waiting': 0, 'throttled_calls': 0, 'throttle_seconds': 0.0, 'rate_limited': 0, 'retries': 0,
+            'buckets': [], 'published': None,
+        })
+        if bucket not in record['buckets']:
+            record['buckets'].append(bucket)
+        return record
+
+    @staticmethod
+    def _snapshot(record: Dict[str, Any]) -> Dict[str, Any]:
+        # Only what changes on a state change, so polling clients keep their ETag between calls.
+        return {
+            'throttled': record['waiting'] > 0,
+            'throttled_calls': record['throttled_calls'],
+            'throttle_ms': round(record['throttle_seconds'] * 1000, 1),
+            'rate_limited': record['rate_limited'],
+            'retries': record['retries'],
+            'limits': {bucket.model: bucket.limits() for bucket in record['buckets']},
+        }
+
+    def _waited(self, bucket: _Bucket, job_id: Optional[str], waited: float) -> None:
+        with self._lock:
+            bucket.waiting -= 1
+            bucket.throttled_calls += 1
+            bucket.throttle_seconds += waited
+            if job_id is not None:
+                record = self._job(job_id, bucket)
+                record['waiting'] -= 1
+                record['throttled_calls'] += 1
+                record['throttle_seconds'] += waited
+        if job_id is not None:
+            self._publish(job_id)
+
+    def _succeeded(self, bucket: _Bucket, job_id: Optional[str], tokens: int, usage: Dict[str, int],
+                   seconds: float) -> None:
+        used = (usage.get('prompt_tokens') or 0) + (usage.get('completion_tokens') or 0)
+        with self._lock:
+            bucket.succeeded(tokens, used or tokens, usage.get('completion_tokens') or 0, seconds,
+                             time.monotonic())
+            if job_id is not None:
+                self._job(job_id, bucket)
+        if job_id is not None:
+            self._publish(job_id)
+
+    def _failed(self, bucket: _Bucket, job_id: Optional[str], tokens: int, exc: BaseException,
+                attempt: int) -> Optional[float]:
+        with self._lock:
+            delay = bucket.failed(tokens, exc, attempt, time.monotonic())
+            if job_id is not None:
+                record = self._job(job_id, bucket)
+                record['rate_limited'] += is_rate_limited(exc)
+                record['retries'] += delay is not None
+        if delay is not None:
+            logger.warning('OpenAI call (%s) failed with %s; retrying in %.1fs (attempt %d)',
+                           bucket.model, type(exc).__name__, delay, attempt + 1)
+        if job_id is not None:
+            self._publish(job_id)
+        return delay
+
+    def _gave_up(self, bucket: _Bucket, job_id: Optional[str], waiting: bool) -> None:
+        # Cancelled while waiting for budget (possibly during the first sleep).
+        if not waiting:
+            return
+        with self._lock:
+            bucket.waiting -= 1
+            if job_id is not None and job_id in self._jobs:
+                self._jobs[job_id]['waiting'] -= 1
+        if job_id is not None:
+            self._publish(job_id)
+
+    def _cancelled(self, bucket: _Bucket) -> None:
+        with self._lock:
+            bucket.in_flight -= 1
+
+    def _publish(self, job_id: str) -> None:
+        """Write the job's snapshot when it differs from the one last written."""
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if record is None:
+                return
+            snapshot = self._snapshot(record)
+            if snapshot == record['published']:
+                return
+            record['published'] = snapshot
+        job_store.update(job_id, rate_limit=snapshot)
+
+
+limiter = RateLimiter()
@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+from .artifacts import scratch_path, write_artifact
+from .reports import (
+    REPORT_FILES, WORD_RENDER_MODE, load_word_template, report_members, write_excel, write_word, write_zip,
+)
+from .scheduler import run_blocking, run_blocking_timed
+
+logger = logging.getLogger('dcf_pipeline')
+
+
+# ═══════════════════════════════════════════════════════════════
+#  REPORT RENDERING  (Word + Excel in parallel worker processes)
+# ═══════════════════════════════════════════════════════════════
+
+RENDER_PROCESSES = int(os.environ.get('DCF_RENDER_PROCESSES', str(min(4, os.cpu_count() or 1))))
+
+
+def _render_word(structured: Dict[str, Any], company_name: str, path: str) -> Tuple[float, float]:
+    started = time.time()
+    write_word(structured, company_name, path)
+    return started, time.time() - started
+
+
+def _render_excel(structured: Dict[str, Any], agent_results: List[Dict[str, Any]], path: str) -> Tuple[float, float]:
+    started = time.time()
+    write_excel(structured, path, agent_results)
+    return started, time.time() - started
+
+
+def _warm_up(_: int = 0) -> int:
+    if WORD_RENDER_MODE == 'template':
+        load_word_template()
+    return os.getpid()
+
+
+def _mp_context():
+    # Never fork the service itself: a child forked while the event loop, the
+    # blocking pool or the OpenAI clients hold locks can deadlock. Workers fork
+    # from a single-threaded forkserver that has only imported this module (and
+    # so the report renderers); spawn where forkserver is unavailable.
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    ctx = multiprocessing.get_context('forkserver')
+    ctx.set_forkserver_preload([__name__])
+    return ctx
+
+
+class RenderStage:
+    """Renders the Word and Excel reports concurrently in a process pool.
+
+    python-docx and openpyxl are pure Python, so rendering in threads
+    serializes concurrent jobs on the GIL. Each report is rendered in its own
+    worker process from the structured dict and written straight into the
+    job's spool directory; the two files are then streamed into the job's
+    report archive as STORED members, so no document or archive crosses the
+    process boundary or sits in memory. With ``processes`` = 0 (or if the
+    pool breaks) rendering falls back to the shared blocking thread pool.
+    """
+
+    def __init__(self, processes: int = RENDER_PROCESSES) -> None:
+        self.processes = max(0, processes)
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._in_flight = 0
+        self._renders = 0
+        self._failures = 0
+        self._recent: deque = deque(maxlen=500)
+
+    def start(self) -> None:
+        """Create the pool and wait for its workers to start and load the template."""
+        # The in-process template serves the thread fallback.
+        _warm_up()
+        pool = self._get_pool()
+        if pool is not None:
+            list(pool.map(_warm_up, range(self.processes)))
+            logger.info('Report render pool ready: %d process(es)', self.processes)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    async def render(self, job_id: str, structured: Dict[str, Any], company_name: str,
+                     agent_results: Optional[List[Dict[str, Any]]] = None) -> Tuple[Dict[str, Any], Dict[str, float]]:
+        """Render both reports into the job's report.zip; returns (artifact metadata, timings in ms).
+
+        Timings hold each report's and the archive's render and queue time
+        (``word_ms`` / ``word_queue_ms``, ...), plus ``queue_ms`` and ``total_ms``.
+
+        ``agent_results`` (agent number, name and raw text) go to the
+        workbook's Agent_Outputs sheet.
+        """
+        agent_results = [
+            {'agent': r.get('agent'), 'name': r.get('name'), 'result': r.get('result')}
+            for r in agent_results or []
+        ]
+        loop = asyncio.get_running_loop()
+        submitted = time.time()
+        with self._lock:
+            self._in_flight += 1
+        word_path = scratch_path(job_id, REPORT_FILES['word'])
+        excel_path = scratch_path(job_id, REPORT_FILES['excel'])
+        try:
+            pool = self._get_pool()
+            word = excel = None
+            if pool is not None:
+                try:
+                    word, excel = await asyncio.gather(
+                        loop.run_in_executor(pool, _render_word, structured, company_name, word_path),
+                        loop.run_in_executor(pool, _render_excel, structured, agent_results, excel_path),
+                    )
+                except BrokenProcessPool as e:
+                    logger.error('Report render pool broke (%s); rendering in-process', e)
+                    self._reset_pool(pool)
+            if word is None:
+                word, excel = await asyncio.gather(
+                    run_blocking(_render_word, structured, company_name, word_path),
+                    run_blocking(_render_excel, structured, agent_results, excel_path),
+                )
+            artifact, zip_queued, zip_secs = await run_blocking_timed(
+                write_artifact, job_id, 'report.zip',
+                lambda f: write_zip(f, report_members(word_path, excel_path)),
+            )
+            finished = time.time()
+        except Exception:
+            with self._lock:
+                self._failures += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            for path in (word_path, excel_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+        timings = {
+            'queue_ms': round(max(0.0, min(word[0], excel[0]) - submitted) * 1000, 1),
+            'word_queue_ms': round(max(0.0, word[0] - submitted) * 1000, 1),
+            'excel_queue_ms': round(max(0.0, excel[0] - submitted) * 1000, 1),
+            'zip_queue_ms': round(zip_queued * 1000, 1),
+            'word_ms': round(word[1] * 1000, 1),
+            'excel_ms': round(excel[1] * 1000, 1),
+            'zip_ms': round(zip_secs * 1000, 1),
+            'total_ms': round((finished - submitted) * 1000, 1),
+        }
+        with self._lock:
+            self._renders += 1
+            self._recent.append(timings)
+        return artifact, timings
+
+    def stats(self) -> Dict[str, Any]:
+        """Render counts and recent queueing / render timings."""
+        with self._lock:
+            recent = list(self._recent)
+            stats = {
+                'processes': self.processes,
+                'in_flight': self._in_flight,
+                'renders': self._renders,
+                'failures': self._failures,
+            }
+        for key in ('queue_ms', 'word_ms', 'excel_ms', 'total_ms'):
+            values = sorted(t[key] for t in recent)
+            stats[f'avg_{key}'] = round(sum(values) / len(values), 1) if values else 0.0
+            stats[f'p95_{key}'] = values[int(0.95 * (len(values) - 1))] if values else 0.0
+        return stats
+
+    # ── Internals ──
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        if not self.processes:
+            return None
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.processes, mp_context=_mp_context())
+            return self._pool
+
+    def _reset_pool(self, broken: Optional[ProcessPoolExecutor]) -> None:
+        """Replace a broken pool and start warming the new one without waiting for it."""
+        with self._lock:
+            if self._pool is broken:
+                self._pool = ProcessPoolExecutor(max_workers=self.processes, mp_context=_mp_context())
+                for i in range(self.processes):
+                    self._pool.submit(_warm_up, i)
+        if broken is not None:
+            broken.shutdown(wait=False, cancel_futures=True)
+
+
+# Process-wide render stage used by the pipeline
+render_stage = RenderStage()
@@ -1,20 +1,62 @@
+import copy
 import io
+import os
+import re
+import shutil
+import threading
+import time
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 from docx import Document
 from docx.enum.table import WD_TABLE_ALIGNMENT
 from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.opc.oxml import serialize_part_xml
 from docx.shared import Pt, RGBColor
 from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.chart import BarChart, Reference
+from openpyxl.formatting.rule import ColorScaleRule
+from openpyxl.styles import Font, PatternFill, Alignment, Border, NamedStyle, Side
+from openpyxl.styles.fonts import DEFAULT_FONT
+from openpyxl.utils import get_column_letter
 import zipfile
 
+# Where a report is written: a file path or a writable binary file object
+Sink = Union[str, BinaryIO]
+
 
 # ═══════════════════════════════════════════════════════════════
 #  WORD GENERATION  (valuation_report.docx)
 # ═══════════════════════════════════════════════════════════════
 
+# Largest sensitivity grid side rendered in Word; bigger grids are excerpted.
+WORD_GRID_MAX = 9
+# 'template' fills clones of a pre-built report skeleton; 'build' assembles
+# the document through python-docx (the reference rendering). Same output.
+WORD_RENDER_MODES = ('template', 'build')
+WORD_RENDER_MODE = os.environ.get('DCF_WORD_RENDER_MODE', 'template')
+
+WORD_TABLE_STYLE = 'Light Grid Accent 1'
+
+# Single-run paragraphs: kind -> (paragraph style, centered, bold, size in pt, color)
+_WORD_LINES = {
+    'title': ('Title', True, False, None, RGBColor(0x1A, 0x36, 0x5D)),
+    'company': (None, True, True, 16, RGBColor(0x4A, 0x55, 0x68)),
+    'subtitle': (None, True, False, 10, RGBColor(0x71, 0x80, 0x96)),
+    'caption': (None, False, True, 9, None),
+    'note': (None, False, False, 8, None),
+    'valid': (None, False, True, None, RGBColor(0x48, 0xBB, 0x78)),
+    'invalid': (None, False, True, None, RGBColor(0xE5, 0x3E, 0x3E)),
+    'disclaimer': (None, True, False, 8, RGBColor(0xA0, 0xAE, 0xC0)),
+}
+# Styles of plain paragraphs (None = Normal)
+_WORD_PARAGRAPH_STYLES = (None, 'Heading 1', 'Heading 2', 'List Bullet')
+# Color of the emphasized value in a table's total row
+_WORD_TOTAL_COLOR = RGBColor(0x1B, 0x5E, 0x20)
+
+
 def _safe_num(val, fmt='{:,.1f}', fallback='N/A'):
     """Safely format a number, returning fallback if None."""
     if val is None:
@@ -25,301 +67,693 @@ def _safe_num(val, fmt='{:,.1f}', fallback='N/A'):
         return fallback
 
 
-def create_word(data: Dict[str, Any], company_name: str) -> bytes:
-    """Create a professionally structured Word document valuation report."""
-    doc = Document()
+def _excerpt(n: int, limit: int) -> List[int]:
+    """Evenly spaced indices (always including both ends) to show at most ``limit`` of ``n``."""
+    if n <= limit:
+        return list(range(n))
+    return sorted({round(i * (n - 1) / (limit - 1)) for i in range(limit)})
 
-    # -- Styles --
-    style = doc.styles['Normal']
-    font = style.font
-    font.name = 'Calibri'
-    font.size = Pt(10)
 
+def _add_grid_table(w, grid: Dict[str, Any], col_key: str, values_key: str,
+                    col_label: str, col_fmt: str) -> None:
+    """Add a WACC (rows) x ``col_key`` (columns) table, excerpted to fit the page."""
+    rows = _excerpt(len(grid['wacc']), WORD_GRID_MAX)
+    cols = _excerpt(len(grid[col_key]), WORD_GRID_MAX)
+    value_fmt = '${:,.2f}' if grid.get('metric') == 'value_per_share' else '{:,.1f}'
+
+    w.line('caption', f"WACC (rows) vs {col_label} (columns) — "
+                      f"{'value per share' if grid.get('metric') == 'value_per_share' else 'equity value ($M)'}")
+    table = [['WACC'] + [col_fmt.format(grid[col_key][c]) for c in cols]]
+    for r_idx in rows:
+        table.append([f"{grid['wacc'][r_idx]:.2f}%"] +
+                     [_safe_num(grid[values_key][r_idx][c], value_fmt) for c in cols])
+    w.table(table)
+
+
+def _write_report(w, data: Dict[str, Any], company_name: str) -> None:
+    """Lay out the valuation report through a writer (``_DocxWriter`` or ``_TemplateWriter``)."""
     # -- Title --
-    title = doc.add_heading('DCF Valuation Report', level=0)
-    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    for run in title.runs:
-        run.font.color.rgb = RGBColor(0x1A, 0x36, 0x5D)
-
-    p = doc.add_paragraph()
-    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    run = p.add_run(data.get('company_name', company_name))
-    run.bold = True
-    run.font.size = Pt(16)
-    run.font.color.rgb = RGBColor(0x4A, 0x55, 0x68)
+    w.line('title', 'DCF Valuation Report')
+    w.line('company', data.get('company_name') or company_name)
 
     ticker = data.get('ticker')
     if ticker:
-        p2 = doc.add_paragraph()
-        p2.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        run2 = p2.add_run(f"Ticker: {ticker} | {data.get('industry', 'N/A')} | {data.get('country', 'N/A')}")
-        run2.font.size = Pt(10)
-        run2.font.color.rgb = RGBColor(0x71, 0x80, 0x96)
-
-    p3 = doc.add_paragraph()
-    p3.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    run3 = p3.add_run(f"Date of Analysis: {data.get('analysis_date', datetime.now().strftime('%Y-%m-%d'))}")
-    run3.font.size = Pt(10)
-    run3.font.color.rgb = RGBColor(0x71, 0x80, 0x96)
+        w.line('subtitle', f"Ticker: {ticker} | {data.get('industry') or 'N/A'} | {data.get('country') or 'N/A'}")
+    w.line('subtitle', f"Date of Analysis: {data.get('analysis_date') or datetime.now().strftime('%Y-%m-%d')}")
 
-    doc.add_paragraph()  # spacer
+    w.paragraph('')  # spacer
 
     # -- 1. Summary of Method --
-    doc.add_heading('1. Summary of Method', level=1)
-    doc.add_paragraph(data.get('method_summary',
+    w.paragraph('1. Summary of Method', 'Heading 1')
+    w.paragraph(data.get('method_summary') or (
         'A Discounted Cash Flow (DCF) analysis was performed to estimate the intrinsic value '
         'of the company based on projected free cash flows discounted at the weighted average '
         'cost of capital (WACC).'))
 
     # -- 2. Key Assumptions --
-    doc.add_heading('2. Key Assumptions', level=1)
-    assumptions = data.get('assumptions', {})
-    a_table = doc.add_table(rows=10, cols=2, style='Light Grid Accent 1')
-    a_table.alignment = WD_TABLE_ALIGNMENT.CENTER
-    headers_data = [
-        ('Parameter', 'Value'),
-        ('Revenue Growth Rates', str(assumptions.get('revenue_growth_rates', 'N/A'))),
-        ('Margin Assumptions', str(assumptions.get('margin_assumptions', 'N/A'))),
-        ('WACC', f"{_safe_num(assumptions.get('wacc'), '{:.2f}')}%"),
-        ('Terminal Growth Rate', f"{_safe_num(assumptions.get('terminal_growth_rate'), '{:.2f}')}%"),
-        ('Exit Multiple', _safe_num(assumptions.get('exit_multiple'), '{:.1f}x')),
-        ('Tax Rate', f"{_safe_num(assumptions.get('tax_rate'), '{:.1f}')}%"),
-        ('Risk-Free Rate', f"{_safe_num(assumptions.get('risk_free_rate'), '{:.2f}')}%"),
-        ('Beta', _safe_num(assumptions.get('beta'), '{:.2f}')),
-        ('Equity Risk Premium', f"{_safe_num(assumptions.get('equity_risk_premium'), '{:.2f}')}%"),
-    ]
-    for i, (label, value) in enumerate(headers_data):
-        a_table.rows[i].cells[0].text = label
-        a_table.rows[i].cells[1].text = value
-        if i == 0:
-            for cell in a_table.rows[i].cells:
-                for paragraph in cell.paragraphs:
-                    for run in paragraph.runs:
-                        run.bold = True
+    w.paragraph('2. Key Assumptions', 'Heading 1')
+    assumptions = data.get('assumptions') or {}
+    w.table([
+        ['Parameter', 'Value'],
+        ['Revenue Growth Rates', str(assumptions.get('revenue_growth_rates') or 'N/A')],
+        ['Margin Assumptions', str(assumptions.get('margin_assumptions') or 'N/A')],
+        ['WACC', f"{_safe_num(assumptions.get('wacc'), '{:.2f}')}%"],
+        ['Terminal Growth Rate', f"{_safe_num(assumptions.get('terminal_growth_rate'), '{:.2f}')}%"],
+        ['Exit Multiple', _safe_num(assumptions.get('exit_multiple'), '{:.1f}x')],
+        ['Tax Rate', f"{_safe_num(assumptions.get('tax_rate'), '{:.1f}')}%"],
+        ['Risk-Free Rate', f"{_safe_num(assumptions.get('risk_free_rate'), '{:.2f}')}%"],
+        ['Beta', _safe_num(assumptions.get('beta'), '{:.2f}')],
+        ['Equity Risk Premium', f"{_safe_num(assumptions.get('equity_risk_premium'), '{:.2f}')}%"],
+    ])
 
     # -- 3. 10-Year Forecast Overview --
-    doc.add_heading('3. 10-Year Forecast Overview', level=1)
-    forecast = data.get('forecast', [])
+    w.paragraph('3. 10-Year Forecast Overview', 'Heading 1')
+    forecast = data.get('forecast') or []
     if forecast:
-        fc_table = doc.add_table(rows=len(forecast) + 1, cols=5, style='Light Grid Accent 1')
-        fc_table.alignment = WD_TABLE_ALIGNMENT.CENTER
-        fc_headers = ['Year', 'Revenue ($M)', 'EBIT ($M)', 'FCFF ($M)', 'PV of FCF ($M)']
-        for j, h in enumerate(fc_headers):
-            fc_table.rows[0].cells[j].text = h
-            for paragraph in fc_table.rows[0].cells[j].paragraphs:
-                for run in paragraph.runs:
-                    run.bold = True
-        for i, row in enumerate(forecast):
-            fc_table.rows[i + 1].cells[0].text = str(row.get('year', ''))
-            fc_table.rows[i + 1].cells[1].text = _safe_num(row.get('revenue'))
-            fc_table.rows[i + 1].cells[2].text = _safe_num(row.get('ebit'))
-            fc_table.rows[i + 1].cells[3].text = _safe_num(row.get('fcff'))
-            fc_table.rows[i + 1].cells[4].text = _safe_num(row.get('pv_fcf'))
+        w.table([['Year', 'Revenue ($M)', 'EBIT ($M)', 'FCFF ($M)', 'PV of FCF ($M)']] + [
+            [str(row.get('year') or ''), _safe_num(row.get('revenue')), _safe_num(row.get('ebit')),
+             _safe_num(row.get('fcff')), _safe_num(row.get('pv_fcf'))]
+            for row in forecast
+        ])
     else:
-        doc.add_paragraph('Forecast data not available.')
+        w.paragraph('Forecast data not available.')
 
     # -- 4. Valuation Summary --
-    doc.add_heading('4. Valuation Summary', level=1)
-    val_items = [
-        ('Terminal Value ($M)', _safe_num(data.get('terminal_value'))),
-        ('PV of Terminal Value ($M)', _safe_num(data.get('pv_terminal_value'))),
-        ('Enterprise Value ($M)', _safe_num(data.get('enterprise_value'))),
-        ('Net Debt ($M)', _safe_num(data.get('net_debt'))),
-        ('Equity Value ($M)', _safe_num(data.get('equity_value'))),
-        ('Shares Outstanding (M)', _safe_num(data.get('shares_outstanding'), '{:,.2f}')),
-        ('Intrinsic Value Per Share', f"${_safe_num(data.get('intrinsic_value_per_share'), '{:,.2f}')}"),
-    ]
-    v_table = doc.add_table(rows=len(val_items) + 1, cols=2, style='Light Grid Accent 1')
-    v_table.alignment = WD_TABLE_ALIGNMENT.CENTER
-    v_table.rows[0].cells[0].text = 'Metric'
-    v_table.rows[0].cells[1].text = 'Value'
-    for paragraph in v_table.rows[0].cells[0].paragraphs:
-        for run in paragraph.runs:
-            run.bold = True
-    for paragraph in v_table.rows[0].cells[1].paragraphs:
-        for run in paragraph.runs:
-            run.bold = True
-    for i, (label, value) in enumerate(val_items):
-        v_table.rows[i + 1].cells[0].text = label
-        v_table.rows[i + 1].cells[1].text = value
-        if i == len(val_items) - 1:
-            for paragraph in v_table.rows[i + 1].cells[0].paragraphs:
-                for run in paragraph.runs:
-                    run.bold = True
-            for paragraph in v_table.rows[i + 1].cells[1].paragraphs:
-                for run in paragraph.runs:
-                    run.bold = True
-                    run.font.color.rgb = RGBColor(0x1B, 0x5E, 0x20)
+    w.paragraph('4. Valuation Summary', 'Heading 1')
+    w.table([
+        ['Metric', 'Value'],
+        ['Terminal Value ($M)', _safe_num(data.get('terminal_value'))],
+        ['PV of Terminal Value ($M)', _safe_num(data.get('pv_terminal_value'))],
+        ['Enterprise Value ($M)', _safe_num(data.get('enterprise_value'))],
+        ['Net Debt ($M)', _safe_num(data.get('net_debt'))],
+        ['Equity Value ($M)', _safe_num(data.get('equity_value'))],
+        ['Shares Outstanding (M)', _safe_num(data.get('shares_outstanding'), '{:,.2f}')],
+        ['Intrinsic Value Per Share', f"${_safe_num(data.get('intrinsic_value_per_share'), '{:,.2f}')}"],
+    ], total=True)
 
     # -- 5. Sensitivity Analysis --
-    doc.add_heading('5. Sensitivity Analysis', level=1)
-    sensitivity = data.get('sensitivity', [])
-    if sensitivity:
-        s_table = doc.add_table(rows=len(sensitivity) + 1, cols=3, style='Light Grid Accent 1')
-        s_table.alignment = WD_TABLE_ALIGNMENT.CENTER
-        s_headers = ['WACC (%)', 'Terminal Growth (%)', 'Value / Share ($)']
-        for j, h in enumerate(s_headers):
-            s_table.rows[0].cells[j].text = h
-            for paragraph in s_table.rows[0].cells[j].paragraphs:
-                for run in paragraph.runs:
-                    run.bold = True
-        for i, s in enumerate(sensitivity):
-            s_table.rows[i + 1].cells[0].text = f"{_safe_num(s.get('wacc'), '{:.1f}')}%"
-            s_table.rows[i + 1].cells[1].text = f"{_safe_num(s.get('growth'), '{:.1f}')}%"
-            s_table.rows[i + 1].cells[2].text = f"${_safe_num(s.get('value_per_share'), '{:,.2f}')}"
+    w.paragraph('5. Sensitivity Analysis', 'Heading 1')
+    grid = data.get('sensitivity_grid')
+    sensitivity = data.get('sensitivity') or []
+    if grid and grid.get('values'):
+        _add_grid_table(w, grid, 'growth', 'values', 'Terminal Growth (%)', '{:.2f}%')
+        if grid.get('exit_values'):
+            w.paragraph('')
+            _add_grid_table(w, grid, 'exit_multiple', 'exit_values', 'Exit Multiple (EV/EBITDA)', '{:.1f}x')
+        if len(grid['wacc']) > WORD_GRID_MAX or len(grid['growth']) > WORD_GRID_MAX:
+            w.line('note', f"Excerpt of the {len(grid['wacc'])} x {len(grid['growth'])} grid; "
+                           'the full grid is in the Sensitivity sheet of the Excel model.')
+    elif sensitivity:
+        w.table([['WACC (%)', 'Terminal Growth (%)', 'Value / Share ($)']] + [
+            [f"{_safe_num(s.get('wacc'), '{:.1f}')}%", f"{_safe_num(s.get('growth'), '{:.1f}')}%",
+             f"${_safe_num(s.get('value_per_share'), '{:,.2f}')}"]
+            for s in sensitivity
+        ])
     else:
-        doc.add_paragraph('Sensitivity data not available.')
+        w.paragraph('Sensitivity data not available.')
+
+    mc = data.get('monte_carlo')
+    if mc:
+        w.paragraph('Monte Carlo Simulation', 'Heading 2')
+        value_fmt = '${:,.2f}' if mc.get('metric') == 'value_per_share' else '{:,.1f}'
+        w.paragraph(
+            f"{mc['scenarios']:,} scenarios sampling revenue growth, EBIT margin, WACC and terminal "
+            f"growth around the base case. Mean {_safe_num(mc['mean'], value_fmt)}, "
+            f"standard deviation {_safe_num(mc['std'], value_fmt)}."
+        )
+        bands = list(mc['percentiles'].items())
+        w.table([[name.upper() for name, _ in bands], [_safe_num(value, value_fmt) for _, value in bands]])
 
     # -- 6. Key Risk Notes --
-    doc.add_heading('6. Key Risk Notes', level=1)
-    risk_notes = data.get('risk_notes', [])
+    w.paragraph('6. Key Risk Notes', 'Heading 1')
+    risk_notes = data.get('risk_notes') or []
     if risk_notes:
         for note in risk_notes:
-            doc.add_paragraph(note, style='List Bullet')
+            w.paragraph(note, 'List Bullet')
     else:
-        doc.add_paragraph('No specific risk notes flagged.')
+        w.paragraph('No specific risk notes flagged.')
 
     # -- 7. Validation Status --
-    doc.add_heading('7. Validation Status', level=1)
-    v_status = data.get('validation_status', 'N/A')
-    p_status = doc.add_paragraph()
-    run_s = p_status.add_run(f'Status: {v_status}')
-    run_s.bold = True
-    if 'validated' in v_status.lower():
-        run_s.font.color.rgb = RGBColor(0x48, 0xBB, 0x78)
-    else:
-        run_s.font.color.rgb = RGBColor(0xE5, 0x3E, 0x3E)
+    w.paragraph('7. Validation Status', 'Heading 1')
+    v_status = data.get('validation_status') or 'N/A'
+    w.line('valid' if 'validated' in v_status.lower() else 'invalid', f'Status: {v_status}')
 
-    val_notes = data.get('validation_notes', [])
+    val_notes = data.get('validation_notes') or []
     if val_notes:
         for note in val_notes:
-            doc.add_paragraph(note, style='List Bullet')
+            w.paragraph(note, 'List Bullet')
 
     # -- Disclaimer --
-    doc.add_paragraph()
-    disc = doc.add_paragraph()
-    disc.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    run_d = disc.add_run(
-        'This report was generated by DCF Production. '
-        'It is intended for informational purposes only and does not constitute financial advice.'
-    )
-    run_d.font.size = Pt(8)
-    run_d.font.color.rgb = RGBColor(0xA0, 0xAE, 0xC0)
+    w.paragraph('')
+    w.line('disclaimer',
+           'This report was generated by DCF Production. '
+           'It is intended for informational purposes only and does not constitute financial advice.')
+
+
+def _new_report_document():
+    """A blank python-docx Document with the report's Normal style."""
+    doc = Document()
+    font = doc.styles['Normal'].font
+    font.name = 'Calibri'
+    font.size = Pt(10)
+    return doc
+
+
+class _DocxWriter:
+    """Appends report blocks to a python-docx Document through its public API."""
+
+    def __init__(self, doc) -> None:
+        self.doc = doc
+
+    def line(self, kind: str, text: str):
+        style, centered, bold, size, color = _WORD_LINES[kind]
+        paragraph = self.doc.add_paragraph(style=style)
+        if centered:
+            paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        run = paragraph.add_run(text)
+        if bold:
+            run.bold = True
+        if size:
+            run.font.size = Pt(size)
+        if color is not None:
+            run.font.color.rgb = color
+        return paragraph._p
+
+    def paragraph(self, text: str, style: Optional[str] = None):
+        return self.doc.add_paragraph(text, style)._p
+
+    def new_table(self, rows: int, cols: int):
+        table = self.doc.add_table(rows=rows, cols=cols, style=WORD_TABLE_STYLE)
+        table.alignment = WD_TABLE_ALIGNMENT.CENTER
+        return table
+
+    def table(self, rows: List[List[str]], total: bool = False):
+        """Add a table with a bold header row; ``total`` emphasizes the last row too."""
+        table = self.new_table(len(rows), len(rows[0]))
+        for row, texts in zip(table.rows, rows):
+            for cell, text in zip(row.cells, texts):
+                cell.text = text
+        for cell in table.rows[0].cells:
+            for paragraph in cell.paragraphs:
+                for run in paragraph.runs:
+                    run.bold = True
+        if total:
+            cells = table.rows[-1].cells
+            for cell in cells:
+                for paragraph in cell.paragraphs:
+                    for run in paragraph.runs:
+                        run.bold = True
+                        if cell is cells[-1]:
+                            run.font.color.rgb = _WORD_TOTAL_COLOR
+        return table._tbl
+
 
+def _detach(element):
+    element.getparent().remove(element)
+    return element
+
+
+def _set_text(r, text: str) -> None:
+    """Fill an empty ``w:r`` the way python-docx's ``run.text = text`` does."""
+    if not text:
+        return
+    if '\t' in text or '\n' in text or '\r' in text:
+        r.text = text  # python-docx turns these into w:tab / w:br elements
+    else:
+        r.add_t(text)
+
+
+class _WordTemplate:
+    """Styled report skeleton plus prototype blocks, built once per process.
+
+    Every part of the package except ``word/document.xml`` is identical for
+    all reports, so the skeleton is saved once and those parts are kept as
+    bytes. The prototypes (styled paragraphs, table shells, header / body /
+    total cell runs) are produced by ``_DocxWriter`` itself, so a filled
+    clone carries exactly the XML the reference rendering writes; filling
+    one costs a few lxml deep copies instead of style lookups by name and
+    per-cell walks of the table grid.
+    """
+
+    def __init__(self) -> None:
+        doc = _new_report_document()
+        self._writer = _DocxWriter(doc)
+        self._lock = threading.Lock()
+        self._shells: Dict[int, Tuple[Any, Any]] = {}
+
+        self.lines = {kind: _detach(self._writer.line(kind, '')) for kind in _WORD_LINES}
+        self.paragraphs = {style: _detach(self._writer.paragraph('', style)) for style in _WORD_PARAGRAPH_STYLES}
+        rows = _detach(self._writer.table([['', '']] * 3, total=True)).tr_lst
+        self.runs = {
+            'header': rows[0].tc_lst[0].p_lst[0].r_lst[0],
+            'body': rows[1].tc_lst[0].p_lst[0].r_lst[0],
+            'total': rows[2].tc_lst[1].p_lst[0].r_lst[0],
+        }
+
+        buffer = io.BytesIO()
+        doc.save(buffer)
+        with zipfile.ZipFile(buffer) as package:
+            self._parts = [(name, package.read(name)) for name in package.namelist()]
+        self._document = copy.deepcopy(doc.element)
+
+    def shell(self, cols: int) -> Tuple[Any, Any]:
+        """Empty table with ``cols`` columns and its blank row, created on first use."""
+        with self._lock:
+            shell = self._shells.get(cols)
+            if shell is None:
+                tbl = _detach(self._writer.new_table(1, cols)._tbl)
+                row = tbl.tr_lst[0]
+                tbl.remove(row)
+                shell = self._shells[cols] = (tbl, row)
+        return shell
+
+    def render(self, data: Dict[str, Any], company_name: str, sink: Sink) -> None:
+        document = copy.deepcopy(self._document)
+        writer = _TemplateWriter(self)
+        _write_report(writer, data, company_name)
+        sect_pr = document.body.sectPr
+        for block in writer.blocks:
+            sect_pr.addprevious(block)
+
+        with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as package:
+            for name, blob in self._parts:
+                if name == 'word/document.xml':
+                    blob = serialize_part_xml(document)
+                package.writestr(name, blob)
+
+
+class _TemplateWriter:
+    """Collects report blocks cloned from a ``_WordTemplate``'s prototypes."""
+
+    def __init__(self, template: _WordTemplate) -> None:
+        self._template = template
+        self.blocks: List[Any] = []
+
+    def line(self, kind: str, text: str) -> None:
+        p = copy.deepcopy(self._template.lines[kind])
+        _set_text(p.r_lst[-1], text)
+        self.blocks.append(p)
+
+    def paragraph(self, text: str, style: Optional[str] = None) -> None:
+        p = copy.deepcopy(self._template.paragraphs[style])
+        if text:
+            _set_text(p.add_r(), text)
+        self.blocks.append(p)
+
+    def table(self, rows: List[List[str]], total: bool = False) -> None:
+        cols = len(rows[0])
+        shell, blank = self._template.shell(cols)
+        runs = self._template.runs
+        emphasis = ['header'] * cols
+        body = ['body'] * cols
+        tbl = copy.deepcopy(shell)
+        for i, texts in enumerate(rows):
+            if total and i == len(rows) - 1:
+                kinds = emphasis[:-1] + ['total']
+            else:
+                kinds = emphasis if i == 0 else body
+            tr = copy.deepcopy(blank)
+            for tc, text, kind in zip(tr.tc_lst, texts, kinds):
+                r = copy.deepcopy(runs[kind])
+                _set_text(r, text)
+                tc.p_lst[0].append(r)
+            tbl.append(tr)
+        self.blocks.append(tbl)
+
+
+_word_template: Optional[_WordTemplate] = None
+_word_template_lock = threading.Lock()
+
+
+def load_word_template() -> _WordTemplate:
+    """The process's report template, built on first use."""
+    global _word_template
+    with _word_template_lock:
+        if _word_template is None:
+            _word_template = _WordTemplate()
+        return _word_template
+
+
+def write_word(data: Dict[str, Any], company_name: str, sink: Sink, mode: Optional[str] = None) -> None:
+    """Write the Word valuation report to ``sink`` (a path or a binary file object).
+
+    ``mode`` (default ``DCF_WORD_RENDER_MODE``) picks the renderer: 'template'
+    fills clones of the cached skeleton, 'build' writes the document through
+    python-docx. Both produce the same document parts.
+    """
+    mode = mode or WORD_RENDER_MODE
+    if mode == 'template':
+        load_word_template().render(data, company_name, sink)
+        return
+    if mode != 'build':
+        raise ValueError(f'Unknown Word render mode: {mode!r}')
+
+    doc = _new_report_document()
+    _write_report(_DocxWriter(doc), data, company_name)
+    doc.save(sink)
+
+
+def create_word(data: Dict[str, Any], company_name: str, mode: Optional[str] = None) -> bytes:
+    """Create a professionally structured Word document valuation report."""
     buffer = io.BytesIO()
-    doc.save(buffer)
-    buffer.seek(0)
+    write_word(data, company_name, buffer, mode)
     return buffer.getvalue()
 
 
 # ═══════════════════════════════════════════════════════════════
-#  EXCEL GENERATION  (dcf_10_year_forecast.xlsx — single sheet)
+#  EXCEL GENERATION  (dcf_10_year_forecast.xlsx — model, sensitivity, Monte Carlo, agent text)
 # ═══════════════════════════════════════════════════════════════
 
-def create_excel(data: Dict[str, Any]) -> bytes:
-    """Create a single-sheet DCF Excel workbook (DCF_10Y_Model)."""
+NUM_FMT = '#,##0.0'
+PCT_FMT = '0.0%'
+DOLLAR_FMT = '$#,##0.00'
+# Longest text Excel keeps in one cell; longer agent output lines are split.
+EXCEL_CELL_MAX = 32_767
+
+_HDR_FONT = Font(name='Calibri', bold=True, size=11, color='FFFFFF')
+_HDR_FILL = PatternFill(start_color='667EEA', end_color='667EEA', fill_type='solid')
+_HDR_ALIGN = Alignment(horizontal='center', vertical='center', wrap_text=True)
+_DATA_FONT = Font(name='Calibri', size=10)
+_DATA_ALIGN = Alignment(horizontal='right', vertical='center')
+_LBL_FONT = Font(name='Calibri', bold=True, size=10)
+_LBL_ALIGN = Alignment(horizontal='left', vertical='center')
+_SUM_FILL = PatternFill(start_color='E8F5E9', end_color='E8F5E9', fill_type='solid')
+_SUM_FONT = Font(name='Calibri', bold=True, size=11, color='1B5E20')
+_THIN = Side(style='thin', color='D0D0D0')
+_BORDER = Border(left=_THIN, right=_THIN, top=_THIN, bottom=_THIN)
+
+# Named cell styles registered on every report workbook. A cell refers to one
+# by name instead of carrying its own font / fill / alignment / border.
+EXCEL_STYLES = {
+    'DCF Header': dict(font=_HDR_FONT, fill=_HDR_FILL, alignment=_HDR_ALIGN, border=_BORDER),
+    'DCF Header Rate': dict(font=_HDR_FONT, fill=_HDR_FILL, alignment=_HDR_ALIGN, border=_BORDER,
+                            number_format='0.00'),
+    'DCF Year': dict(font=_DATA_FONT, alignment=Alignment(horizontal='center'), border=_BORDER,
+                     number_format='0'),
+    'DCF Number': dict(font=_DATA_FONT, alignment=_DATA_ALIGN, border=_BORDER, number_format=NUM_FMT),
+    'DCF Percent': dict(font=_DATA_FONT, alignment=_DATA_ALIGN, border=_BORDER, number_format=PCT_FMT),
+    'DCF Factor': dict(font=_DATA_FONT, alignment=_DATA_ALIGN, border=_BORDER, number_format='0.0000'),
+    'DCF Summary Label': dict(font=_LBL_FONT, fill=_SUM_FILL, alignment=_LBL_ALIGN, border=_BORDER),
+    'DCF Summary Number': dict(font=_DATA_FONT, fill=_SUM_FILL, alignment=_DATA_ALIGN, border=_BORDER,
+                               number_format=NUM_FMT),
+    'DCF Summary Shares': dict(font=_DATA_FONT, fill=_SUM_FILL, alignment=_DATA_ALIGN, border=_BORDER,
+                               number_format='#,##0.00'),
+    'DCF Summary Total': dict(font=_SUM_FONT, fill=_SUM_FILL, alignment=_DATA_ALIGN, border=_BORDER,
+                              number_format=DOLLAR_FMT),
+    'DCF Title': dict(font=_LBL_FONT),
+    'DCF Label': dict(font=_LBL_FONT, border=_BORDER),
+    'DCF Rate Label': dict(font=_LBL_FONT, border=_BORDER, number_format='0.00'),
+    'DCF Boxed Count': dict(font=DEFAULT_FONT, border=_BORDER, number_format='#,##0'),
+    'DCF Boxed Dollar': dict(font=DEFAULT_FONT, border=_BORDER, number_format=DOLLAR_FMT),
+    'DCF Boxed Amount': dict(font=DEFAULT_FONT, border=_BORDER, number_format=NUM_FMT),
+    'DCF Count': dict(font=DEFAULT_FONT, number_format='#,##0'),
+    'DCF Dollar': dict(font=DEFAULT_FONT, number_format=DOLLAR_FMT),
+    'DCF Amount': dict(font=DEFAULT_FONT, number_format=NUM_FMT),
+    'DCF Text': dict(font=_DATA_FONT, alignment=Alignment(vertical='top')),
+}
+
+FORECAST_COLUMNS = [
+    # (header, forecast key, percentage points stored as a fraction, style, width)
+    ('Year', 'year', False, 'DCF Year', 8),
+    ('Revenue ($M)', 'revenue', False, 'DCF Number', 16),
+    ('Revenue Growth %', 'revenue_growth_pct', True, 'DCF Percent', 16),
+    ('EBIT Margin %', 'ebit_margin_pct', True, 'DCF Percent', 14),
+    ('EBIT ($M)', 'ebit', False, 'DCF Number', 14),
+    ('Tax Rate %', 'tax_rate', True, 'DCF Percent', 12),
+    ('NOPAT ($M)', 'nopat', False, 'DCF Number', 14),
+    ('D&A ($M)', 'depreciation_amortization', False, 'DCF Number', 12),
+    ('Capex ($M)', 'capex', False, 'DCF Number', 12),
+    ('Change in NWC ($M)', 'change_nwc', False, 'DCF Number', 16),
+    ('FCFF ($M)', 'fcff', False, 'DCF Number', 14),
+    ('Discount Factor', 'discount_factor', False, 'DCF Factor', 14),
+    ('PV of FCF ($M)', 'pv_fcf', False, 'DCF Number', 16),
+]
+
+
+class _StyledCells:
+    """Makes write-only cells for one sheet, each carrying one of the workbook's named styles.
+
+    A style name is resolved once per sheet and later cells get a copy of it;
+    looking the name up for every cell dominates the time spent on large grids.
+    """
+
+    def __init__(self, ws) -> None:
+        self.ws = ws
+        self._resolved: Dict[str, Any] = {}
+
+    def __call__(self, value: Any, style: str) -> WriteOnlyCell:
+        cell = WriteOnlyCell(self.ws, value=value)
+        resolved = self._resolved.get(style)
+        if resolved is None:
+            cell.style = style
+            self._resolved[style] = cell._style
+        else:
+            cell._style = copy.copy(resolved)
+        return cell
+
+
+def _new_report_workbook() -> Workbook:
+    """A write-only workbook with the report's named styles registered.
+
+    Write-only sheets stream their rows to a temporary file as they are
+    appended, so memory stays flat however large a sheet gets; column
+    widths, conditional formats and charts must be set on a sheet before or
+    alongside its rows, and rows are written strictly top to bottom.
+    """
+    wb = Workbook(write_only=True)
+    for name, spec in EXCEL_STYLES.items():
+        wb.add_named_style(NamedStyle(name=name, **spec))
+    return wb
+
+
+def write_excel(data: Dict[str, Any], sink: Sink, agent_results: Optional[List[Dict[str, Any]]] = None) -> None:
+    """Write the DCF Excel workbook to ``sink`` (a path or a binary file object).
+
+    Sheets: DCF_10Y_Model, plus Sensitivity / Monte_Carlo when present and
+    Agent_Outputs with the raw text of each agent when ``agent_results`` is given.
+    """
+    wb = _new_report_workbook()
+    _write_model(wb.create_sheet('DCF_10Y_Model'), data)
+
+    # ── Sensitivity sheet (full grid as a heatmap) ──
+    grid = data.get('sensitivity_grid')
+    if grid and grid.get('values'):
+        ss = wb.create_sheet('Sensitivity')
+        ss.column_dimensions['A'].width = 12
+        value_style = 'DCF Dollar' if grid.get('metric') == 'value_per_share' else 'DCF Amount'
+        last_row = _write_grid(ss, 1, grid, 'growth', 'values', 'Terminal Growth %', value_style)
+        if grid.get('exit_values'):
+            ss.append([])
+            _write_grid(ss, last_row + 2, grid, 'exit_multiple', 'exit_values', 'Exit Multiple (x)', value_style)
+
+    # ── Monte Carlo sheet (percentile bands + histogram) ──
+    mc = data.get('monte_carlo')
+    if mc:
+        _write_monte_carlo(wb.create_sheet('Monte_Carlo'), mc)
+
+    # ── Agent outputs sheet (raw text, one row per line) ──
+    if agent_results:
+        _write_agent_outputs(wb.create_sheet('Agent_Outputs'), agent_results)
+
+    wb.save(sink)
+
+
+def create_excel(data: Dict[str, Any], agent_results: Optional[List[Dict[str, Any]]] = None) -> bytes:
+    """Create the DCF Excel workbook (see ``write_excel``)."""
+    buffer = io.BytesIO()
+    write_excel(data, buffer, agent_results)
+    return buffer.getvalue()
+
+
+def _write_model(ws, data: Dict[str, Any]) -> None:
+    """Forecast table (row 1 headers) and the valuation summary two rows below it."""
+    cell = _StyledCells(ws)
+    for i, (*_, width) in enumerate(FORECAST_COLUMNS, 1):
+        ws.column_dimensions[get_column_letter(i)].width = width
+
+    ws.append([cell(header, 'DCF Header') for header, *_ in FORECAST_COLUMNS])
+    forecast = data.get('forecast') or []
+    for row in forecast:
+        ws.append([
+            cell((row.get(key) or 0) / 100.0 if pct else row.get(key), style)
+            for _header, key, pct, style, _width in FORECAST_COLUMNS
+        ])
+
+    ws.append([])
+    summary_items = [
+        ('Terminal Value ($M)', data.get('terminal_value'), 'DCF Summary Number'),
+        ('PV of Terminal Value ($M)', data.get('pv_terminal_value'), 'DCF Summary Number'),
+        ('Enterprise Value ($M)', data.get('enterprise_value'), 'DCF Summary Number'),
+        ('Net Debt ($M)', data.get('net_debt'), 'DCF Summary Number'),
+        ('Equity Value ($M)', data.get('equity_value'), 'DCF Summary Number'),
+        ('Shares Outstanding (M)', data.get('shares_outstanding'), 'DCF Summary Shares'),
+        ('Intrinsic Value Per Share ($)', data.get('intrinsic_value_per_share'), 'DCF Summary Total'),
+    ]
+    for label, value, style in summary_items:
+        ws.append([cell(label, 'DCF Summary Label'), cell(value, style)])
+
+
+def _write_grid(ws, top: int, grid: Dict[str, Any], col_key: str, values_key: str, col_label: str,
+                value_style: str) -> int:
+    """Append one WACC x ``col_key`` grid starting at row ``top`` with a 3-colour heatmap; return its last row."""
+    cell = _StyledCells(ws)
+    ws.append([cell(f'WACC % (rows) vs {col_label} (columns)', 'DCF Title')])
+    ws.append([cell('WACC %', 'DCF Header')] +
+              [cell(v, 'DCF Header Rate') for v in grid[col_key]])
+    for w, row in zip(grid['wacc'], grid[values_key]):
+        ws.append([cell(w, 'DCF Rate Label')] + [cell(v, value_style) for v in row])
+
+    hdr_row = top + 1
+    last_row = hdr_row + len(grid['wacc'])
+    last_col = get_column_letter(len(grid[col_key]) + 1)
+    ws.conditional_formatting.add(
+        f'B{hdr_row + 1}:{last_col}{last_row}',
+        ColorScaleRule(start_type='min', start_color='F8696B', mid_type='percentile', mid_value=50,
+                       mid_color='FFEB84', end_type='max', end_color='63BE7B'),
+    )
+    return last_row
+
+
+def _write_monte_carlo(ws, mc: Dict[str, Any]) -> None:
+    """Summary statistics, percentile bands and a histogram bar chart of simulated values."""
+    cell = _StyledCells(ws)
+    per_share = mc.get('metric') == 'value_per_share'
+    label = 'Value Per Share ($)' if per_share else 'Equity Value ($M)'
+    for col, w in zip('ABCDEF', (20, 18, 4, 14, 14, 12)):
+        ws.column_dimensions[col].width = w
+
+    boxed = 'DCF Boxed Dollar' if per_share else 'DCF Boxed Amount'
+    stats = [('Scenarios', mc['scenarios'], 'DCF Boxed Count'), ('Mean', mc['mean'], boxed),
+             ('Std. Deviation', mc['std'], boxed)]
+    stats += [(f"{k[1:]}th Percentile", v, boxed) for k, v in mc['percentiles'].items()]
+    edges, counts = mc['histogram']['edges'], mc['histogram']['counts']
+    bin_style = 'DCF Dollar' if per_share else 'DCF Amount'
+
+    ws.append([cell(h, 'DCF Header') for h in ('Statistic', label)] + [None] +
+              [cell(h, 'DCF Header') for h in ('Bin From', 'Bin To', 'Scenarios')])
+    # Statistics (columns A-B) and histogram bins (D-F) share rows.
+    for i in range(max(len(stats), len(counts))):
+        row: List[Any] = [None, None, None]
+        if i < len(stats):
+            name, value, style = stats[i]
+            row[:2] = [cell(name, 'DCF Label'), cell(value, style)]
+        if i < len(counts):
+            row += [cell(edges[i], bin_style), cell(edges[i + 1], bin_style),
+                    cell(counts[i], 'DCF Count')]
+        ws.append(row)
+
+    chart = BarChart()
+    chart.title = f'Distribution of {label}'
+    chart.y_axis.title = 'Scenarios'
+    chart.x_axis.title = label
+    chart.legend = None
+    chart.gapWidth = 10
+    chart.add_data(Reference(ws, min_col=6, min_row=1, max_row=len(counts) + 1), titles_from_data=True)
+    chart.set_categories(Reference(ws, min_col=4, min_row=2, max_row=len(counts) + 1))
+    chart.width, chart.height = 22, 11
+    ws.add_chart(chart, 'H2')
+
+
+def _text_rows(text: str) -> Iterator[str]:
+    """Lines of ``text`` made safe for a cell (control characters dropped, split at the cell limit)."""
+    for line in io.StringIO(text):
+        line = ILLEGAL_CHARACTERS_RE.sub('', line.rstrip('\r\n'))
+        for start in range(0, max(len(line), 1), EXCEL_CELL_MAX):
+            yield line[start:start + EXCEL_CELL_MAX]
+
+
+def _write_agent_outputs(ws, agent_results: List[Dict[str, Any]]) -> None:
+    """The raw text each agent produced, one row per line."""
+    cell = _StyledCells(ws)
+    for col, w in zip('ABCD', (8, 30, 8, 120)):
+        ws.column_dimensions[col].width = w
+    ws.append([cell(h, 'DCF Header') for h in ('Agent', 'Name', 'Line', 'Text')])
+    for result in agent_results:
+        for number, line in enumerate(_text_rows(str(result.get('result') or '')), 1):
+            text = cell(line, 'DCF Text')
+            text.data_type = 's'  # agent text starting with "=" is not a formula
+            ws.append([result.get('agent'), result.get('name'), number, text])
+
+
+# ═══════════════════════════════════════════════════════════════
+#  BATCH SUMMARY  (batch_summary.xlsx — one row per company)
+# ═══════════════════════════════════════════════════════════════
+
+SUMMARY_COLUMNS = [
+    # (key, header, number format)
+    ('company_name', 'Company', None),
+    ('ticker', 'Ticker', None),
+    ('status', 'Status', None),
+    ('industry', 'Industry', None),
+    ('country', 'Country', None),
+    ('wacc', 'WACC %', '0.00'),
+    ('terminal_growth_rate', 'Terminal Growth %', '0.00'),
+    ('enterprise_value', 'Enterprise Value ($M)', '#,##0.0'),
+    ('net_debt', 'Net Debt ($M)', '#,##0.0'),
+    ('equity_value', 'Equity Value ($M)', '#,##0.0'),
+    ('shares_outstanding', 'Shares (M)', '#,##0.0'),
+    ('intrinsic_value_per_share', 'Value / Share ($)', '$#,##0.00'),
+    ('monte_carlo_p5', 'MC P5 ($)', '$#,##0.00'),
+    ('monte_carlo_p50', 'MC Median ($)', '$#,##0.00'),
+    ('monte_carlo_p95', 'MC P95 ($)', '$#,##0.00'),
+    ('validation_status', 'Validation', None),
+    ('error', 'Error', None),
+]
+
+
+def valuation_summary(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Headline figures of one valuation, as stored on the job for batch summaries."""
+    assumptions = data.get('assumptions') or {}
+    summary = {
+        'company_name': data.get('company_name'),
+        'ticker': data.get('ticker'),
+        'industry': data.get('industry'),
+        'country': data.get('country'),
+        'wacc': assumptions.get('wacc'),
+        'terminal_growth_rate': assumptions.get('terminal_growth_rate'),
+        'enterprise_value': data.get('enterprise_value'),
+        'net_debt': data.get('net_debt'),
+        'equity_value': data.get('equity_value'),
+        'shares_outstanding': data.get('shares_outstanding'),
+        'intrinsic_value_per_share': data.get('intrinsic_value_per_share'),
+        'validation_status': data.get('validation_status'),
+    }
+    percentiles = (data.get('monte_carlo') or {}).get('percentiles') or {}
+    for p in ('p5', 'p50', 'p95'):
+        summary[f'monte_carlo_{p}'] = percentiles.get(p)
+    return summary
+
+
+def create_batch_summary_excel(rows: List[Dict[str, Any]]) -> bytes:
+    """Create batch_summary.xlsx with one row per company of a batch."""
     wb = Workbook()
     ws = wb.active
-    ws.title = 'DCF_10Y_Model'
+    ws.title = 'Batch_Summary'
 
-    # ── Styles ──
     hdr_font = Font(name='Calibri', bold=True, size=11, color='FFFFFF')
     hdr_fill = PatternFill(start_color='667EEA', end_color='667EEA', fill_type='solid')
     hdr_align = Alignment(horizontal='center', vertical='center', wrap_text=True)
     data_font = Font(name='Calibri', size=10)
-    data_align = Alignment(horizontal='right', vertical='center')
-    lbl_font = Font(name='Calibri', bold=True, size=10)
-    lbl_align = Alignment(horizontal='left', vertical='center')
-    sum_fill = PatternFill(start_color='E8F5E9', end_color='E8F5E9', fill_type='solid')
-    sum_font = Font(name='Calibri', bold=True, size=11, color='1B5E20')
-    border = Border(
-        left=Side(style='thin', color='D0D0D0'),
-        right=Side(style='thin', color='D0D0D0'),
-        top=Side(style='thin', color='D0D0D0'),
-        bottom=Side(style='thin', color='D0D0D0'),
-    )
-    NUM_FMT = '#,##0.0'
-    PCT_FMT = '0.0%'
-    DOLLAR_FMT = '$#,##0.00'
-
-    # ── Column headers (row 1) ──
-    headers = [
-        'Year', 'Revenue ($M)', 'Revenue Growth %', 'EBIT Margin %',
-        'EBIT ($M)', 'Tax Rate %', 'NOPAT ($M)', 'D&A ($M)',
-        'Capex ($M)', 'Change in NWC ($M)', 'FCFF ($M)',
-        'Discount Factor', 'PV of FCF ($M)',
-    ]
-    for col, h in enumerate(headers, 1):
-        c = ws.cell(row=1, column=col, value=h)
+    err_font = Font(name='Calibri', size=10, color='C62828')
+
+    for col, (_key, header, _fmt) in enumerate(SUMMARY_COLUMNS, 1):
+        c = ws.cell(row=1, column=col, value=header)
         c.font = hdr_font
         c.fill = hdr_fill
         c.alignment = hdr_align
-        c.border = border
-
-    # ── Forecast rows ──
-    forecast = data.get('forecast', [])
-    for i, row in enumerate(forecast):
-        r = i + 2
-        values = [
-            row.get('year'),
-            row.get('revenue'),
-            (row.get('revenue_growth_pct') or 0) / 100.0,
-            (row.get('ebit_margin_pct') or 0) / 100.0,
-            row.get('ebit'),
-            (row.get('tax_rate') or 0) / 100.0,
-            row.get('nopat'),
-            row.get('depreciation_amortization'),
-            row.get('capex'),
-            row.get('change_nwc'),
-            row.get('fcff'),
-            row.get('discount_factor'),
-            row.get('pv_fcf'),
-        ]
-        for col, val in enumerate(values, 1):
-            c = ws.cell(row=r, column=col, value=val)
-            c.font = data_font
-            c.alignment = data_align
-            c.border = border
-            if col == 1:
-                c.number_format = '0'
-                c.alignment = Alignment(horizontal='center')
-            elif col in (3, 4, 6):
-                c.number_format = PCT_FMT
-            elif col == 12:
-                c.number_format = '0.0000'
-            else:
-                c.number_format = NUM_FMT
+        ws.column_dimensions[get_column_letter(col)].width = 28 if col == 1 else 16
 
-    # ── Summary section (2 rows below last forecast) ──
-    summary_start = len(forecast) + 3
-    summary_items = [
-        ('Terminal Value ($M)', data.get('terminal_value'), NUM_FMT),
-        ('PV of Terminal Value ($M)', data.get('pv_terminal_value'), NUM_FMT),
-        ('Enterprise Value ($M)', data.get('enterprise_value'), NUM_FMT),
-        ('Net Debt ($M)', data.get('net_debt'), NUM_FMT),
-        ('Equity Value ($M)', data.get('equity_value'), NUM_FMT),
-        ('Shares Outstanding (M)', data.get('shares_outstanding'), '#,##0.00'),
-        ('Intrinsic Value Per Share ($)', data.get('intrinsic_value_per_share'), DOLLAR_FMT),
-    ]
-    for idx, (label, value, fmt) in enumerate(summary_items):
-        row = summary_start + idx
-        lc = ws.cell(row=row, column=1, value=label)
-        lc.font = lbl_font
-        lc.alignment = lbl_align
-        lc.border = border
-        lc.fill = sum_fill
-
-        vc = ws.cell(row=row, column=2, value=value)
-        vc.font = sum_font if idx == len(summary_items) - 1 else data_font
-        vc.alignment = data_align
-        vc.border = border
-        vc.fill = sum_fill
-        vc.number_format = fmt
-
-    # ── Column widths ──
-    widths = [8, 16, 16, 14, 14, 12, 14, 12, 12, 16, 14, 14, 16]
-    for i, w in enumerate(widths):
-        ws.column_dimensions[chr(65 + i)].width = w
+    for row_idx, row in enumerate(rows, 2):
+        failed = row.get('status') != 'complete'
+        for col, (key, _header, fmt) in enumerate(SUMMARY_COLUMNS, 1):
+            c = ws.cell(row=row_idx, column=col, value=row.get(key))
+            c.font = err_font if failed else data_font
+            if fmt:
+                c.number_format = fmt
+
+    ws.freeze_panes = 'B2'
+    if rows:
+        ws.auto_filter.ref = f'A1:{get_column_letter(len(SUMMARY_COLUMNS))}{len(rows) + 1}'
 
     output = io.BytesIO()
     wb.save(output)
@@ -331,12 +765,71 @@ def create_excel(data: Dict[str, Any]) -> bytes:
 #  ZIP CREATION
 # ═══════════════════════════════════════════════════════════════
 
-def create_zip(word_bytes: bytes, excel_bytes: bytes) -> bytes:
-    """Bundle valuation_report.docx + dcf_10_year_forecast.xlsx into a ZIP."""
-    buffer = io.BytesIO()
-    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
-        zf.writestr('valuation_report.docx', word_bytes)
-        zf.writestr('dcf_10_year_forecast.xlsx', excel_bytes)
-    buffer.seek(0)
-    return buffer.getvalue()
+# Files of a job's report archive, by the name of their download endpoint
+REPORT_FILES = {'word': 'valuation_report.docx', 'excel': 'dcf_10_year_forecast.xlsx'}
+REPORT_MEDIA_TYPES = {
+    'word': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'excel': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+# Members that are compressed containers already and are STORED as-is
+PRECOMPRESSED_SUFFIXES = ('.docx', '.xlsx', '.zip')
+ZIP_CHUNK = 1024 * 1024
+
+
+def safe_company_name(company_name: str) -> str:
+    """Lowercase, filesystem-safe stem of a company name (text before any " - ")."""
+    raw = company_name.split('-')[0].strip() if '-' in company_name else company_name
+    safe_name = re.sub(r'[^a-zA-Z0-9_-]', '_', raw)
+    return re.sub(r'_+', '_', safe_name).strip('_').lower() or 'company'
+
+
+def _compression(name: str) -> int:
+    """STORED for members that are already compressed containers, DEFLATED otherwise."""
+    return zipfile.ZIP_STORED if name.lower().endswith(PRECOMPRESSED_SUFFIXES) else zipfile.ZIP_DEFLATED
+
+
+def write_zip(sink: Sink, members: Iterable[Tuple]) -> None:
+    """Stream ``members`` into a ZIP archive written to ``sink``.
+
+    Each member is ``(name, source)`` or ``(name, source, compress_type)``;
+    ``source`` is bytes, a file path or a readable binary file object, and is
+    copied in ``ZIP_CHUNK`` pieces so no member or archive is held in memory
+    twice. Without an explicit ``compress_type``, .docx / .xlsx / .zip
+    members are STORED (they are DEFLATE containers already) and anything
+    else is DEFLATED. ``sink`` may be unseekable (e.g. a response stream).
+    """
+    with zipfile.ZipFile(sink, 'w') as zf:
+        for name, source, *compress_type in members:
+            info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+            info.compress_type = compress_type[0] if compress_type else _compression(name)
+            if isinstance(source, (bytes, bytearray)):
+                zf.writestr(info, source)
+                continue
+            if isinstance(source, str):
+                info.file_size = os.path.getsize(source)
+                with open(source, 'rb') as f, zf.open(info, 'w') as out:
+                    shutil.copyfileobj(f, out, ZIP_CHUNK)
+            else:
+                with zf.open(info, 'w', force_zip64=True) as out:
+                    shutil.copyfileobj(source, out, ZIP_CHUNK)
+
+
+def report_members(word: Any, excel: Any) -> List[Tuple[str, Any]]:
+    """Members of a job's report archive; ``word`` / ``excel`` are bytes or file paths."""
+    return [(REPORT_FILES['word'], word), (REPORT_FILES['excel'], excel)]
+
+
+def batch_members(reports: List[Tuple[str, Optional[str]]], summary_bytes: bytes) -> Iterator[Tuple[str, Any]]:
+    """Members of a batch archive: batch_summary.xlsx, then every report's files.
 
+    ``reports`` holds (folder, path-to-report.zip) pairs; each report's files
+    land under ``<folder>/`` and are read straight out of its archive.
+    """
+    yield 'batch_summary.xlsx', summary_bytes
+    for folder, path in reports:
+        if not path:
+            continue
+        with zipfile.ZipFile(path) as src:
+            for name in src.namelist():
+                with src.open(name) as member:
+                    yield f'{folder}/{name}', member
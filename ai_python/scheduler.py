@@ -0,0 +1,298 @@
+import asyncio
+import hashlib
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger('dcf_pipeline')
+
+
+# ═══════════════════════════════════════════════════════════════
+#  JOB SCHEDULER  (fixed worker pool + bounded priority queue)
+# ═══════════════════════════════════════════════════════════════
+
+MAX_WORKERS = int(os.environ.get('DCF_MAX_WORKERS', '4'))
+MAX_QUEUE = int(os.environ.get('DCF_MAX_QUEUE', '50'))
+MAX_JOBS_PER_KEY = int(os.environ.get('DCF_MAX_JOBS_PER_KEY', '2'))
+MAX_ASYNC_JOBS = int(os.environ.get('DCF_MAX_ASYNC_JOBS', '200'))
+# CPU-bound steps of coroutine jobs (valuation arithmetic, report rendering when
+# the render processes are off, zipping) share this small pool. OpenAI calls never
+# run here, so it does not bound how many jobs can wait on OpenAI at once.
+BLOCKING_THREADS = int(os.environ.get('DCF_BLOCKING_THREADS', '8'))
+
+_blocking_pool = ThreadPoolExecutor(max_workers=BLOCKING_THREADS, thread_name_prefix='dcf-blocking')
+
+
+async def run_blocking(fn: Callable[..., Any], *args: Any) -> Any:
+    """Run a blocking call on the shared pool without blocking the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(_blocking_pool, fn, *args)
+
+
+async def run_blocking_timed(fn: Callable[..., Any], *args: Any) -> Tuple[Any, float, float]:
+    """``run_blocking`` that also returns the seconds spent waiting for a thread and running."""
+    submitted = time.monotonic()
+    started: List[float] = []
+
+    def call() -> Any:
+        started.append(time.monotonic())
+        return fn(*args)
+
+    result = await run_blocking(call)
+    return result, started[0] - submitted, time.monotonic() - started[0]
+
+
+class QueueFullError(Exception):
+    """Raised when the scheduler cannot admit another job."""
+
+
+def key_fingerprint(api_key: str) -> str:
+    """Short, non-reversible identifier for an API key (safe to log/expose)."""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:12]
+
+
+class JobScheduler:
+    """Run jobs on a fixed-size worker pool fed by a bounded priority queue.
+
+    Jobs are dispatched in (priority, arrival) order; smaller priorities go
+    first. A job whose API key already has ``max_per_key`` jobs running is
+    skipped until one of them finishes, so one key cannot occupy the pool.
+
+    Coroutine functions run on the event loop given to ``bind_loop`` (up to
+    ``max_async`` at once): a worker only hands them over, so a job waiting on
+    I/O holds no thread. Without a bound loop they run to completion with
+    ``asyncio.run`` on the worker thread like any other job.
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS, max_queue: int = MAX_QUEUE,
+                 max_per_key: int = MAX_JOBS_PER_KEY, max_async: int = MAX_ASYNC_JOBS) -> None:
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.max_per_key = max(1, max_per_key)
+        self.max_async = max(1, max_async)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self._cond = threading.Condition()
+        # heap entries: (priority, seq, job_id)
+        self._heap: List[Tuple[int, int, str]] = []
+        self._queued: Dict[str, Dict[str, Any]] = {}
+        self._running: Dict[str, str] = {}
+        self._on_loop: Set[str] = set()
+        self._tasks: Dict[str, Tuple[asyncio.AbstractEventLoop, asyncio.Task]] = {}
+        self._running_per_key: Dict[str, int] = {}
+        self._seq = itertools.count()
+        self._workers: List[threading.Thread] = []
+
+        self._completed = 0
+        self._rejected = 0
+        self._recent_waits: deque = deque(maxlen=500)
+
+    # ── Public API ──
+
+    def bind_loop(self, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+        """Run coroutine jobs on ``loop`` from now on (None: back to worker threads)."""
+        with self._cond:
+            self._loop = loop
+            self._cond.notify_all()
+
+    def submit(self, job_id: str, api_key: str, fn: Callable[..., Any], args: Tuple = (),
+               priority: int = 0) -> Optional[int]:
+        """Queue ``fn(*args)`` for execution.
+
+        Returns the 1-based queue position, or None when the job was handed
+        straight to an idle worker. Raises QueueFullError when the queue is full.
+        """
+        key_id = key_fingerprint(api_key)
+        is_async = asyncio.iscoroutinefunction(fn)
+        with self._cond:
+            self._ensure_workers()
+            if len(self._heap) >= self.max_queue and not self._can_start_now(key_id, is_async):
+                self._rejected += 1
+                raise QueueFullError(
+                    f'DCF queue is full ({len(self._heap)} jobs waiting). Please retry later.'
+                )
+            seq = next(self._seq)
+            heapq.heappush(self._heap, (priority, seq, job_id))
+            self._queued[job_id] = {
+                'fn': fn,
+                'args': args,
+                'key_id': key_id,
+                'is_async': is_async,
+                'enqueued_at': time.monotonic(),
+            }
+            start_now = self._can_start_now(key_id, is_async)
+            self._cond.notify()
+            return None if start_now else self._position_locked(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Drop a queued job or cancel a running coroutine job's task.
+
+        Returns True if the job was removed or its task was told to stop;
+        plain (non-coroutine) jobs cannot be interrupted once started.
+        """
+        with self._cond:
+            if job_id in self._queued:
+                del self._queued[job_id]
+                self._heap = [e for e in self._heap if e[2] != job_id]
+                heapq.heapify(self._heap)
+                return True
+            handle = self._tasks.get(job_id)
+        if handle is None:
+            return False
+        loop, task = handle
+        try:
+            loop.call_soon_threadsafe(task.cancel)
+        except RuntimeError:
+            # Loop already closed: the task is gone with it.
+            return False
+        return True
+
+    def position(self, job_id: str) -> Optional[int]:
+        """1-based position of a waiting job, or None if it is not queued."""
+        with self._cond:
+            if job_id not in self._queued:
+                return None
+            return self._position_locked(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, worker occupancy and wait-time figures for pool sizing."""
+        with self._cond:
+            now = time.monotonic()
+            waits = sorted(self._recent_waits)
+            oldest = min((q['enqueued_at'] for q in self._queued.values()), default=None)
+            return {
+                'workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'max_jobs_per_key': self.max_per_key,
+                'running': len(self._running),
+                'running_on_loop': len(self._on_loop),
+                'max_async_jobs': self.max_async,
+                'queued': len(self._heap),
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'oldest_queued_seconds': round(now - oldest, 3) if oldest is not None else 0.0,
+                'avg_wait_seconds': round(sum(waits) / len(waits), 3) if waits else 0.0,
+                'p95_wait_seconds': round(waits[int(0.95 * (len(waits) - 1))], 3) if waits else 0.0,
+            }
+
+    # ── Internals ──
+
+    def _can_start_now(self, key_id: str, is_async: bool) -> bool:
+        if self._running_per_key.get(key_id, 0) >= self.max_per_key:
+            return False
+        if is_async and self._loop is not None:
+            return len(self._on_loop) < self.max_async
+        return len(self._running) - len(self._on_loop) < self.max_workers
+
+    def _position_locked(self, job_id: str) -> int:
+        for pos, entry in enumerate(sorted(self._heap), 1):
+            if entry[2] == job_id:
+                return pos
+        return 0
+
+    def _ensure_workers(self) -> None:
+        while len(self._workers) < self.max_workers:
+            t = threading.Thread(
+                target=self._worker_loop,
+                name=f'dcf-worker-{len(self._workers) + 1}',
+                daemon=True,
+            )
+            self._workers.append(t)
+            t.start()
+
+    def _pop_eligible(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Remove and return the first queued job whose key is under its cap."""
+        loop_full = len(self._on_loop) >= self.max_async
+        for entry in sorted(self._heap):
+            job_id = entry[2]
+            item = self._queued[job_id]
+            if item['is_async'] and self._loop is not None and loop_full:
+                continue
+            if self._running_per_key.get(item['key_id'], 0) < self.max_per_key:
+                self._heap.remove(entry)
+                heapq.heapify(self._heap)
+                del self._queued[job_id]
+                return job_id, item
+        return None
+
+    def _worker_loop(self) -> None:
+        while True:
+            with self._cond:
+                picked = self._pop_eligible()
+                while picked is None:
+                    self._cond.wait()
+                    picked = self._pop_eligible()
+                job_id, item = picked
+                key_id = item['key_id']
+                loop = self._loop if item['is_async'] else None
+                self._running[job_id] = key_id
+                self._running_per_key[key_id] = self._running_per_key.get(key_id, 0) + 1
+                if loop is not None:
+                    self._on_loop.add(job_id)
+                wait = time.monotonic() - item['enqueued_at']
+                self._recent_waits.append(wait)
+
+            if loop is not None:
+                logger.info('[Job %s] Dispatched to event loop after %.2fs in queue', job_id[:8], wait)
+                try:
+                    future = asyncio.run_coroutine_threadsafe(
+                        self._track(job_id, item['fn'](*item['args'])), loop)
+                except RuntimeError as e:
+                    # Loop closed between binding and dispatch.
+                    logger.error('[Job %s] Could not dispatch to event loop: %s', job_id[:8], e)
+                    self._finish(job_id, key_id)
+                    continue
+                future.add_done_callback(lambda f, j=job_id, k=key_id: self._job_done(j, k, f))
+                continue
+
+            logger.info('[Job %s] Dispatched to %s after %.2fs in queue',
+                        job_id[:8], threading.current_thread().name, wait)
+            try:
+                if item['is_async']:
+                    asyncio.run(self._track(job_id, item['fn'](*item['args'])))
+                else:
+                    item['fn'](*item['args'])
+            except asyncio.CancelledError:
+                logger.info('[Job %s] Cancelled while running', job_id[:8])
+            except Exception as e:
+                logger.error('[Job %s] Worker raised: %s', job_id[:8], e, exc_info=True)
+            finally:
+                self._finish(job_id, key_id)
+
+    async def _track(self, job_id: str, coro) -> Any:
+        """Run ``coro`` with its task registered so ``cancel`` can reach it."""
+        with self._cond:
+            self._tasks[job_id] = (asyncio.get_running_loop(), asyncio.current_task())
+        try:
+            return await coro
+        finally:
+            with self._cond:
+                self._tasks.pop(job_id, None)
+
+    def _job_done(self, job_id: str, key_id: str, future) -> None:
+        if future.cancelled():
+            logger.info('[Job %s] Cancelled while running', job_id[:8])
+        elif future.exception() is not None:
+            e = future.exception()
+            logger.error('[Job %s] Worker raised: %s', job_id[:8], e, exc_info=e)
+        self._finish(job_id, key_id)
+
+    def _finish(self, job_id: str, key_id: str) -> None:
+        with self._cond:
+            del self._running[job_id]
+            self._on_loop.discard(job_id)
+            self._running_per_key[key_id] -= 1
+            if not self._running_per_key[key_id]:
+                del self._running_per_key[key_id]
+            self._completed += 1
+            # A finished job may unblock one held back by its key or loop cap.
+            self._cond.notify_all()
+
+
+# Process-wide scheduler used by the HTTP routes
+scheduler = JobScheduler()
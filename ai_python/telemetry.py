@@ -0,0 +1,222 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .jobs import TERMINAL_STATUSES, job_store
+
+logger = logging.getLogger('dcf_pipeline')
+
+
+# ═══════════════════════════════════════════════════════════════
+#  TELEMETRY  (per-job stage timings, token usage, cost; Prometheus metrics)
+# ═══════════════════════════════════════════════════════════════
+
+# USD per 1M (prompt, completion) tokens; extend or override with
+# DCF_MODEL_PRICES='{"gpt-4.1-mini": [0.40, 1.60]}'.
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    'gpt-4.1': (2.00, 8.00),
+    'gpt-4.1-mini': (0.40, 1.60),
+    'gpt-4.1-nano': (0.10, 0.40),
+    'gpt-4o': (2.50, 10.00),
+    'gpt-4o-mini': (0.15, 0.60),
+}
+try:
+    MODEL_PRICES.update({
+        model: (float(prices[0]), float(prices[1]))
+        for model, prices in json.loads(os.environ.get('DCF_MODEL_PRICES') or '{}').items()
+    })
+except (ValueError, TypeError, IndexError) as e:
+    logger.error('Ignoring invalid DCF_MODEL_PRICES: %s', e)
+
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    """Estimated USD cost of a call, or None for a model without a known price."""
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return None
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+
+
+def stage_entry(wall_seconds: float, queue_seconds: float = 0.0, model: Optional[str] = None,
+                prompt_tokens: int = 0, completion_tokens: int = 0, cached: bool = False) -> Dict[str, Any]:
+    """One stage's telemetry; LLM stages (``model`` given) add tokens and cost."""
+    entry: Dict[str, Any] = {
+        'wall_ms': round(wall_seconds * 1000, 1),
+        'queue_ms': round(queue_seconds * 1000, 1),
+    }
+    if model is not None:
+        cost = estimate_cost(model, prompt_tokens, completion_tokens)
+        entry.update(
+            model=model,
+            cached=cached,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cost_usd=round(cost, 6) if cost is not None else None,
+        )
+    return entry
+
+
+class JobTelemetry:
+    """Stage telemetry of one pipeline run, kept on the job as ``telemetry``.
+
+    Each ``record`` stores the stage, refreshes the job's totals (so status
+    polling sees stages as they finish) and feeds the process-wide metrics.
+    """
+
+    def __init__(self, job_id: str) -> None:
+        self.job_id = job_id
+        self.stages: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, stage: str, wall_seconds: float, **fields: Any) -> Dict[str, Any]:
+        entry = stage_entry(wall_seconds, **fields)
+        self.stages[stage] = entry
+        metrics.observe_stage(stage, entry)
+        job_store.update(self.job_id, telemetry=self.snapshot())
+        return entry
+
+    def snapshot(self) -> Dict[str, Any]:
+        costs = [s['cost_usd'] for s in self.stages.values() if s.get('cost_usd') is not None]
+        return {
+            'stages': {name: dict(entry) for name, entry in self.stages.items()},
+            'totals': {
+                'wall_ms': round(sum(s['wall_ms'] for s in self.stages.values()), 1),
+                'prompt_tokens': sum(s.get('prompt_tokens', 0) for s in self.stages.values()),
+                'completion_tokens': sum(s.get('completion_tokens', 0) for s in self.stages.values()),
+                'cost_usd': round(sum(costs), 6),
+            },
+        }
+
+
+class _Histogram:
+    """Cumulative-bucket histogram per label set (Prometheus semantics)."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DURATION_BUCKETS) -> None:
+        self.buckets = buckets
+        self.series: Dict[Tuple[Tuple[str, str], ...], List[float]] = {}
+
+    def observe(self, labels: Tuple[Tuple[str, str], ...], value: float) -> None:
+        # [bucket counts..., +Inf count, sum]
+        series = self.series.setdefault(labels, [0.0] * (len(self.buckets) + 2))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += 1
+        series[-1] += value
+
+
+def _labels(pairs: Tuple[Tuple[str, str], ...]) -> str:
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metrics:
+    """Process-wide counters and histograms, rendered in Prometheus text format."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stage_seconds = _Histogram()
+        self._stage_queue_seconds = _Histogram()
+        self._job_seconds = _Histogram()
+        self._tokens: Dict[Tuple[Tuple[str, str], ...], float] = {}
+        self._cost: Dict[Tuple[Tuple[str, str], ...], float] = {}
+        self._cache_hits: Dict[Tuple[Tuple[str, str], ...], float] = {}
+        self._jobs: Dict[Tuple[Tuple[str, str], ...], float] = {}
+        self._running: Dict[str, float] = {}
+
+    def observe_stage(self, stage: str, entry: Dict[str, Any]) -> None:
+        labels = (('stage', stage),)
+        with self._lock:
+            self._stage_seconds.observe(labels, entry['wall_ms'] / 1000)
+            self._stage_queue_seconds.observe(labels, entry['queue_ms'] / 1000)
+            if 'model' not in entry:
+                return
+            model_labels = labels + (('model', entry['model']),)
+            for kind in ('prompt', 'completion'):
+                key = model_labels + (('type', kind),)
+                self._tokens[key] = self._tokens.get(key, 0) + entry[f'{kind}_tokens']
+            if entry['cost_usd'] is not None:
+                self._cost[model_labels] = self._cost.get(model_labels, 0.0) + entry['cost_usd']
+            if entry['cached']:
+                self._cache_hits[labels] = self._cache_hits.get(labels, 0) + 1
+
+    def run_started(self, job_id: str) -> None:
+        with self._lock:
+            self._running[job_id] = time.monotonic()
+
+    def run_ended(self, job_id: str) -> None:
+        """Count a run that stopped without reaching a terminal status (e.g. shutdown)."""
+        with self._lock:
+            started = self._running.pop(job_id, None)
+        if started is not None:
+            self._job_finished('unknown', time.monotonic() - started)
+
+    def job_changed(self, job_id: str, changes: Dict[str, Any], job: Dict[str, Any]) -> None:
+        """JobStore change listener: count a run when it reaches its terminal status.
+
+        Runs are counted here rather than when the pipeline returns because a
+        shared run's record is deleted as soon as it finishes.
+        """
+        if 'status' not in changes or job.get('status') not in TERMINAL_STATUSES:
+            return
+        with self._lock:
+            started = self._running.pop(job_id, None)
+        if started is not None:
+            self._job_finished(job['status'], time.monotonic() - started)
+
+    def render(self, gauges: Optional[Dict[str, Tuple[str, float]]] = None) -> str:
+        """Prometheus exposition text; ``gauges`` maps name to (help, value)."""
+        lines: List[str] = []
+        with self._lock:
+            self._histogram(lines, 'dcf_stage_duration_seconds', 'Wall time of a pipeline stage.',
+                            self._stage_seconds)
+            self._histogram(lines, 'dcf_stage_queue_seconds',
+                            'Time a stage waited for a thread or render worker.', self._stage_queue_seconds)
+            self._histogram(lines, 'dcf_job_duration_seconds', 'Wall time of a pipeline run by final status.',
+                            self._job_seconds)
+            self._counter(lines, 'dcf_llm_tokens_total', 'LLM tokens used, by stage, model and type.', self._tokens)
+            self._counter(lines, 'dcf_llm_cost_usd_total', 'Estimated LLM spend in USD, by stage and model.',
+                          self._cost)
+            self._counter(lines, 'dcf_llm_cache_hits_total', 'LLM stages answered from the response cache.',
+                          self._cache_hits)
+            self._counter(lines, 'dcf_jobs_finished_total', 'Pipeline runs finished, by final status.', self._jobs)
+        for name, (help_text, value) in (gauges or {}).items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {_number(value)}']
+        return '\n'.join(lines) + '\n'
+
+    # ── Internals ──
+
+    def _job_finished(self, status: str, seconds: float) -> None:
+        labels = (('status', status),)
+        with self._lock:
+            self._jobs[labels] = self._jobs.get(labels, 0) + 1
+            self._job_seconds.observe(labels, seconds)
+
+    @staticmethod
+    def _counter(lines: List[str], name: str, help_text: str, values: Dict[Tuple[Tuple[str, str], ...], float]) -> None:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        lines += [f'{name}{_labels(labels)} {_number(value)}' for labels, value in sorted(values.items())]
+
+    @staticmethod
+    def _histogram(lines: List[str], name: str, help_text: str, histogram: _Histogram) -> None:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for labels, series in sorted(histogram.series.items()):
+            for bound, count in zip(histogram.buckets, series):
+                lines.append(f'{name}_bucket{_labels(labels + (("le", _number(bound)),))} {_number(count)}')
+            lines.append(f'{name}_bucket{_labels(labels + (("le", "+Inf"),))} {_number(series[-2])}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(series[-1])}')
+            lines.append(f'{name}_count{_labels(labels)} {_number(series[-2])}')
+
+
+# Process-wide metrics registry
+metrics = Metrics()
@@ -21,6 +21,8 @@ export interface DcfStartRequest {
 
 export interface DcfStartResponse {
   job_id: string;
+  status?: string;
+  queue_position?: number | null;
   error?: string;
 }
 
@@ -28,6 +30,38 @@ export interface AgentResult {
   agent: number;
   name: string;
   result: string;
+  version?: number;
+}
+
+export interface InterruptedStage {
+  agent: number;
+  name: string;
+  reason: 'cancelled' | 'timeout';
+}
+
+export interface DcfCheckpoint {
+  stage: string | null;
+  agents: number;
+  extracted: boolean;
+}
+
+export interface DcfRerunRequest {
+  api_key: string;
+  prompts?: Partial<DcfStartRequest['prompts']>;
+  bypass_cache?: boolean;
+}
+
+export interface DcfRateLimit {
+  throttled: boolean;
+  throttled_calls: number;
+  throttle_ms: number;
+  rate_limited: number;
+  retries: number;
+  limits: Record<string, {
+    requests_per_minute: number;
+    tokens_per_minute: number;
+    concurrency: number;
+  }>;
 }
 
 export interface DcfStatusResponse {
@@ -39,4 +73,11 @@ export interface DcfStatusResponse {
   download_ready: boolean;
   zip_filename: string | null;
   cancelled?: boolean;
+  interrupted_stage?: InterruptedStage | null;
+  checkpoint?: DcfCheckpoint | null;
+  rerun_of?: { job_id: string; from_agent: number } | null;
+  rate_limit?: DcfRateLimit | null;
+  queue_position?: number | null;
+  version?: number;
+  delta?: boolean;
 }
@@ -23,6 +23,7 @@ export class DcfComponent implements OnDestroy, AfterViewInit {
   status: DcfStatusResponse | null = null;
   isRunning = false;
   pollInterval: any = null;
+  eventSource: EventSource | null = null;
   expandedAgents: Set<number> = new Set();
 
   agentNames = [
@@ -44,6 +45,7 @@ export class DcfComponent implements OnDestroy, AfterViewInit {
   }
 
   ngOnDestroy(): void {
+    this.stopStream();
     this.stopPolling();
   }
 
@@ -78,7 +80,7 @@ export class DcfComponent implements OnDestroy, AfterViewInit {
               return;
             }
             this.jobId = res.job_id;
-            this.startPolling();
+            this.startStream();
           },
           error: (err) => {
             this.isRunning = false;
@@ -94,21 +96,59 @@ export class DcfComponent implements OnDestroy, AfterViewInit {
     });
   }
 
+  // Server-Sent Events push each stage/agent result once; fall back to polling if unavailable.
+  startStream(): void {
+    if (!this.jobId) return;
+    if (typeof EventSource === 'undefined') {
+      this.startPolling();
+      return;
+    }
+    this.status = {
+      status: 'queued',
+      current_agent: 0,
+      current_agent_name: '',
+      agent_results: [],
+      error: null,
+      download_ready: false,
+      zip_filename: null
+    };
+    const es = new EventSource(this.api.getDcfEventsUrl(this.jobId));
+    this.eventSource = es;
+    es.addEventListener('stage', (e: MessageEvent) => {
+      this.status = { ...this.status!, ...JSON.parse(e.data) };
+    });
+    es.addEventListener('agent_result', (e: MessageEvent) => {
+      const result: AgentResult = JSON.parse(e.data);
+      this.status = { ...this.status!, agent_results: [...this.status!.agent_results, result] };
+    });
+    es.addEventListener('status', (e: MessageEvent) => {
+      this.stopStream();
+      this.status = { ...this.status!, ...JSON.parse(e.data) };
+      this.handleStatus(this.status!);
+    });
+    es.onerror = () => {
+      // Stream dropped before the final event: resume with plain polling.
+      if (this.eventSource) {
+        this.stopStream();
+        this.startPolling();
+      }
+    };
+  }
+
+  stopStream(): void {
+    if (this.eventSource) {
+      this.eventSource.close();
+      this.eventSource = null;
+    }
+  }
+
   startPolling(): void {
     this.pollInterval = setInterval(() => {
       if (!this.jobId) return;
       this.api.getDcfStatus(this.jobId).subscribe({
         next: (status) => {
           this.status = status;
-          if (status.status === 'complete' || status.status === 'error' || status.status === 'cancelled' || status.cancelled) {
-            this.isRunning = false;
-            this.stopPolling();
-            if (status.status === 'error') {
-              this.messageService.add({ severity: 'error', summary: this.ts.t('dcf.error'), detail: status.error || 'Unknown error' });
-            } else if (status.status === 'cancelled' || status.cancelled) {
-              this.messageService.add({ severity: 'info', summary: this.ts.t('dcf.stopped'), detail: this.ts.t('dcf.stopped_detail') });
-            }
-          }
+          this.handleStatus(status);
         },
         error: () => {
           this.isRunning = false;
@@ -118,6 +158,18 @@ export class DcfComponent implements OnDestroy, AfterViewInit {
     }, 3000);
   }
 
+  handleStatus(status: DcfStatusResponse): void {
+    if (status.status === 'complete' || status.status === 'error' || status.status === 'cancelled' || status.cancelled) {
+      this.isRunning = false;
+      this.stopPolling();
+      if (status.status === 'error') {
+        this.messageService.add({ severity: 'error', summary: this.ts.t('dcf.error'), detail: status.error || 'Unknown error' });
+      } else if (status.status === 'cancelled' || status.cancelled) {
+        this.messageService.add({ severity: 'info', summary: this.ts.t('dcf.stopped'), detail: this.ts.t('dcf.stopped_detail') });
+      }
+    }
+  }
+
   stopPolling(): void {
     if (this.pollInterval) {
       clearInterval(this.pollInterval);
@@ -126,6 +178,7 @@ export class DcfComponent implements OnDestroy, AfterViewInit {
   }
 
   stopDcf(): void {
+    this.stopStream();
     if (!this.jobId) {
       this.isRunning = false;
       this.stopPolling();
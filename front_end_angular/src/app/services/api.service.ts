@@ -6,7 +6,7 @@ import { environment } from '../../environments/environment';
 import { Role, RoleDto } from '../models/role.model';
 import { Permission } from '../models/permission.model';
 import { AppUser, UserDto } from '../models/user.model';
-import { AiSettings, DcfStartRequest, DcfStartResponse, DcfStatusResponse } from '../models/ai.model';
+import { AiSettings, DcfRerunRequest, DcfStartRequest, DcfStartResponse, DcfStatusResponse } from '../models/ai.model';
 import { DcfLog, DcfLogStats } from '../models/dcf-log.model';
 import { AuthUser } from '../models/auth.model';
 import { PageResponse, PageRequestParams } from '../models/page.model';
@@ -140,8 +140,18 @@ export class ApiService {
   cancelDcf(jobId: string): Observable<DcfStatusResponse> {
     return this.http.post<DcfStatusResponse>(this.pythonApi + 'api/dcf/cancel/' + jobId, {});
   }
-  getDcfDownloadUrl(jobId: string): string {
-    return this.pythonApi + 'api/dcf/download/' + jobId;
+  resumeDcf(jobId: string, apiKey: string): Observable<DcfStartResponse> {
+    return this.http.post<DcfStartResponse>(this.pythonApi + 'api/dcf/resume/' + jobId, { api_key: apiKey });
+  }
+  rerunDcf(jobId: string, fromAgent: number, data: DcfRerunRequest): Observable<DcfStartResponse> {
+    const params = new HttpParams().set('from_agent', fromAgent);
+    return this.http.post<DcfStartResponse>(this.pythonApi + 'api/dcf/rerun/' + jobId, data, { params });
+  }
+  getDcfEventsUrl(jobId: string): string {
+    return this.pythonApi + 'api/dcf/events/' + jobId;
+  }
+  getDcfDownloadUrl(jobId: string, file?: 'word' | 'excel'): string {
+    return this.pythonApi + 'api/dcf/download/' + jobId + (file ? '/' + file : '');
   }
 
   // ===== KPI / DCF Logs (paginated + stats) =====